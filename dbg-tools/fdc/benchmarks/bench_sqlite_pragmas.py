@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Compare default vs tuned SQLite pragmas under a concurrent writer and reader.
+
+A writer thread bulk-inserts collection parts while a reader thread pages
+through them with the viewer's keyset query. Reports write throughput, read
+latency percentiles and "database is locked" errors for each profile.
+
+Usage: python benchmarks/bench_sqlite_pragmas.py [--seconds 10] [--batch 500]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from fdc.db import crud
+from fdc.db.models import Base
+from fdc.db.session import configure_sqlite
+
+
+def run_profile(name, tuned, seconds, batch):
+    """Run the concurrent writer/reader workload against a fresh database file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}",
+            connect_args={"check_same_thread": False}
+        )
+        if tuned:
+            configure_sqlite(engine)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(engine)
+        with Session() as db:
+            collection_id = crud.create_collection(db, "bench").id
+
+        stop = threading.Event()
+        stats = {"rows": 0, "write_errors": 0, "read_errors": 0, "latencies": []}
+
+        def writer():
+            order = 0
+            with Session() as db:
+                while not stop.is_set():
+                    parts = [
+                        {"name": f"part {order + i}", "content": "x" * 200, "data": {"i": order + i}, "order": order + i}
+                        for i in range(batch)
+                    ]
+                    try:
+                        stats["rows"] += crud.bulk_create_collection_parts(db, collection_id, parts)
+                        order += batch
+                    except OperationalError:
+                        db.rollback()
+                        stats["write_errors"] += 1
+
+        def reader():
+            with Session() as db:
+                while not stop.is_set():
+                    after_id = max(stats["rows"] - 1000, 0)
+                    start = time.perf_counter()
+                    try:
+                        crud.get_collection_parts(db, collection_id, limit=100, after_id=after_id)
+                        stats["latencies"].append(time.perf_counter() - start)
+                    except OperationalError:
+                        stats["read_errors"] += 1
+                    db.rollback()
+
+        threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    latencies = sorted(stats["latencies"]) or [0.0]
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+    print(
+        f"{name:<8} writes {stats['rows'] / seconds:>10,.0f} rows/s | "
+        f"reads {len(stats['latencies']):>6} | p50 {statistics.median(latencies) * 1000:6.2f} ms | "
+        f"p95 {p95 * 1000:6.2f} ms | locked errors w={stats['write_errors']} r={stats['read_errors']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+    run_profile("default", False, args.seconds, args.batch)
+    run_profile("tuned", True, args.seconds, args.batch)
+
+
+if __name__ == "__main__":
+    main()
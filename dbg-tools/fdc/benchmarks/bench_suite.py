@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""Benchmark the hot paths on a large synthetic dataset and check them against baselines.
+
+Covers crud bulk writes, the viewer's page queries, export, the sidebar stats
+and the three stage engines, on the deterministic multi-chain dataset of
+`benchmarks/dataset.py` (generated on first use and cached). Every benchmark
+runs `repeat` times and its fastest run counts.
+
+Results are compared with `benchmarks/baselines.json`, keyed by backend and
+dataset size. The run fails (exit status 1) when a benchmark is more than
+`--max-ratio` times (default 2x) slower than its baseline, ignoring differences
+below `MIN_DIFFERENCE`. Baselines are machine-specific: record them with
+`--save` on the machine that runs the check. `--save` refuses to record a run
+that fails the check unless given `--allow-regression`, so that a slowdown is
+accepted on purpose rather than hidden in a new baseline. `pytest -m bench`
+(`make bench`) runs the check as a test.
+
+Usage: python benchmarks/bench_suite.py [--rows 1000000] [--url URL] [--only viewer] [--save [--allow-regression]]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from dataset import DEFAULT_DATA_DIR, DEFAULT_ROWS, default_url, ensure_dataset, iter_parts
+from fdc.db import crud
+from fdc.db.export import export_table
+from fdc.db.frames import read_collection_names, read_search_page, read_table_page
+from fdc.db.models import CollectionPart
+from fdc.db.session import create_database_engine
+from fdc.pipeline.builder import BUILT_SUFFIX, DEFAULT_BUILD_OPTIONS, TransactionBuilder
+from fdc.pipeline.cache import LookupCache
+from fdc.pipeline.collector import ChainSource, Collector
+from fdc.pipeline.enricher import Enricher
+
+BASELINES = Path(__file__).resolve().parent / "baselines.json"
+
+# Slowdowns smaller than this many seconds never fail the run (timer noise)
+MIN_DIFFERENCE = 0.002
+
+# Options of the enricher benchmark: the ones that need no RPC endpoint
+OFFLINE_ENRICHMENTS = ["Address Labeling", "Protocol Identification"]
+
+COLLECT_TXS_PER_BLOCK = 100  # x 300 Ethereum blocks in the collected hour
+
+
+@dataclass
+class Benchmark:
+    """A timed call with optional untimed setup/teardown around every run."""
+
+    name: str
+    run: Callable[[], object]
+    repeat: int = 5
+    setup: Optional[Callable[[], None]] = None
+    teardown: Optional[Callable[[], None]] = None
+
+    def measure(self) -> List[float]:
+        timings = []
+        for _ in range(self.repeat):
+            if self.setup:
+                self.setup()
+            started = time.perf_counter()
+            try:
+                self.run()
+                timings.append(time.perf_counter() - started)
+            finally:
+                if self.teardown:
+                    self.teardown()
+        return timings
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_devnet(port: int) -> subprocess.Popen:
+    """Run `fdc.pipeline.devnet` in a subprocess and wait until it accepts connections."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "fdc.pipeline.devnet", "--port", str(port),
+         "--txs-per-block", str(COLLECT_TXS_PER_BLOCK)],
+        cwd=Path(__file__).resolve().parent.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("The devnet did not start")
+
+
+def build_benchmarks(engine, ids: Dict[str, int], rows: int, tmp: Path) -> List[Benchmark]:
+    """The benchmarks over the dataset collections `ids` in `engine`'s database."""
+    Session = sessionmaker(engine)
+    main_id, enrich_id = ids["main"], ids["enrich"]
+    with engine.connect() as connection:
+        middle_id = connection.execute(
+            select(func.min(CollectionPart.id) + rows // 2).where(CollectionPart.collection_id == main_id)
+        ).scalar()
+        # A sender address from the middle of the dataset: a selective viewer search
+        search = json.loads(read_table_page(connection, "collection_part", 1, middle_id, main_id)["data"][0])["from"]
+
+    scratch: Dict[str, int] = {}
+
+    def new_collection(name):
+        def setup():
+            with Session() as db:
+                scratch[name] = crud.create_collection(db, name).id
+        return setup
+
+    def drop_collection(name):
+        def teardown():
+            with Session() as db:
+                crud.delete_collection(db, scratch.pop(name))
+        return teardown
+
+    write_rows = 100_000
+    write_parts = [
+        {"name": f"bench write {i}", "content": "x" * 400, "order": i,
+         "data": {"type": "transaction", "chain": "ethereum", "block_number": i // 100, "timestamp": 1_767_225_600 + i}}
+        for i in range(write_rows)
+    ]
+
+    def bulk_write():
+        with Session() as db:
+            crud.bulk_create_collection_parts(db, scratch["bench-write"], write_parts)
+
+    def page(**query):
+        def run():
+            with engine.connect() as connection:
+                read_table_page(connection, "collection_part", **query)
+        return run
+
+    def search_page(query):
+        def run():
+            with engine.connect() as connection:
+                read_search_page(connection, query, collection_id=main_id)
+        return run
+
+    def collection_names():
+        with engine.connect() as connection:
+            read_collection_names(connection)
+
+    def sidebar_stats():
+        with Session() as db:
+            crud.get_stats(db)
+            crud.get_daily_activity(db)
+
+    def export(fmt):
+        def run():
+            with Session() as db:
+                export_table(db, "collection_part", fmt, tmp / f"export.{fmt}", collection_id=main_id)
+        return run
+
+    def collect():
+        port = _free_port()
+        devnet = _start_devnet(port)
+        try:
+            source = ChainSource("Bench devnet", "ethereum", f"http://127.0.0.1:{port}", 12.0)
+            collector = Collector(session_factory=Session)
+            since = datetime.now(timezone.utc) - timedelta(hours=1)
+            asyncio.run(collector.collect(scratch["bench-collect"], [source], since))
+        finally:
+            devnet.terminate()
+            devnet.wait()
+
+    def enrich():
+        # force: the collection was already enriched by the previous runs
+        enricher = Enricher(OFFLINE_ENRICHMENTS, session_factory=Session, cache=LookupCache(Session), force=True)
+        asyncio.run(enricher.enrich_collection(enrich_id))
+
+    def drop_built():
+        # So that every run builds from scratch without build state, like the first one
+        with Session() as db:
+            built = crud.get_collection_by_name(db, crud.get_collection(db, main_id).name + BUILT_SUFFIX)
+            if built is not None:
+                crud.delete_collection(db, built.id)
+
+    def build():
+        TransactionBuilder(DEFAULT_BUILD_OPTIONS, session_factory=Session).build_collection(main_id)
+
+    # Parts collected after the full build, from later blocks (new tx hashes, existing senders)
+    changed_rows = 1000
+    changed_ids: List[int] = []
+
+    def add_changed_parts():
+        with Session() as db:
+            last_id = crud.get_last_part_id(db, main_id)
+            crud.bulk_create_collection_parts(db, main_id, iter_parts(changed_rows, first_round=2_000_000))
+            changed_ids[:] = db.execute(select(CollectionPart.id).where(
+                CollectionPart.collection_id == main_id, CollectionPart.id > last_id
+            )).scalars().all()
+
+    def build_incremental():
+        TransactionBuilder(DEFAULT_BUILD_OPTIONS, session_factory=Session).build_collection(main_id)
+
+    def remove_changed_parts():
+        with Session() as db:
+            crud.delete_collection_parts_by_id(db, main_id, changed_ids)
+        build_incremental()  # drops what was built from them, for the next run
+
+    return [
+        Benchmark(
+            "crud.bulk_create_100k", bulk_write, repeat=3,
+            setup=new_collection("bench-write"), teardown=drop_collection("bench-write")
+        ),
+        Benchmark("viewer.first_page", page(collection_id=main_id), repeat=20),
+        Benchmark("viewer.deep_page", page(collection_id=main_id, after_id=middle_id), repeat=20),
+        Benchmark("viewer.search", search_page(search), repeat=5),
+        Benchmark("viewer.collection_names", collection_names, repeat=20),
+        Benchmark("sidebar.stats", sidebar_stats, repeat=20),
+        Benchmark("export.csv", export("csv"), repeat=1),
+        Benchmark("export.parquet", export("parquet"), repeat=1),
+        Benchmark(
+            "stage.collect", collect, repeat=1,
+            setup=new_collection("bench-collect"), teardown=drop_collection("bench-collect")
+        ),
+        Benchmark("stage.enrich", enrich, repeat=1),
+        Benchmark("stage.build", build, repeat=1, setup=drop_built),
+        # After stage.build, which leaves the build state to update
+        Benchmark(
+            "stage.build_incremental", build_incremental, repeat=3,
+            setup=add_changed_parts, teardown=remove_changed_parts
+        ),
+    ]
+
+
+def baseline_key(url: str, rows: int) -> str:
+    return f"{make_url(url).get_backend_name()}-{rows}"
+
+
+def load_baselines() -> dict:
+    return json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Parts in the dataset's main collection")
+    parser.add_argument("--url", help="Database to run on (default: a cached SQLite dataset in --data-dir)")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    parser.add_argument("--only", action="append", help="Only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--max-ratio", type=float, default=2.0, help="Fail when this many times slower than baseline")
+    parser.add_argument("--save", action="store_true", help="Record the results as the new baselines")
+    parser.add_argument(
+        "--allow-regression", action="store_true", help="Save even the results more than --max-ratio times slower"
+    )
+    args = parser.parse_args()
+
+    url = args.url or default_url(args.rows, args.data_dir)
+    engine = create_database_engine(url)
+    ids = ensure_dataset(engine, args.rows)
+    baselines = load_baselines()
+    key = baseline_key(url, args.rows)
+    previous = baselines.get(key, {}).get("results", {})
+
+    results, failures = {}, 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for benchmark in build_benchmarks(engine, ids, args.rows, Path(tmp)):
+            if args.only and not any(part in benchmark.name for part in args.only):
+                continue
+            timings = benchmark.measure()
+            best = results[benchmark.name] = min(timings)
+            baseline = previous.get(benchmark.name)
+            if baseline is None:
+                verdict = "new"
+            else:
+                ratio = best / baseline
+                failed = ratio > args.max_ratio and best - baseline > MIN_DIFFERENCE
+                failures += failed
+                verdict = f"{ratio:5.2f}x" + ("  FAIL" if failed else "")
+            print(
+                f"{benchmark.name:<24} {best * 1000:10.1f} ms (median {statistics.median(timings) * 1000:10.1f} ms)"
+                f" | baseline {f'{baseline * 1000:10.1f} ms' if baseline is not None else '-':>13} | {verdict}",
+                flush=True
+            )
+
+    if args.save and failures and not args.allow_regression:
+        print(f"Not saving: {failures} benchmark(s) regressed; pass --allow-regression to record them anyway")
+    elif args.save:
+        baselines[key] = {
+            "recorded": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            "machine": f"{platform.machine()}, {os.cpu_count()} CPUs, Python {platform.python_version()}",
+            "results": {**previous, **{name: round(value, 6) for name, value in results.items()}},
+        }
+        BASELINES.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Saved baselines for {key} to {BASELINES}")
+    sys.exit(1 if failures and not (args.save and args.allow_regression) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic dataset for the benchmarks: multi-chain collected transactions.
+
+Parts are exactly what the Collector writes: `block_to_parts` over `Devnet`
+blocks of Ethereum, Polygon and Arbitrum, interleaved by block time as a
+multi-source collect run stores them. Block timestamps are pinned, so the same
+`rows` always produce the same parts (only `created_at` differs).
+
+The dataset is two collections: `bench-<rows>` with `rows` parts (read by the
+viewer, export, stats and builder benchmarks) and `bench-<rows>-enrich` with
+`rows // 10` parts (rewritten by the enricher benchmark). It is generated once
+into a SQLite file under `--data-dir` (or into `--url`) and reused.
+
+Usage: python benchmarks/dataset.py [--rows 1000000] [--url URL] [--data-dir DIR]
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import Engine
+from sqlalchemy.orm import sessionmaker
+
+from fdc.db import crud
+from fdc.db.models import Base
+from fdc.db.session import create_database_engine
+from fdc.pipeline.collector import block_to_parts
+from fdc.pipeline.devnet import Devnet
+
+# Bump when the generated parts or the schema change, so cached datasets are regenerated
+DATASET_VERSION = 7
+
+DEFAULT_ROWS = 1_000_000
+DEFAULT_DATA_DIR = Path(os.path.expanduser("~/.internal-tools/bench"))
+
+# chain, chain id, seconds per block, transactions per block
+CHAINS = (
+    ("ethereum", 1, 12.0, 150),
+    ("polygon", 137, 2.0, 40),
+    ("arbitrum", 42161, 0.25, 4),
+)
+ROUND_SECONDS = 12.0  # one Ethereum block, 6 Polygon blocks, 48 Arbitrum blocks
+FIRST_BLOCK = 20_000_000
+START_TIME = 1_767_225_600  # 2026-01-01T00:00:00Z, timestamp of every chain's FIRST_BLOCK
+ADDRESSES = 5000  # sender pool per chain; targets are a tenth of it
+
+
+def _devnets() -> Dict[str, Devnet]:
+    devnets = {}
+    for chain, chain_id, block_time, txs_per_block in CHAINS:
+        devnet = Devnet(chain_id=chain_id, block_time=block_time, txs_per_block=txs_per_block, addresses=ADDRESSES)
+        devnet.genesis_time = START_TIME - FIRST_BLOCK * block_time
+        devnets[chain] = devnet
+    return devnets
+
+
+def iter_parts(rows: int, first_round: int = 0) -> Iterator[dict]:
+    """Yield `rows` collection part mappings (with `order`), starting at round `first_round`."""
+    devnets = _devnets()
+    order = 0
+    for round_number in itertools.count(first_round):
+        for chain, _, block_time, _ in CHAINS:
+            blocks = int(ROUND_SECONDS / block_time)
+            for number in range(FIRST_BLOCK + round_number * blocks, FIRST_BLOCK + (round_number + 1) * blocks):
+                for part in block_to_parts(chain, devnets[chain].block(number, full=True)):
+                    if order == rows:
+                        return
+                    part["order"] = order
+                    order += 1
+                    yield part
+
+
+def collection_names(rows: int) -> Dict[str, str]:
+    """Names of the dataset's collections: `main` and `enrich`."""
+    return {"main": f"bench-{rows}-v{DATASET_VERSION}", "enrich": f"bench-{rows}-v{DATASET_VERSION}-enrich"}
+
+
+def default_url(rows: int, data_dir: Path = DEFAULT_DATA_DIR) -> str:
+    return f"sqlite:///{Path(data_dir) / f'fdc-bench-{rows}-v{DATASET_VERSION}.sqlite'}"
+
+
+def ensure_dataset(engine: Engine, rows: int, log=print) -> Dict[str, int]:
+    """Generate the dataset in `engine`'s database unless it is there; return the collection ids."""
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(engine)
+    sizes = {"main": rows, "enrich": rows // 10}
+    ids = {}
+    with Session() as db:
+        for key, name in collection_names(rows).items():
+            collection = crud.get_collection_by_name(db, name)
+            if collection is not None and crud.count_collection_parts(db, collection.id) == sizes[key]:
+                ids[key] = collection.id
+                continue
+            if collection is not None:
+                crud.delete_collection(db, collection.id)  # left over from an interrupted run
+            started = time.perf_counter()
+            collection = crud.create_collection(db, name, f"Synthetic benchmark dataset, {sizes[key]:,} parts")
+            # The enrich collection takes later blocks, so tx hashes differ from the main one
+            first_round = 0 if key == "main" else 1_000_000
+            crud.bulk_create_collection_parts(db, collection.id, iter_parts(sizes[key], first_round), 10_000)
+            ids[key] = collection.id
+            log(f"Generated {name}: {sizes[key]:,} parts in {time.perf_counter() - started:.1f}s")
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Parts in the main collection")
+    parser.add_argument("--url", help="Database to generate into (default: a SQLite file in --data-dir)")
+    parser.add_argument("--data-dir", type=Path, default=DEFAULT_DATA_DIR)
+    args = parser.parse_args()
+    url = args.url or default_url(args.rows, args.data_dir)
+    ids = ensure_dataset(create_database_engine(url), args.rows)
+    print(f"{url}: collections {ids}")
+
+
+if __name__ == "__main__":
+    main()
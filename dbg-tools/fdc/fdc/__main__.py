@@ -1,6 +1,6 @@
 """Entry point for the FDC CLI."""
 
-from cli import main
+from fdc.cli import main
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,5 @@
 """Streamlit app for Fast & Dirty Commit - Blockchain Transaction Processing."""
 
-import json
 import streamlit as st
 
 # Import UI components from our modular structure - only importing what we use directly in this file
@@ -10,11 +9,14 @@ from fdc.ui import (
     render_collector_stage,
     render_enricher_stage,
     render_builder_stage,
-    update_progress
+    render_performance_view,
+    rerun_unit_of_work
 )
 
 # Import database functionality
-from fdc.db.models import Collection, CollectionPart
+from fdc.db import crud
+from fdc.db.models import Collection
+from fdc.metrics import REGISTRY
 
 
 def app():
@@ -26,8 +28,17 @@ def app():
         layout="wide",
     )
 
-    conn = st.connection('sql')
-    
+    REGISTRY.inc("fdc_reruns_total", kind="app")
+    # One session and connection for every renderer of this rerun
+    with rerun_unit_of_work() as s:
+        render_page(s)
+
+    # Publish this server's metrics to the Performance view and `fdc metrics`
+    REGISTRY.flush()
+
+
+def render_page(s):
+    """Render the page, reading and writing through the rerun's session `s`."""
     # Initialize session state
     initialize_session_state()
     
@@ -39,25 +50,18 @@ def app():
     render_sidebar()
     
     # For demonstration purposes, create a sample collection if none exist
-    with conn.session as s:
-        # Create a Collection with 5 Collection Parts and commit to DB, if There are not already collections
-        if not s.query(Collection).count():
-            collection = Collection(name="Sample Collection", description="A demonstration collection")
-            s.add(collection)
-            s.commit()
-            
-            # Create 5 Collection Parts and commit to DB
-            for i in range(5):
-                collection_part = CollectionPart(
-                    collection_id=collection.id,
-                    name=f"Part {i+1}",
-                    content=f"Sample content for the part {i+1}",
-                    data=json.dumps({"type": "sample", "version": "1.0"}),
-                    order=i
-                )
-                s.add(collection_part)
-            s.commit()
-        
+    # Create a Collection with 5 Collection Parts through crud (stats, versions and blobs), if there are none yet
+    if not s.query(Collection).count():
+        collection = crud.create_collection(s, "Sample Collection", "A demonstration collection")
+        crud.bulk_create_collection_parts(s, collection.id, [
+            {
+                "name": f"Part {i+1}",
+                "content": f"Sample content for the part {i+1}",
+                "data": {"type": "sample", "version": "1.0"},
+                "order": i,
+            }
+            for i in range(5)
+        ])
     
     # Main content - Three-legged process
     col1, col2 = st.columns([2, 3])
@@ -71,13 +75,13 @@ def app():
         render_enricher_stage()
         render_builder_stage()
     
-    # Right column - DB Viewer
+    # Right column - DB Viewer, or the Performance view
     with col2:
-        # Display different views based on the selected table
-        render_db_viewer(st.session_state.selected_table)
-    
-    # Auto-increment progress for running processes
-    update_progress()
+        if st.session_state.view == "Performance":
+            render_performance_view()
+        else:
+            # Display different views based on the selected table
+            render_db_viewer(st.session_state.selected_table)
 
 
 def initialize_session_state():
@@ -92,6 +96,8 @@ def initialize_session_state():
         st.session_state.progress = {"collect": 0, "enrich": 0, "build": 0}
     if "selected_table" not in st.session_state:
         st.session_state.selected_table = "collection"
+    if "view" not in st.session_state:
+        st.session_state.view = "Database"
     if "db_session" not in st.session_state:
         st.session_state.db_session = None
 
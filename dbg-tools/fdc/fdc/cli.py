@@ -64,72 +64,203 @@ def main():
         click.echo(f"Error: {e}", err=True)
         sys.exit(1)
 
-# Migration-related commands
+@cli.command()
+@click.argument("table", type=click.Choice(["collection", "collection_part"]))
+@click.option("--format", "fmt", type=click.Choice(["csv", "ndjson", "parquet"]), default="csv", show_default=True)
+@click.option("--collection-id", type=int, help="Only export the parts of this collection")
+@click.option("--search", help="Only export rows containing this text")
+@click.option("--output", "-o", type=click.Path(dir_okay=False, writable=True), help="Output file (default: <table>.<format>)")
+@click.option("--batch-size", type=int, default=10_000, show_default=True, help="Rows streamed per batch")
+def export(table, fmt, collection_id, search, output, batch_size):
+    """Export a table (or one collection's parts) to CSV, NDJSON or Parquet."""
+    import time
+    from fdc.db.export import EXPORT_FORMATS, export_table
+    from fdc.db.session import Session
+
+    output = output or f"{table}{EXPORT_FORMATS[fmt][0]}"
+    started = time.perf_counter()
+    with Session() as db:
+        rows = export_table(
+            db, table, fmt, output, collection_id=collection_id, batch_size=batch_size, search=search
+        )
+    click.echo(f"Exported {rows:,} rows to {output} in {time.perf_counter() - started:.1f}s")
+
+
+def _choices(values, choices, option):
+    """Match comma-separated (or repeated) option values to `choices`, ignoring case."""
+    by_name = {choice.lower(): choice for choice in choices}
+    matched = []
+    for value in (item.strip() for value in values for item in value.split(",")):
+        if value.lower() not in by_name:
+            raise click.BadParameter(f"{value!r} is not one of {', '.join(map(repr, choices))}", param_hint=option)
+        matched.append(by_name[value.lower()])
+    return matched
+
+
+@cli.command()
+@click.option(
+    "--sources", "-s", multiple=True, required=True,
+    help="Chains to collect, repeated or comma-separated ('All Chains' for every chain)"
+)
+@click.option("--range", "time_range", default="Last hour", show_default=True, help="Time range to collect")
+@click.option("--since", type=click.DateTime(), help="Collect from this UTC time instead of a range")
+@click.option("--until", type=click.DateTime(), help="Collect up to this UTC time (default: now)")
+@click.option("--enrich", "enrichments", multiple=True, help="Enrichment options (default: the first two)")
+@click.option("--build", "build_options", multiple=True, help="Builder options (default: the UI defaults)")
+@click.option("--no-enrich", is_flag=True, help="Skip the Enricher stage")
+@click.option("--no-build", is_flag=True, help="Skip the Transaction Builder stage")
+@click.option("--rebuild", is_flag=True, help="Rebuild the collection from scratch instead of updating it")
+@click.option("--force", is_flag=True, help="Re-enrich parts that are already enriched")
+@click.option("--collection-id", type=int, help="Collect into this collection (resuming from its checkpoints)")
+@click.option("--queue-size", type=int, default=4, show_default=True, help="Batches buffered between two stages")
+def run(sources, time_range, since, until, enrichments, build_options, no_enrich, no_build, rebuild, force,
+        collection_id, queue_size):
+    """Run collect -> enrich -> build headlessly as one streaming pipeline."""
+    import time
+    from datetime import datetime, timezone
+    from fdc.pipeline.builder import BUILD_OPTIONS, DEFAULT_BUILD_OPTIONS, GROUP_TRANSACTIONS, REBUILD
+    from fdc.pipeline.collector import SOURCES, TIME_RANGES
+    from fdc.pipeline.enricher import ENRICHMENT_OPTIONS
+    from fdc.pipeline.stream import run_pipeline
+
+    source_names = _choices(sources, [*SOURCES, "All Chains"], "--sources")
+    if since is None:
+        time_range = _choices([time_range], list(TIME_RANGES), "--range")[0]
+        since = datetime.now(timezone.utc) - TIME_RANGES[time_range]
+    else:
+        time_range = "Custom"
+        since = since.replace(tzinfo=timezone.utc)
+    if until is not None:
+        until = until.replace(tzinfo=timezone.utc)
+    enrich_options = None
+    if not no_enrich:
+        enrich_options = _choices(enrichments, ENRICHMENT_OPTIONS, "--enrich") or ENRICHMENT_OPTIONS[:2]
+    options = None
+    if not no_build:
+        options = _choices(build_options, list(BUILD_OPTIONS), "--build") or list(DEFAULT_BUILD_OPTIONS)
+        if rebuild and REBUILD not in options:
+            options.append(REBUILD)
+
+    started = time.perf_counter()
+
+    def progress(stats):
+        line = f"[{time.perf_counter() - started:7.1f}s] collect {stats.collect_progress:4.0%}"
+        if enrich_options is not None:
+            line += f" | enrich {stats.enrich.parts:,} parts"
+        if options is not None:
+            line += f" | build {stats.build.source_parts:,} parts"
+        if stats.queued:
+            line += " | queued " + " ".join(f"{size}/{queue_size}" for size in stats.queued)
+        click.echo(line)
+
+    stats = run_pipeline(
+        source_names, since, until, time_range=time_range, enrich_options=enrich_options, build_options=options,
+        collection_id=collection_id, queue_size=queue_size, force=force, progress=progress
+    )
+    collect = stats.collect
+    click.echo(
+        f"Collected {collect.parts_written:,} transactions from {collect.blocks:,} blocks "
+        f"({collect.duplicates:,} already collected) into collection #{stats.collection_id}"
+    )
+    if enrich_options is not None:
+        enrich = stats.enrich
+        click.echo(
+            f"Enriched {enrich.parts:,} parts ({enrich.skipped:,} already enriched, "
+            f"{enrich.reused:,} copied from identical parts), {enrich.cache_summary}"
+        )
+    if options is not None:
+        build = stats.build
+        kind = "sender groups" if GROUP_TRANSACTIONS in options else "transactions"
+        if build.incremental:
+            click.echo(
+                f"Updated {build.built_parts:,} {kind} ({build.unchanged:,} unchanged, {build.removed:,} removed) "
+                f"in collection #{build.collection_id}"
+            )
+        else:
+            click.echo(
+                f"Built {build.built_parts:,} {kind} from {build.transactions:,} transactions "
+                f"into collection #{build.collection_id}"
+            )
+    click.echo(f"Done in {stats.elapsed:.1f}s")
+
+
+@cli.command()
+@click.option("--format", "fmt", type=click.Choice(["json", "prometheus"]), default="json", show_default=True)
+@click.option("--reset", is_flag=True, help="Reset the metrics of every process instead of printing them")
+def metrics(fmt, reset):
+    """Print the performance metrics of the app and the stage workers."""
+    from fdc import metrics as fdc_metrics
+
+    if reset:
+        fdc_metrics.clear()
+        click.echo("Metrics reset")
+        return
+    snapshot = fdc_metrics.collect()
+    click.echo(fdc_metrics.to_json(snapshot) if fmt == "json" else fdc_metrics.to_prometheus(snapshot), nl=fmt == "json")
+
+
+# Migration-related commands. They run Alembic in-process (`fdc.db.migrate`),
+# against the same database as the app.
 @cli.group()
 def migrate():
     """Database migration commands (similar to npm run)."""
-    pass
+    import logging
+
+    logging.basicConfig(format="%(levelname)-5.5s [%(name)s] %(message)s")
+    logging.getLogger("alembic").setLevel(logging.INFO)
+    logging.getLogger("alembic.runtime.plugins").setLevel(logging.WARNING)
+    logging.getLogger("fdc.db.migrate").setLevel(logging.INFO)
 
 
 @migrate.command("new")
 @click.argument("message")
-def create_migration(message):
+@click.option("--empty", is_flag=True, help="Create an empty revision instead of autogenerating one")
+def create_migration(message, empty):
     """Create a new migration (alembic revision --autogenerate)."""
+    from fdc.db import migrate as migrations
+
     click.echo(f"Creating new migration: {message}")
-    subprocess.run(
-        ["alembic", "revision", "--autogenerate", "-m", message],
-        cwd=str(Path(__file__).parent.parent)
-    )
+    migrations.revision(message, autogenerate=not empty)
 
 
 @migrate.command("up")
 @click.option("--revision", default="head", help="Migration revision to upgrade to (default: head)")
 def upgrade(revision):
     """Upgrade database to specified revision (alembic upgrade)."""
+    from fdc.db import migrate as migrations
+
     click.echo(f"Upgrading database to revision: {revision}")
-    subprocess.run(
-        ["alembic", "upgrade", revision],
-        cwd=str(Path(__file__).parent.parent)
-    )
+    migrations.upgrade(revision)
 
 
 @migrate.command("down")
 @click.option("--revision", default="-1", help="Number of revisions to downgrade (default: -1)")
 def downgrade(revision):
     """Downgrade database by specified number of revisions (alembic downgrade)."""
+    from fdc.db import migrate as migrations
+
     click.echo(f"Downgrading database by {revision}")
-    subprocess.run(
-        ["alembic", "downgrade", revision],
-        cwd=str(Path(__file__).parent.parent)
-    )
+    migrations.downgrade(revision)
 
 
 @migrate.command("history")
 @click.option("--verbose", "-v", is_flag=True, help="Show detailed information")
 def history(verbose):
     """Show migration history (alembic history)."""
+    from fdc.db import migrate as migrations
+
     click.echo("Migration history:")
-    cmd = ["alembic", "history"]
-    if verbose:
-        cmd.append("--verbose")
-    subprocess.run(
-        cmd,
-        cwd=str(Path(__file__).parent.parent)
-    )
+    migrations.history(verbose)
 
 
 @migrate.command("current")
 @click.option("--verbose", "-v", is_flag=True, help="Show detailed information")
 def current(verbose):
     """Show current migration version (alembic current)."""
+    from fdc.db import migrate as migrations
+
     click.echo("Current migration version:")
-    cmd = ["alembic", "current"]
-    if verbose:
-        cmd.append("--verbose")
-    subprocess.run(
-        cmd,
-        cwd=str(Path(__file__).parent.parent)
-    )
+    migrations.current(verbose)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,32 @@
-"""Database package for FDC."""
+"""Database package for FDC.
 
-from fdc.db.session import engine, Session
-from fdc.db.models import Collection, CollectionPart
-from fdc.db.setup import get_session
+The names below are loaded on first access, so importing `fdc.db` (or one of
+its light submodules such as `fdc.db.crud`) does not create the engine or pull
+in anything it does not use.
+"""
+
+import importlib
+
+# Public name -> module it is loaded from
+_EXPORTS = {
+    "engine": "fdc.db.session",
+    "get_engine": "fdc.db.session",
+    "Session": "fdc.db.session",
+    "Base": "fdc.db.session",
+    "Collection": "fdc.db.models",
+    "CollectionPart": "fdc.db.models",
+    "get_session": "fdc.db.setup",
+    "unit_of_work": "fdc.db.setup",
+}
 
 __all__ = [
-    "Session", "Base",  
+    "engine", "get_engine", "Session", "Base",
     "Collection", "CollectionPart",
-    "get_session"
+    "get_session", "unit_of_work"
 ]
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
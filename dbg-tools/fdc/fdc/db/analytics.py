@@ -0,0 +1,117 @@
+"""Optional DuckDB engine for analytical (whole-collection) scans.
+
+With `FDC_ANALYTICS=duckdb` (and the `duckdb` extra installed) the Transaction
+Builder reads collections through DuckDB instead of paged SQL: DuckDB attaches
+the FDC database read-only with its `sqlite` or `postgres` extension, extracts
+the JSON fields with its vectorized JSON reader and hands Arrow batches straight
+to pandas. Writes always go through `fdc.db.crud`.
+"""
+
+import os
+from typing import Dict, Iterator, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy.engine import URL, make_url
+
+from fdc.db.models import CollectionPart
+
+ANALYTICS_BACKEND = os.environ.get("FDC_ANALYTICS", "").lower()
+
+# DuckDB extension (and ATTACH type) per SQLAlchemy backend
+_EXTENSIONS = {"sqlite": "sqlite", "postgresql": "postgres"}
+
+# Generated `collection_part` columns -> the `data` JSON path they are computed from.
+# DuckDB's SQLite scanner does not see generated columns, so they are re-extracted.
+GENERATED_PATHS = {
+    column.name: column.computed.sqltext.path
+    for column in CollectionPart.__table__.columns if column.computed is not None
+}
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _libpq_dsn(url: URL) -> str:
+    """libpq connection string (what DuckDB's postgres extension takes) for a SQLAlchemy URL."""
+    params = {
+        "host": url.host or url.query.get("host"),
+        "port": url.port,
+        "dbname": url.database,
+        "user": url.username,
+        "password": url.password,
+    }
+    return " ".join(f"{key}={value}" for key, value in params.items() if value)
+
+
+def duckdb_connection(url: str):
+    """An in-memory DuckDB connection with the database at `url` attached read-only as `fdc`."""
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("FDC_ANALYTICS=duckdb needs DuckDB: pip install 'fdc[duckdb]'") from e
+
+    database = make_url(url)
+    backend = database.get_backend_name()
+    if backend not in _EXTENSIONS:
+        raise ValueError(f"DuckDB cannot attach a {backend} database")
+    extension = _EXTENSIONS[backend]
+    target = database.database if backend == "sqlite" else _libpq_dsn(database)
+    connection = duckdb.connect()
+    try:
+        connection.execute(f"LOAD {extension}")
+    except duckdb.Error:
+        connection.execute(f"INSTALL {extension}")
+        connection.execute(f"LOAD {extension}")
+    connection.execute(f"ATTACH {_quote(target)} AS fdc (TYPE {extension}, READ_ONLY)")
+    return connection
+
+
+# A part's content lives in `part_blob` (or, for older parts, in the row itself)
+_CONTENT_SQL = 'coalesce(p."content", b."content")'
+
+
+def _field_sql(column: str, path: Optional[str], type_: Optional[str]) -> str:
+    if path is None and column in GENERATED_PATHS:
+        column, path = "data", GENERATED_PATHS[column]
+    value = _CONTENT_SQL if column == "content" else f'p."{column}"'
+    if path is None:
+        return value
+    if type_ is None:
+        return f'json_extract_string({value}, {_quote(path)})'
+    return f'TRY_CAST(json_extract({value}, {_quote(path)}) AS {type_})'
+
+
+def iter_collection_part_frames(
+    url: str, collection_id: int, fields: Dict[str, Tuple[str, Optional[str]]], batch_size: int,
+    types: Optional[Dict[str, str]] = None, after_id: int = 0, until_id: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """Yield a collection's parts as DataFrames of `part_id` plus `fields`, in id order.
+
+    Same `fields` mapping and id range as `fdc.db.crud.iter_collection_part_fields`.
+    JSON values are read as strings unless `types` gives a DuckDB type for the
+    field (e.g. `{"timestamp": "BIGINT"}`).
+    """
+    types = types or {}
+    columns = ", ".join(
+        ["p.id AS part_id"] + [
+            f'{_field_sql(column, path, types.get(name))} AS "{name}"' for name, (column, path) in fields.items()
+        ]
+    )
+    source = "fdc.collection_part p"
+    if any(column == "content" for column, _ in fields.values()):
+        source += ' LEFT JOIN fdc.part_blob b ON b."hash" = p.content_hash'
+    connection = duckdb_connection(url)
+    try:
+        range_sql, parameters = "p.id > ?", [collection_id, after_id]
+        if until_id is not None:
+            range_sql += " AND p.id <= ?"
+            parameters.append(until_id)
+        connection.execute(
+            f"SELECT {columns} FROM {source} WHERE p.collection_id = ? AND {range_sql} ORDER BY p.id",
+            parameters
+        )
+        for batch in connection.to_arrow_reader(batch_size):
+            yield batch.to_pandas()
+    finally:
+        connection.close()
@@ -1,9 +1,80 @@
 """CRUD operations for interacting with the database."""
 
-from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from itertools import islice, repeat
+from operator import itemgetter
+from typing import List, Optional, Dict, Any, Iterable, Iterator, Sequence, Tuple
+from sqlalchemy import Float, and_, bindparam, case, delete, exists, false, func, or_, select, tuple_, update
+from sqlalchemy.orm import Query, Session
 
-from fdc.db.models import Collection, CollectionPart
+from fdc.db.dialects import (
+    dialect_name, insert_for, json_extract, like_nocase, unix_date, utcnow, written_by_current_transaction
+)
+from fdc.db.models import (
+    Build, BuiltGroup, BuiltTransaction, Collection, CollectionCheckpoint, CollectionPart, DailyActivity, Job,
+    LookupCacheEntry, PartBlob, StatsCounter
+)
+from fdc.db.search import (
+    search_index_row, search_index_stale, search_match, search_part_id, search_score, search_table, search_terms
+)
+
+# Rows per chunk for bulk writes and streamed reads
+DEFAULT_BATCH_SIZE = 10_000
+
+# PostgreSQL writers commit concurrently, so a row stamped shortly before a
+# build started may only become visible after the build read; changes are
+# looked up this much further back there.
+CONCURRENT_WRITE_SLACK = timedelta(minutes=5)
+
+
+def filter_clauses(
+    model, search_columns: List, search: Optional[str],
+    created_from: Optional[datetime], created_to: Optional[datetime]
+) -> List:
+    """Compile the viewer filters (search text, created_at range) into WHERE clauses.
+
+    Parts are searched through the full-text index (whole tokens, see
+    `search_hits`) rather than by substring in `search_columns`.
+    """
+    clauses = []
+    if search and model is CollectionPart:
+        if not search_terms(search):
+            clauses.append(false())
+        else:
+            matches = select(search_part_id()).select_from(search_table).where(search_match(search))
+            clauses.append(CollectionPart.id.in_(matches))
+    elif search:
+        pattern = f"%{search}%"
+        clauses.append(or_(*[like_nocase(column, pattern) for column in search_columns]))
+    if created_from is not None:
+        clauses.append(model.created_at >= created_from)
+    if created_to is not None:
+        clauses.append(model.created_at < created_to)
+    return clauses
+
+
+def search_hits(query: str):
+    """Subquery of the `(part_id, score)` of the parts matching a full-text search query; lower scores rank first.
+
+    All terms of `query` (which must have `fdc.db.search.search_terms`) must
+    match a whole token of the part's name, content or indexed `data` fields,
+    or a token prefix for a term ending with `*`. One index lookup per term,
+    whatever the number of parts.
+    """
+    return select(search_part_id().label("part_id"), search_score(query).label("score"))\
+        .select_from(search_table)\
+        .where(search_match(query))\
+        .subquery("search_hits")
+
+
+def _filter_query(
+    query: Query, model, search_columns: List, search: Optional[str],
+    created_from: Optional[datetime], created_to: Optional[datetime]
+) -> Query:
+    """Apply the viewer filters to an ORM query."""
+    return query.filter(*filter_clauses(model, search_columns, search, created_from, created_to))
 
 
 # Collection CRUD operations
@@ -11,6 +82,8 @@ def create_collection(db: Session, name: str, description: Optional[str] = None)
     """Create a new collection in the database."""
     db_collection = Collection(name=name, description=description)
     db.add(db_collection)
+    _adjust_stats(db, collections=1)
+    _bump_versions(db, "collection")
     db.commit()
     db.refresh(db_collection)
     return db_collection
@@ -21,9 +94,28 @@ def get_collection(db: Session, collection_id: int) -> Optional[Collection]:
     return db.query(Collection).filter(Collection.id == collection_id).first()
 
 
-def get_collections(db: Session, skip: int = 0, limit: int = 100) -> List[Collection]:
-    """Get all collections with pagination."""
-    return db.query(Collection).order_by(Collection.id).offset(skip).limit(limit).all()
+def get_collections(
+    db: Session, skip: int = 0, limit: int = 100, search: Optional[str] = None,
+    created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+    after_id: Optional[int] = None
+) -> List[Collection]:
+    """Get all collections with pagination.
+
+    When `after_id` is given, keyset pagination (`id > after_id`) is used
+    instead of OFFSET so every page costs the same.
+    """
+    query = _filter_query(
+        db.query(Collection), Collection, [Collection.name, Collection.description],
+        search, created_from, created_to
+    )
+    if after_id is not None:
+        query = query.filter(Collection.id > after_id)
+    return query.order_by(Collection.id).offset(skip).limit(limit).all()
+
+
+def get_collection_by_name(db: Session, name: str) -> Optional[Collection]:
+    """Get the most recent collection with the given name."""
+    return db.query(Collection).filter(Collection.name == name).order_by(Collection.id.desc()).first()
 
 
 def update_collection(db: Session, collection_id: int, data: Dict[str, Any]) -> Optional[Collection]:
@@ -32,6 +124,7 @@ def update_collection(db: Session, collection_id: int, data: Dict[str, Any]) ->
     if db_collection:
         for key, value in data.items():
             setattr(db_collection, key, value)
+        _bump_versions(db, "collection")
         db.commit()
         db.refresh(db_collection)
     return db_collection
@@ -41,7 +134,15 @@ def delete_collection(db: Session, collection_id: int) -> bool:
     """Delete a collection by its ID."""
     db_collection = get_collection(db, collection_id)
     if db_collection:
+        parts, activity = _part_stats(db, CollectionPart.collection_id == collection_id)
+        _delete_builds(db, or_(
+            Build.source_collection_id == collection_id, Build.target_collection_id == collection_id
+        ))
+        _unindex_parts(db, CollectionPart.collection_id == collection_id)
+        _delete_blobs(db, collection_id)
         db.delete(db_collection)
+        _adjust_stats(db, collections=-1, parts=-parts, activity=activity, sign=-1)
+        _bump_versions(db, "collection", "collection_part")
         db.commit()
         return True
     return False
@@ -52,18 +153,21 @@ def create_collection_part(
     db: Session, collection_id: int, name: str, content: Optional[str] = None, 
     data: Optional[str] = None, order: Optional[int] = 0
 ) -> CollectionPart:
-    """Create a new collection part in the database."""
-    db_part = CollectionPart(
-        collection_id=collection_id,
-        name=name,
-        content=content,
-        data=data,
-        order=order
-    )
-    db.add(db_part)
-    db.commit()
-    db.refresh(db_part)
-    return db_part
+    """Create a new collection part in the database.
+
+    When the collection already holds a part with the same name and content,
+    that part is returned instead (see `bulk_create_collection_parts`).
+    """
+    part = {"name": name, "content": content, "data": data, "order": order}
+    if content is None:
+        # No payload to share: inserted as is, and found by the id this transaction wrote
+        return get_collection_part(db, bulk_create_derived_parts(db, collection_id, [part])[name])
+    bulk_create_collection_parts(db, collection_id, [part])
+    return db.query(CollectionPart).filter(
+        CollectionPart.collection_id == collection_id,
+        CollectionPart.content_hash == content_hash(content),
+        CollectionPart.name == name
+    ).one()
 
 
 def get_collection_part(db: Session, part_id: int) -> Optional[CollectionPart]:
@@ -72,23 +176,186 @@ def get_collection_part(db: Session, part_id: int) -> Optional[CollectionPart]:
 
 
 def get_collection_parts(
-    db: Session, collection_id: int, skip: int = 0, limit: int = 100
+    db: Session, collection_id: int, skip: int = 0, limit: int = 100,
+    search: Optional[str] = None, created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None, after_id: Optional[int] = None, until_id: Optional[int] = None
 ) -> List[CollectionPart]:
-    """Get all parts for a specific collection with pagination."""
-    return db.query(CollectionPart)\
-        .filter(CollectionPart.collection_id == collection_id)\
-        .order_by(CollectionPart.order)\
+    """Get all parts for a specific collection with pagination.
+
+    When `after_id` is given, parts are paged by `id > after_id` (ordered by id)
+    instead of OFFSET, so deep pages cost the same as the first one; `until_id`
+    then stops the pages at that id (inclusive).
+    """
+    query = db.query(CollectionPart).filter(CollectionPart.collection_id == collection_id)
+    query = _filter_query(
+        query, CollectionPart,
+        [CollectionPart.name, CollectionPart.content, CollectionPart.data],
+        search, created_from, created_to
+    )
+    if after_id is not None:
+        if until_id is not None:
+            query = query.filter(CollectionPart.id <= until_id)
+        return query.filter(CollectionPart.id > after_id)\
+            .order_by(CollectionPart.id)\
+            .limit(limit)\
+            .all()
+    return query.order_by(CollectionPart.order)\
         .offset(skip)\
         .limit(limit)\
         .all()
 
 
+def search_collection_parts(
+    db: Session, query: str, collection_id: Optional[int] = None, skip: int = 0, limit: int = 20,
+    created_from: Optional[datetime] = None, created_to: Optional[datetime] = None
+) -> List[Tuple[CollectionPart, float]]:
+    """Full-text search of the parts of a collection (or of all of them): one page of `(part, score)`, best first.
+
+    Hits are ranked by relevance (`search_hits`), then by id, and paged by
+    OFFSET: only the matching parts are ranked, so deep pages of a selective
+    search (an address, a tx hash) stay cheap. Returns nothing for a query
+    without terms.
+    """
+    if not search_terms(query):
+        return []
+    hits = search_hits(query)
+    statement = select(CollectionPart, hits.c.score).join(hits, CollectionPart.id == hits.c.part_id)\
+        .where(*filter_clauses(CollectionPart, [], None, created_from, created_to))
+    if collection_id is not None:
+        statement = statement.where(CollectionPart.collection_id == collection_id)
+    statement = statement.order_by(hits.c.score, CollectionPart.id).offset(skip).limit(limit)
+    return [tuple(row) for row in db.execute(statement)]
+
+
+def get_collection_parts_by_tx_hash(
+    db: Session, tx_hash: str, collection_id: Optional[int] = None
+) -> List[CollectionPart]:
+    """Get the parts describing a transaction, optionally within one collection."""
+    query = db.query(CollectionPart).filter(CollectionPart.tx_hash == tx_hash)
+    if collection_id is not None:
+        query = query.filter(CollectionPart.collection_id == collection_id)
+    return query.order_by(CollectionPart.id).all()
+
+
+def iter_rows(
+    db: Session, model, columns: Sequence[str], collection_id: Optional[int] = None,
+    search: Optional[str] = None, created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[List[tuple]]:
+    """Stream `columns` of a table (`Collection` or `CollectionPart`) in id order, in batches of tuples.
+
+    Applies the same filters as the viewer queries. Rows come from a single
+    streaming cursor (`yield_per`), so memory stays bounded by `batch_size`
+    whatever the table size.
+    """
+    search_columns = [getattr(model, name) for name in ("name", "description", "content", "data") if hasattr(model, name)]
+    query = _filter_query(
+        db.query(*[getattr(model, column).label(column) for column in columns]), model, search_columns,
+        search, created_from, created_to
+    )
+    if collection_id is not None:
+        query = query.filter(model.collection_id == collection_id)
+    statement = query.order_by(model.id).statement.execution_options(yield_per=batch_size)
+    for partition in db.execute(statement).partitions():
+        yield [tuple(row) for row in partition]
+
+
+def get_part_data_by_hash(
+    db: Session, hashes: Iterable[str], exclude_collection_id: Optional[int] = None
+) -> List[Tuple[str, Optional[str]]]:
+    """Get `(content_hash, data)` of the parts with these payload hashes, in one query per 500 hashes.
+
+    The hash index leads with the collection, so every (few) collection is
+    probed for the hashes.
+    """
+    found = []
+    collections = select(Collection.id)
+    if exclude_collection_id is not None:
+        collections = collections.where(Collection.id != exclude_collection_id)
+    for chunk in _chunked(hashes, 500):
+        query = db.query(CollectionPart.content_hash, CollectionPart.data)\
+            .filter(CollectionPart.collection_id.in_(collections), CollectionPart.content_hash.in_(chunk))
+        found.extend(tuple(row) for row in query)
+    return found
+
+
+def count_collection_parts(db: Session, collection_id: int) -> int:
+    """Count the parts of a collection."""
+    return db.query(func.count(CollectionPart.id))\
+        .filter(CollectionPart.collection_id == collection_id)\
+        .scalar()
+
+
+def get_collection_part_id_cuts(db: Session, collection_id: int, every: int) -> List[int]:
+    """Ids of every `every`-th part of a collection in id order, then its last id.
+
+    Consecutive cuts bound id ranges (`previous < id <= cut`) of `every` parts
+    each (the last one may be shorter), used to shard a collection.
+    """
+    numbered = select(
+        CollectionPart.id, func.row_number().over(order_by=CollectionPart.id).label("position")
+    ).where(CollectionPart.collection_id == collection_id).subquery()
+    cuts = list(db.execute(
+        select(numbered.c.id).where(numbered.c.position % every == 0).order_by(numbered.c.id)
+    ).scalars())
+    last_id = db.query(func.max(CollectionPart.id)).filter(CollectionPart.collection_id == collection_id).scalar()
+    if last_id is not None and (not cuts or cuts[-1] != last_id):
+        cuts.append(last_id)
+    return cuts
+
+
+def get_last_part_id(db: Session, collection_id: int) -> int:
+    """Get the highest part id of a collection (0 when it has no parts)."""
+    return db.query(func.coalesce(func.max(CollectionPart.id), 0))\
+        .filter(CollectionPart.collection_id == collection_id)\
+        .scalar()
+
+
+def get_next_part_order(db: Session, collection_id: int) -> int:
+    """Get the `order` value that follows the last part of a collection."""
+    last = db.query(func.max(CollectionPart.order))\
+        .filter(CollectionPart.collection_id == collection_id)\
+        .scalar()
+    return 0 if last is None else last + 1
+
+
 def update_collection_part(db: Session, part_id: int, data: Dict[str, Any]) -> Optional[CollectionPart]:
-    """Update a collection part by its ID."""
+    """Update a collection part by its ID.
+
+    A new content is hashed into a blob, and the old blob is deleted once no
+    part uses it. Raises ValueError when another part of the collection
+    already holds the new name and content.
+    """
     db_part = get_collection_part(db, part_id)
     if db_part:
+        old_hash = db_part.content_hash
+        new_hash = old_hash
+        if "content" in data:
+            new_hash = content_hash(data["content"]) if data["content"] is not None else None
+        name = data.get("name", db_part.name)
+        if new_hash is not None and (new_hash, name) != (old_hash, db_part.name) and db.execute(
+            select(CollectionPart.id).where(
+                CollectionPart.collection_id == db_part.collection_id,
+                CollectionPart.content_hash == new_hash,
+                CollectionPart.name == name
+            )
+        ).first():
+            raise ValueError(
+                f"Collection {db_part.collection_id} already holds a part with this name and content"
+            )
+        if "content" in data:
+            _put_blobs(db, {new_hash: data["content"]} if new_hash is not None else None)
+            db_part.inline_content, db_part.content_hash = None, new_hash
         for key, value in data.items():
-            setattr(db_part, key, value)
+            if key != "content":
+                setattr(db_part, key, value)
+        if _INDEXED_COLUMNS & data.keys():
+            db.flush()
+            _reindex_parts(db, CollectionPart.id == part_id)
+        if old_hash is not None and old_hash != db_part.content_hash:
+            db.flush()
+            _delete_unused_blobs(db, [old_hash])
+        _bump_versions(db, "collection_part")
         db.commit()
         db.refresh(db_part)
     return db_part
@@ -98,7 +365,965 @@ def delete_collection_part(db: Session, part_id: int) -> bool:
     """Delete a collection part by its ID."""
     db_part = get_collection_part(db, part_id)
     if db_part:
+        parts, activity = _part_stats(db, CollectionPart.id == part_id)
+        _detach_builds(db, db_part.collection_id, CollectionPart.id == part_id)
+        _unindex_parts(db, CollectionPart.id == part_id)
+        _delete_blobs(db, db_part.collection_id, CollectionPart.id == part_id)
         db.delete(db_part)
+        _adjust_stats(db, parts=-parts, activity=activity, sign=-1)
+        _bump_versions(db, "collection_part")
         db.commit()
         return True
     return False
+
+
+def delete_collection_parts_from_block(db: Session, collection_id: int, chain: str, from_block: int) -> int:
+    """Delete the parts of `chain` at or above `from_block` (used to rewind reorgs)."""
+    return _delete_parts(
+        db,
+        collection_id,
+        CollectionPart.chain == chain,
+        CollectionPart.block_number >= from_block
+    )
+
+
+def delete_collection_parts(db: Session, collection_id: int) -> int:
+    """Delete every part of a collection in a single statement."""
+    return _delete_parts(db, collection_id)
+
+
+def delete_collection_parts_by_id(db: Session, collection_id: int, part_ids: Iterable[int]) -> int:
+    """Delete parts of a collection by id, in one statement (and commit) per 500 ids."""
+    return sum(
+        _delete_parts(db, collection_id, CollectionPart.id.in_(chunk)) for chunk in _chunked(part_ids, 500)
+    )
+
+
+def _delete_parts(db: Session, collection_id: int, *criteria) -> int:
+    """Delete the parts of a collection matching `criteria`, keeping the stats tables current."""
+    parts, activity = _part_stats(db, CollectionPart.collection_id == collection_id, *criteria)
+    if not parts:
+        return 0
+    # The helpers add the collection condition (repeated, it skews PostgreSQL's estimates)
+    _detach_builds(db, collection_id, *criteria)
+    _unindex_parts(db, CollectionPart.collection_id == collection_id, *criteria)
+    _delete_blobs(db, collection_id, *criteria)
+    result = db.execute(delete(CollectionPart).where(CollectionPart.collection_id == collection_id, *criteria))
+    _adjust_stats(db, parts=-parts, activity=activity, sign=-1)
+    _bump_versions(db, "collection_part")
+    db.commit()
+    return result.rowcount
+
+
+# Stats (row counters, table versions and daily transaction activity)
+#
+# Every write path above keeps `stats_counter` and `daily_activity` current in
+# the same transaction: inserts roll up the new rows with one aggregate over
+# their id range, deletes subtract the rows they are about to delete. Readers
+# (the sidebar) then never touch `collection_part`. `refresh_stats` rebuilds
+# both tables from scratch should they ever drift.
+#
+# The search index (`fdc.db.search`) is kept the same way: inserts index
+# their id range with one INSERT ... SELECT, deletes unindex the rows they are
+# about to delete, and updates of names, contents or data re-index theirs.
+#
+# Writes also bump a per-table "version:<table>" counter, which cached readers
+# (the viewer) use as part of their cache key.
+
+_PART_DAY = unix_date(json_extract(CollectionPart.data, "$.timestamp", Float))
+
+
+def _part_stats(db: Session, *criteria) -> Tuple[int, List[Tuple[date, str, int]]]:
+    """Count the parts matching `criteria` and their transactions per (day, chain), in one scan."""
+    # Parts other than dated transactions fall into the groups without a day
+    day = case((CollectionPart.type == "transaction", _PART_DAY))
+    chain = func.coalesce(CollectionPart.chain, "")
+    groups = db.execute(select(day, chain, func.count()).where(*criteria).group_by(day, chain)).all()
+    parts = sum(count for _, _, count in groups)
+    return parts, [tuple(row) for row in groups if row[0] is not None]
+
+
+def _adjust_stats(
+    db: Session, collections: int = 0, parts: int = 0,
+    activity: Sequence[Tuple[date, str, int]] = (), sign: int = 1
+) -> None:
+    """Add deltas to the stats tables (without committing)."""
+    for name, delta in (("collection", collections), ("collection_part", parts)):
+        if delta:
+            statement = insert_for(db, StatsCounter).values(name=name, value=delta)
+            db.execute(statement.on_conflict_do_update(
+                index_elements=[StatsCounter.name], set_={"value": StatsCounter.value + delta}
+            ))
+    if activity:
+        statement = insert_for(db, DailyActivity).values([
+            {"day": day, "chain": chain, "transactions": sign * count} for day, chain, count in activity
+        ])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[DailyActivity.day, DailyActivity.chain],
+            set_={"transactions": DailyActivity.transactions + statement.excluded.transactions}
+        ))
+        if sign < 0:
+            db.execute(delete(DailyActivity).where(DailyActivity.transactions <= 0))
+
+
+def _bump_versions(db: Session, *tables: str) -> None:
+    """Increment the version counters of `tables` (without committing)."""
+    for table in tables:
+        statement = insert_for(db, StatsCounter).values(name=f"version:{table}", value=1)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[StatsCounter.name], set_={"value": StatsCounter.value + 1}
+        ))
+
+
+def get_table_versions(db: Session) -> Dict[str, int]:
+    """Get the version counter of every written table, e.g. `{"collection_part": 42}`."""
+    counters = db.query(StatsCounter).filter(StatsCounter.name.like("version:%")).all()
+    return {counter.name.split(":", 1)[1]: counter.value for counter in counters}
+
+
+def _max_part_id(db: Session) -> int:
+    return db.execute(select(func.coalesce(func.max(CollectionPart.id), 0))).scalar_one()
+
+
+def _record_inserted_parts(db: Session, *criteria) -> int:
+    """Add freshly inserted parts (matched by `criteria`) to the stats tables; returns their number."""
+    parts, activity = _part_stats(db, *criteria, written_by_current_transaction(db, CollectionPart.__table__))
+    _adjust_stats(db, parts=parts, activity=activity)
+    return parts
+
+
+def _index_parts(db: Session, *criteria) -> None:
+    """Add the parts matching `criteria`, which the search index must not hold yet, to it (without committing).
+
+    Inserts pass their new ids; checking every row against the index instead
+    (an FTS5 lookup per row) would take about a third of indexing them.
+    """
+    index, row = search_index_row(db)
+    db.execute(index.insert().from_select(list(index.c), select(*row).select_from(CollectionPart).where(*criteria)))
+
+
+def _unindex_parts(db: Session, *criteria) -> None:
+    """Remove the parts matching `criteria` from the search index (before deleting or re-indexing them)."""
+    db.execute(delete(search_table).where(
+        search_part_id().in_(select(CollectionPart.id).where(*criteria))
+    ))
+
+
+def _reindex_parts(db: Session, *criteria) -> None:
+    """Index the parts matching `criteria` again after their names, contents or data changed.
+
+    Only the parts whose indexed text actually changed are rewritten (e.g. not
+    those an enrichment found no labels for).
+    """
+    stale = select(CollectionPart.id)\
+        .join(search_table, search_part_id() == CollectionPart.id)\
+        .where(*criteria, search_index_stale(db))\
+        .correlate(None)
+    db.execute(delete(search_table).where(search_part_id().in_(stale)))
+    _index_parts(db, *criteria, ~exists().select_from(search_table).where(search_part_id() == CollectionPart.id))
+
+
+def get_stats(db: Session) -> Dict[str, int]:
+    """Get the maintained row counters, e.g. `{"collection": 3, "collection_part": 120000}`."""
+    counters = db.query(StatsCounter).filter(StatsCounter.name.not_like("version:%")).all()
+    return {counter.name: counter.value for counter in counters}
+
+
+def get_daily_activity(db: Session, days: int = 30) -> List[DailyActivity]:
+    """Get the per-day, per-chain transaction counts of the latest `days` days with activity."""
+    last_day = db.query(func.max(DailyActivity.day)).scalar()
+    if last_day is None:
+        return []
+    return db.query(DailyActivity)\
+        .filter(DailyActivity.day > last_day - timedelta(days=days))\
+        .order_by(DailyActivity.day, DailyActivity.chain)\
+        .all()
+
+
+def refresh_stats(db: Session) -> None:
+    """Recompute the stats tables from the data tables (a full scan); versions are kept."""
+    db.execute(delete(StatsCounter).where(StatsCounter.name.not_like("version:%")))
+    db.execute(delete(DailyActivity))
+    collections = db.execute(select(func.count()).select_from(Collection)).scalar_one()
+    parts, activity = _part_stats(db)
+    _adjust_stats(db, collections=collections, parts=parts, activity=activity)
+    db.commit()
+
+
+# CollectionCheckpoint CRUD operations
+def get_checkpoint(db: Session, collection_id: int, source: str) -> Optional[CollectionCheckpoint]:
+    """Get the collection high-water mark for a source."""
+    return db.query(CollectionCheckpoint).filter(
+        CollectionCheckpoint.collection_id == collection_id,
+        CollectionCheckpoint.source == source
+    ).first()
+
+
+def get_checkpoints(db: Session, collection_id: int) -> List[CollectionCheckpoint]:
+    """Get the high-water marks of every source of a collection."""
+    return db.query(CollectionCheckpoint)\
+        .filter(CollectionCheckpoint.collection_id == collection_id)\
+        .order_by(CollectionCheckpoint.source)\
+        .all()
+
+
+def set_checkpoint(db: Session, collection_id: int, source: str, block_number: int, block_hash: str) -> None:
+    """Insert or move the high-water mark of a source."""
+    statement = insert_for(db, CollectionCheckpoint).values(
+        collection_id=collection_id, source=source, block_number=block_number, block_hash=block_hash
+    )
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["collection_id", "source"],
+        set_={
+            "block_number": statement.excluded.block_number,
+            "block_hash": statement.excluded.block_hash,
+            "updated_at": utcnow(),
+        }
+    ))
+    db.commit()
+
+
+# Lookup cache operations
+def get_cached_lookups(db: Session, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+    """Get the unexpired cached values for `keys` in one query per 500 keys."""
+    found = {}
+    for chunk in _chunked(keys, 500):
+        rows = db.query(LookupCacheEntry.key, LookupCacheEntry.value).filter(
+            LookupCacheEntry.namespace == namespace,
+            LookupCacheEntry.key.in_(chunk),
+            LookupCacheEntry.expires_at > utcnow()
+        )
+        found.update((key, json.loads(value)) for key, value in rows)
+    return found
+
+
+def put_cached_lookups(db: Session, namespace: str, values: Dict[str, Any], expires_at: datetime) -> None:
+    """Insert or refresh cached lookup values, expiring at `expires_at` (naive UTC)."""
+    if not values:
+        return
+    statement = insert_for(db, LookupCacheEntry)
+    statement = statement.on_conflict_do_update(
+        index_elements=["namespace", "key"],
+        set_={"value": statement.excluded.value, "expires_at": statement.excluded.expires_at}
+    )
+    db.execute(statement, [
+        {"namespace": namespace, "key": key, "value": json.dumps(value), "expires_at": expires_at}
+        for key, value in values.items()
+    ])
+    db.commit()
+
+
+# Job CRUD operations
+def create_job(
+    db: Session, stage: str, params: Optional[Dict[str, Any]] = None, collection_id: Optional[int] = None
+) -> Job:
+    """Create a pending job for a pipeline stage."""
+    db_job = Job(
+        stage=stage,
+        status="pending",
+        progress=0.0,
+        params=json.dumps(params or {}, default=str),
+        collection_id=collection_id
+    )
+    db.add(db_job)
+    db.commit()
+    db.refresh(db_job)
+    return db_job
+
+
+def get_job(db: Session, job_id: int) -> Optional[Job]:
+    """Get a job by its ID."""
+    return db.query(Job).filter(Job.id == job_id).first()
+
+
+def get_latest_job(db: Session, stage: str) -> Optional[Job]:
+    """Get the most recent job of a stage (an index seek on `ix_job_stage_id`)."""
+    return db.query(Job).filter(Job.stage == stage).order_by(Job.id.desc()).first()
+
+
+def update_job(db: Session, job_id: int, data: Dict[str, Any]) -> Optional[Job]:
+    """Update a job by its ID."""
+    db_job = get_job(db, job_id)
+    if db_job:
+        for key, value in data.items():
+            setattr(db_job, key, value)
+        db.commit()
+        db.refresh(db_job)
+    return db_job
+
+
+def set_job_progress(db: Session, job_id: int, progress: float, message: Optional[str] = None) -> bool:
+    """Record progress of a running job with a single UPDATE.
+
+    Returns False when the job is no longer running (e.g. a stop was
+    requested), which workers use as their cancellation signal.
+    """
+    values = {"progress": progress}
+    if message is not None:
+        values["message"] = message
+    result = db.execute(
+        update(Job).where(Job.id == job_id, Job.status == "running").values(**values)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+# Build state operations
+#
+# A `Build` row tracks the build of a source collection into its "(built)"
+# collection; `built_transaction` holds every transaction built so far with
+# the source part it came from and that part's input fingerprint, and
+# `built_group` the part holding each sender group. `fdc.pipeline.builder`
+# compares the fingerprints of the parts changed since the last run with
+# these to rebuild only what changed. The delete paths keep them consistent:
+# transactions of deleted source parts are marked orphaned, and deleted built
+# parts are unlinked.
+
+def get_build(db: Session, target_collection_id: int) -> Optional[Build]:
+    """Get the build state of a built collection."""
+    return db.query(Build).filter(Build.target_collection_id == target_collection_id).first()
+
+
+def create_build(db: Session, source_collection_id: int, target_collection_id: int, options: Sequence[str]) -> Build:
+    """Start tracking the build of a collection into `target_collection_id`."""
+    db_build = Build(
+        source_collection_id=source_collection_id,
+        target_collection_id=target_collection_id,
+        options=json.dumps(sorted(options))
+    )
+    db.add(db_build)
+    db.commit()
+    db.refresh(db_build)
+    return db_build
+
+
+def reset_build(db: Session, build_id: int, source_collection_id: int, options: Sequence[str]) -> None:
+    """Prepare a build for a run from scratch of `source_collection_id` with `options`.
+
+    The built transactions only record the inputs, whatever the options, and
+    are kept for the run to rewrite (skipping the unchanged ones); only those
+    of deleted source parts are dropped, or all of them when the source
+    changed. Deleting the built parts afterwards unlinks them.
+    """
+    transactions = BuiltTransaction.build_id == build_id
+    if db.get(Build, build_id).source_collection_id != source_collection_id:
+        db.execute(delete(BuiltTransaction).where(transactions))
+    else:
+        db.execute(delete(BuiltTransaction).where(BuiltTransaction.source_part_id.is_(None), transactions))
+    db.execute(update(Build).where(Build.id == build_id).values(
+        source_collection_id=source_collection_id, options=json.dumps(sorted(options)), started_at=None,
+        built_at=None
+    ))
+    db.commit()
+
+
+def start_build(db: Session, build_id: int) -> datetime:
+    """Record that a build run starts reading now; returns that (database) time.
+
+    The write waits for any SQLite writer in progress to commit, so every part
+    stamped before the returned time is visible to the run.
+    """
+    db.execute(update(Build).where(Build.id == build_id).values(started_at=utcnow()))
+    started_at = db.execute(select(Build.started_at).where(Build.id == build_id)).scalar_one()
+    db.commit()
+    return started_at
+
+
+def finish_build(db: Session, build_id: int) -> None:
+    """Record that the build run started by `start_build` completed."""
+    db.execute(update(Build).where(Build.id == build_id).values(built_at=Build.started_at))
+    db.commit()
+
+
+def get_changed_part_ids(
+    db: Session, collection_id: int, since: datetime, after_id: int = 0, until_id: Optional[int] = None
+) -> List[int]:
+    """Ids of the parts of a collection in `(after_id, until_id]` written or updated at or after `since`, in id order.
+
+    An index range scan (`ix_collection_part_collection_updated`); on
+    PostgreSQL `since` is moved back by `CONCURRENT_WRITE_SLACK`.
+    """
+    if dialect_name(db) == "postgresql":
+        since -= CONCURRENT_WRITE_SLACK
+    query = select(CollectionPart.id).where(
+        CollectionPart.collection_id == collection_id, CollectionPart.updated_at >= since, CollectionPart.id > after_id
+    )
+    if until_id is not None:
+        query = query.where(CollectionPart.id <= until_id)
+    return sorted(db.execute(query).scalars())
+
+
+_BUILT_TRANSACTION_KEY = ("chain", "tx_key", "source_part_id", "fingerprint", "built_part_id", "sender")
+
+
+def get_built_transactions(db: Session, build_id: int, tx_keys: Iterable[int]) -> List[tuple]:
+    """Get `(chain, tx_key, source_part_id, fingerprint, built_part_id, sender)` of built transactions by key.
+
+    One index seek per key, in one query per 500 keys.
+    """
+    columns = [getattr(BuiltTransaction, name) for name in _BUILT_TRANSACTION_KEY]
+    found = []
+    for chunk in _chunked(tx_keys, 500):
+        found.extend(tuple(row) for row in db.execute(
+            select(*columns).where(BuiltTransaction.build_id == build_id, BuiltTransaction.tx_key.in_(chunk))
+        ))
+    return found
+
+
+def get_orphaned_built_transactions(db: Session, build_id: int) -> List[tuple]:
+    """Built transactions whose source part was deleted, as in `get_built_transactions`."""
+    columns = [getattr(BuiltTransaction, name) for name in _BUILT_TRANSACTION_KEY]
+    return [tuple(row) for row in db.execute(
+        select(*columns).where(BuiltTransaction.source_part_id.is_(None), BuiltTransaction.build_id == build_id)
+    )]
+
+
+def delete_orphaned_built_transactions(db: Session, build_id: int) -> int:
+    """Delete the built transactions whose source part was deleted."""
+    result = db.execute(delete(BuiltTransaction).where(
+        BuiltTransaction.source_part_id.is_(None), BuiltTransaction.build_id == build_id
+    ))
+    db.commit()
+    return result.rowcount
+
+
+def upsert_built_transactions(
+    db: Session, build_id: int, columns: Dict[str, Sequence[Any]], batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Insert built transactions or overwrite them (by `tx_key`) in one transaction.
+
+    `columns` holds every `BuiltTransaction` column but `id` and `build_id`,
+    as equally long lists of DB-native values. Rows already recorded from
+    the same parts with the same fingerprints are left alone, unwritten. One
+    commit for all chunks: the index pages a chunk dirties (tx hashes land
+    all over the unique index) are mostly the next chunk's too, so they are
+    written out once.
+    """
+    total = len(next(iter(columns.values())))
+    table = BuiltTransaction.__table__
+    statement = insert_for(db, table)
+    statement = statement.on_conflict_do_update(
+        index_elements=["build_id", "tx_key"],
+        set_={column: statement.excluded[column] for column in columns if column not in ("chain", "tx_hash", "tx_key")},
+        where=or_(*(
+            table.c[column].is_distinct_from(statement.excluded[column])
+            for column in ("fingerprint", "source_part_id", "built_part_id")
+        ))
+    )
+    for start in range(0, total, batch_size):
+        chunk = {name: values[start:start + batch_size] for name, values in columns.items()}
+        _executemany_columns(db, statement, {"build_id": repeat(build_id), **chunk})
+    db.commit()
+    return total
+
+
+def get_group_members(
+    db: Session, build_id: int, senders: Dict[Tuple[str, str], int], include_failed: bool = False
+) -> List[tuple]:
+    """Get the built transactions of sender groups for aggregating them again.
+
+    `senders` maps `(chain, sender)` to the sender's key in the build state.
+    Returns `(chain, sender, tx_hash, failed, value, block_number, timestamp,
+    from_label)` tuples, in source part order within each group; failed
+    transactions only with `include_failed`. One query per 500 keys; rows of
+    other senders with the same key are left out.
+    """
+    columns = [
+        BuiltTransaction.chain, BuiltTransaction.sender, BuiltTransaction.tx_hash, BuiltTransaction.failed,
+        BuiltTransaction.value, BuiltTransaction.block_number, BuiltTransaction.timestamp, BuiltTransaction.from_label
+    ]
+    criteria = [] if include_failed else [BuiltTransaction.failed == 0]
+    found = []
+    for chunk in _chunked(set(senders.values()), 500):
+        found.extend(tuple(row) for row in db.execute(
+            select(*columns)
+            .where(BuiltTransaction.build_id == build_id, BuiltTransaction.sender_key.in_(chunk), *criteria)
+            .order_by(BuiltTransaction.source_part_id)
+        ) if (row.chain, row.sender) in senders)
+    return found
+
+
+def get_built_groups(db: Session, build_id: int, senders: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], int]:
+    """Get `{(chain, sender): built part id}` of sender groups, in one query per chain and 500 senders."""
+    found = {}
+    for chain, chunk in _senders_by_chain(senders):
+        rows = db.execute(
+            select(BuiltGroup.sender, BuiltGroup.built_part_id).where(
+                BuiltGroup.build_id == build_id, BuiltGroup.chain == chain, BuiltGroup.sender.in_(chunk)
+            )
+        )
+        found.update(((chain, sender), part_id) for sender, part_id in rows)
+    return found
+
+
+def create_built_groups(
+    db: Session, build_id: int, parts: Dict[Tuple[str, str], int], batch_size: int = DEFAULT_BATCH_SIZE
+) -> None:
+    """Record the built parts of new sender groups (`{(chain, sender): part id}`), committing once per chunk."""
+    for chunk in _chunked(parts.items(), batch_size):
+        _executemany(db, insert_for(db, BuiltGroup.__table__), [
+            {"build_id": build_id, "chain": chain, "sender": sender, "built_part_id": part_id}
+            for (chain, sender), part_id in chunk
+        ])
+        db.commit()
+
+
+def delete_built_groups(db: Session, build_id: int, senders: Iterable[Tuple[str, str]]) -> None:
+    """Forget sender groups (whose built parts are deleted), in one statement per chain and 500 senders."""
+    for chain, chunk in _senders_by_chain(senders):
+        db.execute(delete(BuiltGroup).where(
+            BuiltGroup.build_id == build_id, BuiltGroup.chain == chain, BuiltGroup.sender.in_(chunk)
+        ))
+    db.commit()
+
+
+def _senders_by_chain(senders: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, List[str]]]:
+    """Split `(chain, sender)` pairs into `(chain, senders)` chunks of at most 500 senders.
+
+    Looked up as `chain = ? AND sender IN (...)`, so that SQLite seeks the
+    `(build_id, chain, sender)` index; it only uses its first column for an
+    `IN` over `(chain, sender)` row values, scanning the whole build.
+    """
+    by_chain: Dict[str, List[str]] = {}
+    for chain, sender in senders:
+        by_chain.setdefault(chain, []).append(sender)
+    for chain, chain_senders in by_chain.items():
+        for chunk in _chunked(chain_senders, 500):
+            yield chain, chunk
+
+
+def _delete_build_state(db: Session, build_ids: List[int]) -> None:
+    """Delete the built transactions and groups of builds (without committing)."""
+    if build_ids:
+        db.execute(delete(BuiltTransaction).where(BuiltTransaction.build_id.in_(build_ids)))
+        db.execute(delete(BuiltGroup).where(BuiltGroup.build_id.in_(build_ids)))
+
+
+def _delete_builds(db: Session, *criteria) -> None:
+    """Delete the builds matching `criteria` with their state (without committing)."""
+    build_ids = list(db.execute(select(Build.id).where(*criteria)).scalars())
+    if build_ids:
+        _delete_build_state(db, build_ids)
+        db.execute(delete(Build).where(Build.id.in_(build_ids)))
+
+
+def _detach_builds(db: Session, collection_id: int, *criteria) -> None:
+    """Unlink the build state from the parts of a collection about to be deleted (without committing).
+
+    Built transactions of deleted source parts lose their link (the next
+    incremental build removes what was built from them); deleted built parts
+    are no longer referenced, so a transaction or group deleted from a built
+    collection stays deleted until its inputs change or it is rebuilt.
+    """
+    source = db.execute(select(Build.id).where(Build.source_collection_id == collection_id).limit(1)).first()
+    target = db.execute(select(Build.id).where(Build.target_collection_id == collection_id)).first()
+    if source is None and target is None:
+        return
+    # Only the builds of the collection reference its parts, so rows are found
+    # by part id alone. Ids matching criteria are read first: joined to the
+    # parts, PostgreSQL misjudges tables a build has just written (without
+    # statistics yet) and scans the parts once per build state row.
+    if criteria:
+        selections = list(_chunked(db.execute(
+            select(CollectionPart.id).where(CollectionPart.collection_id == collection_id, *criteria)
+        ).scalars(), 500))
+    else:
+        selections = [select(CollectionPart.id).where(CollectionPart.collection_id == collection_id)]
+    for parts in selections:
+        if source is not None:
+            db.execute(
+                update(BuiltTransaction).where(BuiltTransaction.source_part_id.in_(parts)).values(source_part_id=None)
+            )
+        if target is not None:
+            db.execute(
+                update(BuiltTransaction).where(BuiltTransaction.built_part_id.in_(parts)).values(built_part_id=None)
+            )
+            db.execute(delete(BuiltGroup).where(BuiltGroup.built_part_id.in_(parts)))
+
+
+# Bulk CollectionPart operations
+def _chunked(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Yield lists of at most `size` items without materializing the iterable."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+_PART_DEFAULTS = {"content": None, "data": None, "order": 0}
+
+# Part mapping keys written to `collection_part`
+_PART_KEYS = ("id", "name", "content", "data", "order")
+
+# `collection_part` columns the search index reads
+_INDEXED_COLUMNS = {"name", "content", "content_hash", "data"}
+
+
+def content_hash(content: str) -> str:
+    """Hash of a part payload (its content): the key of its `part_blob` row, whatever the part's name."""
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+def _part_row(
+    collection_id: int, part: Dict[str, Any], defaults: Dict[str, Any], blobs: Optional[Dict[str, str]]
+) -> Dict[str, Any]:
+    """Normalize a part mapping into a row for `collection_part` writes.
+
+    With `blobs`, the content is moved there (hash -> content, for
+    `_put_blobs`) and the row references it by `content_hash`; otherwise it
+    stays in the row.
+    """
+    row = {"collection_id": collection_id, **defaults}
+    row.update({key: part[key] for key in _PART_KEYS if key in part})
+    data = row.get("data")
+    if data is not None and not isinstance(data, str):
+        row["data"] = json.dumps(data)
+    if blobs is not None and "content" in row:
+        content = row["content"]
+        row["content"] = row["content_hash"] = None
+        if content is not None:
+            row["content_hash"] = digest = content_hash(content)
+            blobs[digest] = content
+    return row
+
+
+def _put_blobs(db: Session, blobs: Optional[Dict[str, str]]) -> None:
+    """Store the contents of `blobs` that are not stored yet (without committing)."""
+    if blobs:
+        statement = insert_for(db, PartBlob).on_conflict_do_nothing(index_elements=["hash"])
+        # In key order: neighbouring inserts then hit the same index pages
+        _executemany(db, statement, [{"hash": digest, "content": blobs[digest]} for digest in sorted(blobs)])
+
+
+def _delete_blobs(db: Session, collection_id: int, *criteria) -> None:
+    """Delete the blobs of the parts of a collection matching `criteria` that no other part uses.
+
+    Called before the parts themselves are deleted. Parts of other collections
+    may share the blobs, and so may the collection's other parts (the same
+    content under another name) when `criteria` leave some of them.
+    """
+    hashes = select(CollectionPart.content_hash).where(
+        CollectionPart.collection_id == collection_id, CollectionPart.content_hash.is_not(None), *criteria
+    )
+    users = CollectionPart.collection_id.in_(select(Collection.id).where(Collection.id != collection_id))
+    if criteria:
+        deleted = select(CollectionPart.id).where(CollectionPart.collection_id == collection_id, *criteria)
+        users = or_(users, and_(
+            CollectionPart.collection_id == collection_id, CollectionPart.id.not_in(deleted.correlate(None))
+        ))
+    shared = exists().where(users, CollectionPart.content_hash == PartBlob.hash)
+    db.execute(delete(PartBlob).where(PartBlob.hash.in_(hashes), ~shared))
+
+
+def _delete_unused_blobs(db: Session, hashes: Iterable[str]) -> None:
+    """Delete the blobs of `hashes` that no part uses any more, e.g. after the parts got other contents."""
+    used = exists().where(
+        CollectionPart.collection_id.in_(select(Collection.id)), CollectionPart.content_hash == PartBlob.hash
+    )
+    for chunk in _chunked(hashes, 500):
+        db.execute(delete(PartBlob).where(PartBlob.hash.in_(chunk), ~used))
+
+
+def _executemany(db: Session, statement, rows: List[Dict[str, Any]]) -> None:
+    """Run `statement` for `rows` as a single driver-level executemany.
+
+    The statement is compiled once per chunk and its constant binds (e.g. the
+    timestamps) are converted once, keeping SQLAlchemy's per-row parameter
+    processing out of the hot loop. Row values must already be DB-native.
+    """
+    compiled, constants = _compile_many(db, statement, list(rows[0]))
+    if compiled.positional:
+        values = rows if not constants else [{**constants, **row} for row in rows]
+        # `itemgetter` builds each tuple in C (and returns a bare value for a single name)
+        get = itemgetter(*compiled.positiontup)
+        params = [get(row) for row in values] if len(compiled.positiontup) > 1 else [(get(row),) for row in values]
+    else:
+        params = [{**constants, **row} for row in rows]
+    db.connection().exec_driver_sql(compiled.string, params)
+
+
+def _executemany_columns(db: Session, statement, columns: Dict[str, Sequence[Any]]) -> None:
+    """`_executemany` for rows given as columns (`{name: values}`, `itertools.repeat` for a constant), zipped in C."""
+    compiled, constants = _compile_many(db, statement, list(columns))
+    if compiled.positional:
+        params = list(zip(*(
+            columns[name] if name in columns else repeat(constants[name]) for name in compiled.positiontup
+        )))
+    else:
+        params = [{**constants, **dict(zip(columns, row))} for row in zip(*columns.values())]
+    db.connection().exec_driver_sql(compiled.string, params)
+
+
+def _compile_many(db: Session, statement, keys: List[str]):
+    """Compile `statement` for rows with `keys`; returns it and the converted values of its other binds."""
+    dialect = db.get_bind().dialect
+    compiled = statement.compile(dialect=dialect, column_keys=keys)
+    binds = {name: bind for bind, name in compiled.bind_names.items()}
+    constants = {}
+    for name, value in compiled.construct_params(dict.fromkeys(keys)).items():
+        if name not in keys:
+            processor = binds[name].type.dialect_impl(dialect).bind_processor(dialect)
+            constants[name] = processor(value) if processor else value
+    return compiled, constants
+
+
+def bulk_create_collection_parts(
+    db: Session, collection_id: int, parts: Iterable[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE, dedupe: bool = True
+) -> int:
+    """Insert many parts using executemany, committing once per chunk.
+
+    `parts` may be any iterable (including a generator) of mappings with
+    `name` and optional `content`, `data` (str or JSON-serializable) and
+    `order` keys. Contents are stored once in `part_blob`, and parts whose
+    name and content the collection already holds (e.g. from re-collecting
+    an overlapping block range) are skipped. `dedupe=False` writes contents
+    into the rows as they are, for derived parts that are never shared
+    (built transactions). Returns the number of rows inserted.
+    """
+    table = CollectionPart.__table__
+    total = 0
+    for chunk in _chunked(parts, batch_size):
+        blobs: Optional[Dict[str, str]] = {} if dedupe else None
+        rows = [_part_row(collection_id, part, _PART_DEFAULTS, blobs) for part in chunk]
+        statement = insert_for(db, table)
+        if dedupe:
+            statement = statement.on_conflict_do_nothing(index_elements=["collection_id", "content_hash", "name"])
+        last_id = _max_part_id(db)
+        _put_blobs(db, blobs)
+        _executemany(db, statement, rows)
+        total += _record_inserted_parts(db, CollectionPart.id > last_id)
+        _index_parts(db, CollectionPart.id > last_id, written_by_current_transaction(db, table))
+        _bump_versions(db, "collection_part")
+        db.commit()
+    return total
+
+
+def bulk_create_derived_parts(
+    db: Session, collection_id: int, parts: Iterable[Dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE
+) -> Dict[str, int]:
+    """Insert derived parts like `bulk_create_collection_parts(dedupe=False)`; returns `{name: id}` of the new rows.
+
+    Part names must be unique within a chunk. The ids are read back by the
+    rows this transaction wrote, so concurrent writers cannot mix theirs in.
+    """
+    ids = {}
+    table = CollectionPart.__table__
+    for chunk in _chunked(parts, batch_size):
+        rows = [_part_row(collection_id, part, _PART_DEFAULTS, None) for part in chunk]
+        last_id = _max_part_id(db)
+        _executemany(db, insert_for(db, table), rows)
+        written = (table.c.collection_id == collection_id, table.c.id > last_id)
+        ids.update(db.execute(
+            select(table.c.name, table.c.id).where(*written, written_by_current_transaction(db, table))
+        ).all())
+        _record_inserted_parts(db, *written)
+        _index_parts(db, *written, written_by_current_transaction(db, table))
+        _bump_versions(db, "collection_part")
+        db.commit()
+    return ids
+
+
+def upsert_collection_parts(
+    db: Session, collection_id: int, parts: Iterable[Dict[str, Any]],
+    batch_size: int = DEFAULT_BATCH_SIZE, conflict_columns: Sequence[str] = ("id",)
+) -> int:
+    """Insert or update many parts with `INSERT ... ON CONFLICT DO UPDATE`.
+
+    Rows conflicting on `conflict_columns` (the primary key by default) have
+    the columns they supply overwritten; all rows in a chunk must carry the
+    same keys. Rows whose name and content another part of the collection
+    holds (the stored name or content where the row supplies none) are
+    skipped, as by `bulk_create_collection_parts`, and blobs no part uses any
+    more are deleted. Commits once per chunk and returns the number of rows
+    written. Newly inserted rows (ids above the current maximum) are added to
+    the stats tables and overwritten rows counted again when their data
+    changed; they are indexed again when their name, content or data changed.
+    """
+    table = CollectionPart.__table__
+    total = 0
+    for chunk in _chunked(parts, batch_size):
+        supplied = set(chunk[0])
+        payload = bool({"name", "content"} & supplied)
+        keys = [
+            tuple({"collection_id": collection_id, **part}.get(column) for column in conflict_columns) for part in chunk
+        ]
+        stored = _overwritten_parts(db, conflict_columns, keys) if payload else {}
+        contents: Dict[str, str] = {}
+        rows, payloads, part_ids, stale = [], [], [], set()
+        for part, key in zip(chunk, keys):
+            old = stored.get(key)  # (id, name, content_hash)
+            if payload and "name" not in part:
+                if old is None:
+                    raise ValueError(f"New part {dict(zip(conflict_columns, key))} has no name")
+                part = {**part, "name": old[1]}  # NOT NULL is checked before the conflict
+            rows.append(_part_row(collection_id, part, _PART_DEFAULTS, contents))
+            if payload:
+                digest = rows[-1]["content_hash"] if "content" in part else old[2] if old is not None else None
+                payloads.append((digest, part["name"]))
+                part_ids.append(old[0] if old is not None else part.get("id"))
+            if "content" in part and old is not None and old[2] is not None and old[2] != rows[-1]["content_hash"]:
+                stale.add(old[2])
+        if payload:
+            rows = _unique_payloads(db, collection_id, rows, payloads, part_ids)
+        if not rows:
+            continue
+        statement = insert_for(db, table)
+        # Only overwrite the columns the caller actually supplied
+        updates = {
+            column: statement.excluded[column]
+            for column in _part_row(collection_id, dict.fromkeys(supplied), {}, {})
+            if column not in conflict_columns and column != "collection_id"
+        }
+        if updates:
+            updates["updated_at"] = utcnow()
+            statement = statement.on_conflict_do_update(index_elements=list(conflict_columns), set_=updates)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=list(conflict_columns))
+        last_id = _max_part_id(db)
+        keys = [tuple(row.get(column) for column in conflict_columns) for row in rows]
+        overwritten = tuple_(*(table.c[column] for column in conflict_columns)).in_(keys)
+        # New data may move overwritten parts to another day, chain or type: they are counted again
+        if "data" in updates:
+            _adjust_stats(db, activity=_part_stats(db, CollectionPart.id <= last_id, overwritten)[1], sign=-1)
+        _put_blobs(db, {row["content_hash"]: contents[row["content_hash"]] for row in rows if row.get("content_hash")})
+        _executemany(db, statement, rows)
+        _record_inserted_parts(db, CollectionPart.id > last_id)
+        if "data" in updates:
+            _adjust_stats(db, activity=_part_stats(db, CollectionPart.id <= last_id, overwritten)[1])
+        written = CollectionPart.id > last_id
+        if _INDEXED_COLUMNS & updates.keys():
+            _unindex_parts(db, CollectionPart.id <= last_id, overwritten)
+            written = or_(written, overwritten)
+        _index_parts(db, written, written_by_current_transaction(db, table))
+        _delete_unused_blobs(db, stale)
+        _bump_versions(db, "collection_part")
+        db.commit()
+        total += len(rows)
+    return total
+
+
+def _overwritten_parts(db: Session, conflict_columns: Sequence[str], keys: List[tuple]) -> Dict[tuple, tuple]:
+    """`{conflict key: (id, name, content_hash)}` of the parts that rows with `keys` overwrite."""
+    table = CollectionPart.__table__
+    columns = [table.c[column] for column in conflict_columns]
+    found = {}
+    for chunk in _chunked((key for key in keys if None not in key), 500):
+        query = select(*columns, CollectionPart.id, CollectionPart.name, CollectionPart.content_hash)\
+            .where(tuple_(*columns).in_(chunk))
+        for row in db.execute(query):
+            found[tuple(row[:len(columns)])] = tuple(row[len(columns):])
+    return found
+
+
+def _unique_payloads(
+    db: Session, collection_id: int, rows: List[Dict[str, Any]], payloads: List[Tuple[Optional[str], str]],
+    part_ids: List[Optional[int]]
+) -> List[Dict[str, Any]]:
+    """Drop the rows whose `(content_hash, name)` payload another part of the collection holds (or an earlier row claims).
+
+    `part_ids` are the ids of the parts the rows overwrite (None for inserts).
+    """
+    owners = {}
+    for chunk in _chunked({digest for digest, _ in payloads if digest is not None}, 500):
+        owners.update(
+            ((digest, name), part_id) for digest, name, part_id in db.execute(
+                select(CollectionPart.content_hash, CollectionPart.name, CollectionPart.id).where(
+                    CollectionPart.collection_id == collection_id, CollectionPart.content_hash.in_(chunk)
+                )
+            )
+        )
+    kept = []
+    for row, payload, part_id in zip(rows, payloads, part_ids):
+        if payload[0] is not None:
+            if owners.setdefault(payload, part_id) != part_id:
+                continue
+            owners[payload] = object()  # claimed by this row
+        kept.append(row)
+    return kept
+
+
+def bulk_update_collection_parts(
+    db: Session, parts: Iterable[Dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE
+) -> int:
+    """Update many existing parts by id with executemany, committing once per chunk.
+
+    Each mapping carries `id` plus the columns to set; all mappings in a chunk
+    must carry the same keys. Returns the number of rows updated. Updates must
+    keep a part's type, chain and timestamp; the stats tables are not adjusted
+    (the search index is, for names and data).
+    Contents are changed with `update_collection_part` (they live in
+    `part_blob`), except those of derived parts, which are stored in the rows.
+    """
+    table = CollectionPart.__table__
+    total = 0
+    for chunk in _chunked(parts, batch_size):
+        columns = [key for key in chunk[0] if key != "id"]
+        # Bind names must differ from column names in an UPDATE ... SET
+        statement = update(table).where(table.c.id == bindparam("part_id")).values({
+            column: bindparam(f"new_{column}") for column in columns
+        })
+        rows = []
+        for part in chunk:
+            row = {f"new_{column}": part[column] for column in columns}
+            if row.get("new_data") is not None and not isinstance(row["new_data"], str):
+                row["new_data"] = json.dumps(row["new_data"])
+            row["part_id"] = part["id"]
+            rows.append(row)
+        _executemany(db, statement, rows)
+        if _INDEXED_COLUMNS.intersection(columns):
+            _reindex_parts(db, CollectionPart.id.in_([part["id"] for part in chunk]))
+        _bump_versions(db, "collection_part")
+        db.commit()
+        total += len(rows)
+    return total
+
+
+def iter_collection_part_fields(
+    db: Session, collection_id: int, fields: Dict[str, Tuple[str, Optional[str]]],
+    batch_size: int = DEFAULT_BATCH_SIZE, after_id: int = 0, until_id: Optional[int] = None,
+    part_ids: Optional[Sequence[int]] = None
+) -> Iterator[List[tuple]]:
+    """Yield the parts of a collection as batches of plain tuples, in id order.
+
+    `fields` maps output names to `(column, json_path)` pairs, e.g.
+    `{"status": ("content", "$.status")}`, or `(column, None)` to read a column
+    as is (e.g. the generated `tx_hash`); values are extracted by the database
+    so no ORM objects or JSON documents are built in Python. Each tuple starts
+    with the part id, followed by the fields in order. Batches are fetched by
+    keyset on id, so memory stays bounded by `batch_size`. `after_id` and
+    `until_id` (inclusive) restrict the read to one id range, and `part_ids`
+    (sorted) to those parts, read by primary key in batches of at most
+    `DEFAULT_BATCH_SIZE`.
+    """
+    table = CollectionPart.__table__
+    blob = PartBlob.__table__
+    columns = [table.c.id]
+    for name, (column, path) in fields.items():
+        # Blob contents through one join rather than the `content` property's subquery, run once per field
+        value = func.coalesce(table.c.content, blob.c.content) if column == "content" else table.c[column]
+        columns.append((value if path is None else json_extract(value, path)).label(name))
+    query = select(*columns)
+    if any(column == "content" for column, _ in fields.values()):
+        query = query.select_from(table.outerjoin(blob, blob.c.hash == table.c.content_hash))
+    # Run on the connection, which skips the session's result processing (a second per million rows); it is
+    # taken for each batch, as the caller may commit in between
+    if part_ids is not None:
+        for chunk in _chunked(part_ids, min(batch_size, DEFAULT_BATCH_SIZE)):
+            rows = db.connection().execute(
+                query.where(table.c.collection_id == collection_id, table.c.id.in_(chunk)).order_by(table.c.id)
+            ).all()
+            if rows:
+                yield rows
+        return
+    bounds = [table.c.id <= until_id] if until_id is not None else []
+    while True:
+        rows = db.connection().execute(
+            query
+            .where(table.c.collection_id == collection_id, table.c.id > after_id, *bounds)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        after_id = rows[-1][0]
+        yield rows
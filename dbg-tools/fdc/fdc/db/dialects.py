@@ -0,0 +1,157 @@
+"""SQL constructs that differ between the supported backends (SQLite, PostgreSQL).
+
+`fdc.db.models` and `fdc.db.crud` build their queries from these, so the same
+code runs on either database. JSON documents are stored as text on both;
+PostgreSQL reads them through a `jsonb` cast.
+"""
+
+import re
+from typing import List, Optional
+
+from sqlalchemy import Date, DateTime, Float, Integer, Numeric, String, literal_column, true
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement
+from sqlalchemy.types import TypeEngine
+
+_PATH_STEP = re.compile(r"\.([^.\[]+)|\[(\d+)\]")
+
+
+def json_path_steps(path: str) -> List[str]:
+    """Split a SQLite JSON path ("$.a.b[0]") into its keys (["a", "b", "0"])."""
+    if not path.startswith("$"):
+        raise ValueError(f"JSON paths start with '$': {path!r}")
+    steps, position = [], 1
+    for match in _PATH_STEP.finditer(path, 1):
+        if match.start() != position:
+            break
+        steps.append(match.group(1) or match.group(2))
+        position = match.end()
+    if position != len(path):
+        raise ValueError(f"Unsupported JSON path: {path!r}")
+    return steps
+
+
+class json_extract(FunctionElement):
+    """The value at a JSON `path` ("$.a.b") of a text column holding a JSON document.
+
+    Compiles to `json_extract()` on SQLite. On PostgreSQL the value is read with
+    `#>` (decoded to Python by the driver, like SQLite's typed result), or with
+    `#>>` and a cast when `type_` is numeric, so that it compares and
+    aggregates like SQLite's value does.
+    """
+
+    name = "json_extract"
+    inherit_cache = True
+
+    def __init__(self, expression, path: str, type_: Optional[TypeEngine] = None):
+        self.path = path
+        json_path_steps(path)  # validate
+        super().__init__(expression, literal_column("'%s'" % path.replace("'", "''")))
+        if type_ is not None:
+            self.type = type_() if isinstance(type_, type) else type_
+
+
+@compiles(json_extract)
+def _json_extract_default(element, compiler, **kw):
+    return "json_extract(%s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(json_extract, "postgresql")
+def _json_extract_postgresql(element, compiler, **kw):
+    document = "CAST(%s AS JSONB)" % compiler.process(element.clauses.clauses[0], **kw)
+    path = "'{%s}'" % ",".join(json_path_steps(element.path))
+    if isinstance(element.type, (Integer, Float, Numeric)):
+        type_ = compiler.dialect.type_compiler_instance.process(element.type)
+        return "CAST(%s #>> %s AS %s)" % (document, path, type_)
+    if isinstance(element.type, String):
+        return "(%s #>> %s)" % (document, path)
+    return "(%s #> %s)" % (document, path)
+
+
+class unix_date(FunctionElement):
+    """The UTC date of a unix timestamp expression."""
+
+    name = "unix_date"
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(unix_date)
+def _unix_date_default(element, compiler, **kw):
+    return "date(%s, 'unixepoch')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(unix_date, "postgresql")
+def _unix_date_postgresql(element, compiler, **kw):
+    return "CAST(to_timestamp(%s) AT TIME ZONE 'UTC' AS DATE)" % compiler.process(element.clauses, **kw)
+
+
+class utcnow(FunctionElement):
+    """The current UTC time, evaluated by the database (for defaults and `onupdate`).
+
+    Compiles to the same naive UTC values the app writes from Python: on
+    SQLite the text format of SQLAlchemy's `DateTime` (microseconds padded
+    from SQLite's milliseconds), so stored times keep sorting and comparing
+    correctly; on PostgreSQL the statement's start time at UTC.
+    """
+
+    name = "utcnow"
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    return "(statement_timestamp() AT TIME ZONE 'UTC')"
+
+
+class like_nocase(FunctionElement):
+    """`expression LIKE pattern`, case-insensitive (for ASCII) as SQLite's LIKE is."""
+
+    # Untyped, so that SQLite does not render the condition as "... = 1"
+    name = "like_nocase"
+    inherit_cache = True
+
+
+@compiles(like_nocase)
+def _like_nocase_default(element, compiler, **kw):
+    expression, pattern = element.clauses.clauses
+    return "%s LIKE %s" % (compiler.process(expression, **kw), compiler.process(pattern, **kw))
+
+
+@compiles(like_nocase, "postgresql")
+def _like_nocase_postgresql(element, compiler, **kw):
+    expression, pattern = element.clauses.clauses
+    return "%s ILIKE %s" % (compiler.process(expression, **kw), compiler.process(pattern, **kw))
+
+
+def dialect_name(bind) -> str:
+    """Name of the dialect ("sqlite", "postgresql") of a Session, Connection or Engine."""
+    return (bind.get_bind() if hasattr(bind, "get_bind") else bind).dialect.name
+
+
+def insert_for(bind, table):
+    """`INSERT` supporting `on_conflict_do_update`/`_do_nothing` for `bind`'s dialect."""
+    if dialect_name(bind) == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def written_by_current_transaction(bind, table) -> ColumnElement:
+    """Restrict to rows of `table` inserted or updated by the current transaction.
+
+    Used with an id range to find the rows a bulk insert just wrote. On SQLite
+    (a single writer) the id range alone is exact; with PostgreSQL's concurrent
+    writers, rows committed by other transactions in the meantime are excluded
+    through `xmin`.
+    """
+    if dialect_name(bind) == "postgresql":
+        return literal_column(f"{table.name}.xmin") == literal_column("pg_current_xact_id()::xid")
+    return true()
@@ -0,0 +1,160 @@
+"""Streaming table exports (CSV, NDJSON, Parquet).
+
+Rows are streamed from the database in batches (`crud.iter_rows`) and written
+batch by batch, so an export never holds more than one batch in memory no
+matter how large the table is. Used by the viewer's export button and by the
+`fdc export` command.
+"""
+
+import csv
+import io
+import json
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Sequence, Union
+
+from sqlalchemy.orm import Session
+
+from fdc.db import crud
+from fdc.db.models import Collection, CollectionPart
+
+EXPORT_TABLES = {
+    "collection": (Collection, ["id", "name", "description", "created_at", "updated_at"]),
+    "collection_part": (
+        CollectionPart, ["id", "collection_id", "name", "content", "data", "order", "created_at", "updated_at"]
+    ),
+}
+
+# Format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "ndjson": (".ndjson", "application/x-ndjson"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+# Temporary export files (see `export_to_tempfile`) older than this are removed
+EXPORT_TEMPFILE_PREFIX = "fdc-export-"
+EXPORT_TEMPFILE_MAX_AGE = 3600.0
+
+Batches = Iterable[List[tuple]]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_csv(batches: Batches, columns: Sequence[str], out: BinaryIO) -> int:
+    """Write batches as CSV with a header row."""
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    total = 0
+    for batch in batches:
+        writer.writerows(batch)
+        total += len(batch)
+    text.flush()
+    text.detach()  # leave `out` open for the caller
+    return total
+
+
+def write_ndjson(batches: Batches, columns: Sequence[str], out: BinaryIO) -> int:
+    """Write batches as newline-delimited JSON objects."""
+    total = 0
+    for batch in batches:
+        lines = [json.dumps(dict(zip(columns, row)), default=_json_default) for row in batch]
+        out.write(("\n".join(lines) + "\n").encode("utf-8"))
+        total += len(batch)
+    return total
+
+
+def write_parquet(batches: Batches, columns: Sequence[str], out: BinaryIO, model) -> int:
+    """Write batches as Parquet, one row group per batch, typed from `model`'s columns."""
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(model, columns)
+    total = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for batch in batches:
+            writer.write_batch(_record_batch(batch, schema))
+            total += len(batch)
+    return total
+
+
+def _record_batch(batch: List[tuple], schema):
+    import pyarrow as pa
+
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)], schema=schema
+    )
+
+
+def _arrow_schema(model, columns: Sequence[str]):
+    """Arrow schema for `columns` of `model`, from the SQLAlchemy column types."""
+    import pyarrow as pa
+
+    types = {int: pa.int64(), float: pa.float64(), str: pa.string(), datetime: pa.timestamp("us")}
+    fields = []
+    for column in columns:
+        python_type = model.__table__.c[column].type.python_type
+        fields.append(pa.field(column, types.get(python_type, pa.string())))
+    return pa.schema(fields)
+
+
+WRITERS: Dict[str, Callable[..., int]] = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+    "parquet": write_parquet,
+}
+
+
+def export_table(
+    db: Session, table: str, fmt: str, destination: Union[str, Path, BinaryIO],
+    collection_id: Optional[int] = None, batch_size: int = crud.DEFAULT_BATCH_SIZE, **filters
+) -> int:
+    """Stream `table` (optionally one collection's parts and viewer `filters`) to `destination`.
+
+    `destination` is a path or a binary file object. Returns the number of rows written.
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Table {table} cannot be exported")
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format: {fmt} (expected one of {', '.join(WRITERS)})")
+    model, columns = EXPORT_TABLES[table]
+    batches = crud.iter_rows(db, model, columns, collection_id=collection_id, batch_size=batch_size, **filters)
+    kwargs = {"model": model} if fmt == "parquet" else {}
+    if isinstance(destination, (str, Path)):
+        with open(destination, "wb") as out:
+            return WRITERS[fmt](batches, columns, out, **kwargs)
+    return WRITERS[fmt](batches, columns, destination, **kwargs)
+
+
+def export_to_tempfile(db: Session, table: str, fmt: str, **kwargs) -> Path:
+    """Export to a new temporary file and return its path.
+
+    The caller removes the file once done with it; files left behind (by
+    sessions that ended without) are removed by the next export once older
+    than `EXPORT_TEMPFILE_MAX_AGE`.
+    """
+    remove_stale_exports()
+    suffix = EXPORT_FORMATS[fmt][0]
+    with tempfile.NamedTemporaryFile(prefix=f"{EXPORT_TEMPFILE_PREFIX}{table}-", suffix=suffix, delete=False) as out:
+        export_table(db, table, fmt, out, **kwargs)
+    return Path(out.name)
+
+
+def remove_stale_exports(max_age: float = EXPORT_TEMPFILE_MAX_AGE) -> int:
+    """Remove the temporary export files last written more than `max_age` seconds ago; returns how many."""
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in Path(tempfile.gettempdir()).glob(f"{EXPORT_TEMPFILE_PREFIX}*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass  # removed by another session meanwhile
+    return removed
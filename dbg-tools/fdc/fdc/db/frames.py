@@ -0,0 +1,83 @@
+"""Columnar reads: Core `select()` straight into pandas DataFrames.
+
+Used by the viewer instead of hydrating ORM objects and copying their
+`__dict__`. The queries mirror `fdc.db.crud.get_collections` /
+`get_collection_parts` (keyset pages and the viewer filters) and
+`search_collection_parts` (ranked search hits) but return typed DataFrames
+ready for `st.dataframe`.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import Connection, false, select
+
+from fdc.db.crud import filter_clauses, search_hits
+from fdc.db.models import Collection, CollectionPart
+from fdc.db.search import search_terms
+
+FRAME_COLUMNS = {
+    "collection": ["id", "name", "description", "created_at", "updated_at"],
+    "collection_part": ["id", "collection_id", "name", "content", "data", "order", "created_at", "updated_at"],
+}
+
+_MODELS = {"collection": Collection, "collection_part": CollectionPart}
+_SEARCH_COLUMNS = {
+    "collection": ["name", "description"],
+    "collection_part": ["name", "content", "data"],
+}
+_DTYPES: Dict[str, Dict[str, str]] = {
+    "collection": {"id": "int64", "name": "string", "description": "string"},
+    "collection_part": {
+        "id": "int64", "collection_id": "int64", "name": "string", "content": "string", "data": "string",
+        "order": "int64",
+    },
+}
+
+
+def read_table_page(
+    connection: Connection, table: str, limit: int = 100, after_id: int = 0,
+    collection_id: Optional[int] = None, search: Optional[str] = None,
+    created_from: Optional[datetime] = None, created_to: Optional[datetime] = None
+) -> pd.DataFrame:
+    """Read one keyset page (`id > after_id`, ordered by id) of `table` as a DataFrame."""
+    model = _MODELS[table]
+    columns: List = [getattr(model, column).label(column) for column in FRAME_COLUMNS[table]]
+    search_columns = [getattr(model, column) for column in _SEARCH_COLUMNS[table]]
+    statement = select(*columns).where(
+        model.id > after_id, *filter_clauses(model, search_columns, search, created_from, created_to)
+    )
+    if collection_id is not None:
+        statement = statement.where(model.collection_id == collection_id)
+    statement = statement.order_by(model.id).limit(limit)
+    return pd.read_sql(statement, connection, dtype=_DTYPES[table], parse_dates=["created_at", "updated_at"])
+
+
+def read_search_page(
+    connection: Connection, search: str, limit: int = 100, offset: int = 0,
+    collection_id: Optional[int] = None, created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+) -> pd.DataFrame:
+    """Read one page (by OFFSET) of the parts matching a full-text search, best hits first, as a DataFrame."""
+    columns: List = [getattr(CollectionPart, column).label(column) for column in FRAME_COLUMNS["collection_part"]]
+    if not search_terms(search):
+        statement = select(*columns).where(false())
+    else:
+        hits = search_hits(search)
+        statement = select(*columns).join_from(CollectionPart, hits, CollectionPart.id == hits.c.part_id)\
+            .where(*filter_clauses(CollectionPart, [], None, created_from, created_to))
+        if collection_id is not None:
+            statement = statement.where(CollectionPart.collection_id == collection_id)
+        statement = statement.order_by(hits.c.score, CollectionPart.id).offset(offset).limit(limit)
+    return pd.read_sql(statement, connection, dtype=_DTYPES["collection_part"], parse_dates=["created_at", "updated_at"])
+
+
+def read_collection_names(
+    connection: Connection, limit: int = 100, collection_ids: Optional[Sequence[int]] = None
+) -> Dict[int, str]:
+    """Map the ids of the first `limit` collections (or of `collection_ids`) to their names."""
+    statement = select(Collection.id, Collection.name).order_by(Collection.id).limit(limit)
+    if collection_ids is not None:
+        statement = statement.where(Collection.id.in_(collection_ids))
+    return dict(connection.execute(statement).all())
@@ -0,0 +1,217 @@
+"""In-process database migrations and chunked data backfills.
+
+The `fdc migrate` commands run Alembic's command API in this process, bound to
+the engine from `fdc.db.session` (same URL and SQLite pragmas as the app), so
+there is no `alembic` subprocess and no database URL in `alembic.ini`. Every
+revision runs in its own transaction and SQLite ALTERs are rendered in batch
+mode.
+
+Data migrations on large tables use `Backfill`: rows are updated in short
+keyset chunks, each committed together with the position it reached in the
+`backfill_progress` table, so readers and writers are only blocked for one
+chunk at a time and an interrupted backfill resumes where it stopped. Put a
+backfill in its own revision, after the schema change it fills in::
+
+    def upgrade():
+        run_backfills(Backfill("job_updated_at", "job", "updated_at = created_at", "updated_at IS NULL"))
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from sqlalchemy import Connection, Engine, inspect, text
+
+from fdc.db.session import SQLALCHEMY_DATABASE_URL, get_engine
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent.parent
+ALEMBIC_INI = PROJECT_DIR / "alembic.ini"
+MIGRATIONS_DIR = PROJECT_DIR / "migrations"
+
+BACKFILL_TABLE = "backfill_progress"
+
+logger = logging.getLogger(__name__)
+
+
+def alembic_config(connection: Optional[Connection] = None):
+    """Alembic `Config` for the project, optionally bound to an open connection."""
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    config.set_main_option("version_locations", str(MIGRATIONS_DIR / "versions"))
+    # Only used by offline (--sql) runs; online runs use `connection`
+    config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL.replace("%", "%%"))
+    config.attributes["connection"] = connection
+    # Leave the host process' logging alone (env.py would load alembic.ini's)
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def _run(command_name: str, *args, **kwargs):
+    from alembic import command
+
+    with get_engine().connect() as connection:
+        result = getattr(command, command_name)(alembic_config(connection), *args, **kwargs)
+        connection.commit()
+    return result
+
+
+def upgrade(revision: str = "head") -> None:
+    """Upgrade the database to `revision`.
+
+    The revisions up to the PostgreSQL backend are SQLite-specific (batch table
+    rebuilds, SQLite SQL), so an empty database on another backend is created
+    from the models and stamped at head instead; later revisions apply normally.
+    """
+    engine = get_engine()
+    if engine.dialect.name != "sqlite" and revision == "head" and not inspect(engine).get_table_names():
+        create_from_models(engine)
+        return
+    _run("upgrade", revision)
+
+
+def create_from_models(engine: Engine) -> None:
+    """Create every table from `fdc.db.models` and stamp the database at head."""
+    from alembic import command
+
+    from fdc.db.models import Base
+
+    Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        command.stamp(alembic_config(connection), "head")
+        connection.commit()
+    logger.info("Created the %s schema from the models", engine.dialect.name)
+
+
+def downgrade(revision: str = "-1") -> None:
+    """Downgrade the database to `revision` (relative revisions like "-1" work too)."""
+    _run("downgrade", revision)
+
+
+def revision(message: str, autogenerate: bool = True):
+    """Create a new revision file, autogenerated from the models by default."""
+    return _run("revision", message=message, autogenerate=autogenerate)
+
+
+def history(verbose: bool = False) -> None:
+    """Print the revision history."""
+    _run("history", verbose=verbose)
+
+
+def current(verbose: bool = False) -> None:
+    """Print the database's current revision."""
+    _run("current", verbose=verbose)
+
+
+@dataclass
+class Backfill:
+    """A chunked `UPDATE table SET <assignments> WHERE <where>` over the `key` column.
+
+    `assignments` must be idempotent: a chunk that was updated but whose
+    progress was not recorded is simply updated again on resume.
+    """
+
+    name: str  # unique; identifies the saved progress
+    table: str
+    assignments: str
+    where: Optional[str] = None
+    chunk_size: int = 10_000
+    key: str = "id"
+
+    def update_sql(self, chunked: bool = True) -> str:
+        conditions = [f"{self.key} > :after AND {self.key} <= :upto"] if chunked else []
+        if self.where:
+            conditions.append(f"({self.where})")
+        return f"UPDATE {self.table} SET {self.assignments}" + (
+            f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        )
+
+
+def _ensure_progress_table(engine: Engine) -> None:
+    with engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {BACKFILL_TABLE} ("
+            "name VARCHAR(128) PRIMARY KEY, last_key INTEGER NOT NULL, finished BOOLEAN NOT NULL)"
+        ))
+
+
+def run_backfill(
+    bind: Union[Engine, Connection], backfill: Backfill,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> int:
+    """Run (or resume) `backfill`, one transaction per chunk. Returns the rows updated.
+
+    `progress(last_key, max_key)` is called after every chunk. A finished
+    backfill is a no-op until `reset_backfill` is called.
+    """
+    engine = bind if isinstance(bind, Engine) else bind.engine
+    _ensure_progress_table(engine)
+    with engine.connect() as connection:
+        state = connection.execute(
+            text(f"SELECT last_key, finished FROM {BACKFILL_TABLE} WHERE name = :name"), {"name": backfill.name}
+        ).first()
+        connection.rollback()
+    if state is not None and state.finished:
+        return 0
+    after = state.last_key if state is not None else 0
+
+    next_upto = text(
+        f"SELECT max({backfill.key}) FROM (SELECT {backfill.key} FROM {backfill.table} "
+        f"WHERE {backfill.key} > :after ORDER BY {backfill.key} LIMIT :limit) AS chunk"
+    )
+    save = text(
+        f"INSERT INTO {BACKFILL_TABLE} (name, last_key, finished) VALUES (:name, :last_key, :finished) "
+        "ON CONFLICT (name) DO UPDATE SET last_key = excluded.last_key, finished = excluded.finished"
+    )
+    update = text(backfill.update_sql())
+    updated = 0
+    with engine.connect() as connection:
+        max_key = connection.execute(text(f"SELECT max({backfill.key}) FROM {backfill.table}")).scalar() or 0
+        connection.rollback()
+        while True:
+            with connection.begin():
+                upto = connection.execute(next_upto, {"after": after, "limit": backfill.chunk_size}).scalar()
+                if upto is not None:
+                    updated += connection.execute(update, {"after": after, "upto": upto}).rowcount
+                connection.execute(save, {
+                    "name": backfill.name, "last_key": upto if upto is not None else after,
+                    "finished": upto is None,
+                })
+            if upto is None:
+                return updated
+            after = upto
+            if progress:
+                progress(after, max_key)
+
+
+def reset_backfill(bind: Union[Engine, Connection], name: str) -> None:
+    """Forget a backfill's progress so that it runs again (e.g. from a downgrade)."""
+    engine = bind if isinstance(bind, Engine) else bind.engine
+    _ensure_progress_table(engine)
+    with engine.begin() as connection:
+        connection.execute(text(f"DELETE FROM {BACKFILL_TABLE} WHERE name = :name"), {"name": name})
+
+
+def run_backfills(*backfills: Backfill) -> None:
+    """Run backfills from a migration script, outside the revision's transaction.
+
+    The revision's transaction is committed first (Alembic's autocommit block),
+    then every chunk commits on its own. Offline (--sql) runs emit one plain
+    UPDATE per backfill instead.
+    """
+    from alembic import op
+
+    context = op.get_context()
+    if context.as_sql:
+        for backfill in backfills:
+            op.execute(backfill.update_sql(chunked=False))
+        return
+    with context.autocommit_block():
+        engine = op.get_bind().engine
+        for backfill in backfills:
+            started = time.perf_counter()
+            rows = run_backfill(engine, backfill)
+            logger.info("Backfill %s: %d rows in %.1fs", backfill.name, rows, time.perf_counter() - started)
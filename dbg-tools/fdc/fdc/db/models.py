@@ -1,10 +1,11 @@
 """Database models for FDC."""
 
-from datetime import datetime
-from datetime import timezone
+from datetime import date, datetime
 from typing import List, Optional
-from sqlalchemy import Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import BigInteger, Computed, Date, Integer, Float, String, Text, DateTime, ForeignKey, Index, UniqueConstraint, event, func, literal_column, select
+from sqlalchemy.orm import column_property, relationship, Mapped, mapped_column
+from .dialects import json_extract, utcnow
+from .search import search_index_ddl
 from .session import Base
 
 class Collection(Base):
@@ -15,8 +16,8 @@ class Collection(Base):
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
     description: Mapped[str | None] = mapped_column(Text, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow())
     
     # One-to-many relationship with CollectionPart
     parts: Mapped[List["CollectionPart"]] = relationship(
@@ -25,6 +26,13 @@ class Collection(Base):
         cascade="all, delete-orphan"
     )
     
+    # One-to-many relationship with CollectionCheckpoint
+    checkpoints: Mapped[List["CollectionCheckpoint"]] = relationship(
+        "CollectionCheckpoint",
+        back_populates="collection",
+        cascade="all, delete-orphan"
+    )
+    
     def __repr__(self) -> str:
         return f"<Collection(id={self.id}, name={self.name})>"
 
@@ -33,15 +41,35 @@ class CollectionPart(Base):
     """CollectionPart model represents a part of a collection."""
     
     __tablename__ = "collection_part"
+    __table_args__ = (
+        Index("ix_collection_part_collection_id", "collection_id"),  # keyset paging by id
+        Index("ix_collection_part_collection_order", "collection_id", "order"),
+        Index("ix_collection_part_collection_created", "collection_id", "created_at"),
+        Index("ix_collection_part_collection_updated", "collection_id", "updated_at"),  # changes since a build
+        Index("ix_collection_part_collection_block", "collection_id", "chain", "block_number"),
+        Index("ix_collection_part_tx_hash", "tx_hash"),
+        # One part per name and payload in a collection; parts of other names share the payload's blob. Leading
+        # with the collection keeps a collection's inserts in its own range of the index, where random hashes
+        # spread over all of it would dirty a page each
+        Index("uq_collection_part_content_hash", "collection_id", "content_hash", "name", unique=True),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     collection_id: Mapped[int] = mapped_column(ForeignKey("collection.id"))
     name: Mapped[str] = mapped_column(String(255), nullable=False)
-    content: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Content stored in the row itself; written by `fdc.db.crud` into `part_blob` instead, read `content`
+    inline_content: Mapped[str | None] = mapped_column("content", Text, nullable=True)
+    content_hash: Mapped[str | None] = mapped_column(String(32), nullable=True)  # `PartBlob.hash` of the payload
     data: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON string for flexible metadata
+    # Hot `data` fields, generated (and stored) by the database so they can be indexed and read without parsing JSON
+    type: Mapped[str | None] = mapped_column(String(32), Computed(json_extract(literal_column("data"), "$.type", String), persisted=True))
+    chain: Mapped[str | None] = mapped_column(String(32), Computed(json_extract(literal_column("data"), "$.chain", String), persisted=True))
+    block_number: Mapped[int | None] = mapped_column(Integer, Computed(json_extract(literal_column("data"), "$.block_number", Integer), persisted=True))
+    tx_hash: Mapped[str | None] = mapped_column(String(66), Computed(json_extract(literal_column("data"), "$.tx_hash", String), persisted=True))
+    from_address: Mapped[str | None] = mapped_column(String(42), Computed(json_extract(literal_column("data"), "$.from", String), persisted=True))
     order: Mapped[int] = mapped_column(Integer, default=0)  # For ordered parts
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc))
-    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now(timezone.utc), onupdate=datetime.now(timezone.utc))
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow())
     
     # Many-to-one relationship with Collection
     collection: Mapped[Optional["Collection"]] = relationship(
@@ -51,3 +79,208 @@ class CollectionPart(Base):
     
     def __repr__(self) -> str:
         return f"<CollectionPart(id={self.id}, name={self.name}, collection_id={self.collection_id})>"
+
+
+class PartBlob(Base):
+    """PartBlob stores a part payload's content once, shared by every part with its hash."""
+    
+    __tablename__ = "part_blob"
+    
+    hash: Mapped[str] = mapped_column(String(32), primary_key=True)  # sha256 of the content, 128 bits in hex
+    content: Mapped[str] = mapped_column(Text, nullable=False)
+    
+    def __repr__(self) -> str:
+        return f"<PartBlob(hash={self.hash})>"
+
+
+# A part's content, from its blob or (parts written before blobs existed) its own row
+CollectionPart.content = column_property(
+    func.coalesce(
+        CollectionPart.__table__.c.content,
+        select(PartBlob.content).where(PartBlob.hash == CollectionPart.__table__.c.content_hash).scalar_subquery()
+    )
+)
+
+
+# The full-text search index of the parts (`fdc.db.search`) is not a model: it
+# is created after the tables it reads (`part_blob` too) and dropped before them
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(metadata, connection, tables=(), **kw):
+    if CollectionPart.__table__ in tables:
+        for statement in search_index_ddl(connection.dialect.name)[0]:
+            connection.exec_driver_sql(statement)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_search_index(metadata, connection, tables=(), **kw):
+    if CollectionPart.__table__ in tables:
+        for statement in search_index_ddl(connection.dialect.name)[1]:
+            connection.exec_driver_sql(statement)
+
+
+class CollectionCheckpoint(Base):
+    """CollectionCheckpoint records how far a collection has been collected from a source."""
+    
+    __tablename__ = "collection_checkpoint"
+    __table_args__ = (
+        UniqueConstraint("collection_id", "source", name="uq_collection_checkpoint_source"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    collection_id: Mapped[int] = mapped_column(ForeignKey("collection.id"))
+    source: Mapped[str] = mapped_column(String(64), nullable=False)  # chain name, e.g. "ethereum"
+    block_number: Mapped[int] = mapped_column(Integer, nullable=False)  # highest contiguously collected block
+    block_hash: Mapped[str] = mapped_column(String(66), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow())
+    
+    # Many-to-one relationship with Collection
+    collection: Mapped[Optional["Collection"]] = relationship(
+        "Collection",
+        back_populates="checkpoints"
+    )
+    
+    def __repr__(self) -> str:
+        return f"<CollectionCheckpoint(collection_id={self.collection_id}, source={self.source}, block_number={self.block_number})>"
+
+
+class Job(Base):
+    """Job model tracks a pipeline stage run executed by the background job runner."""
+    
+    __tablename__ = "job"
+    __table_args__ = (
+        Index("ix_job_stage_id", "stage", "id"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    stage: Mapped[str] = mapped_column(String(32), nullable=False)  # collect, enrich or build
+    status: Mapped[str] = mapped_column(String(32), default="pending")  # pending, running, stopping, stopped, completed, error, reset
+    progress: Mapped[float] = mapped_column(Float, default=0.0)  # 0..1
+    message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    params: Mapped[str | None] = mapped_column(Text, nullable=True)  # JSON string of stage options
+    collection_id: Mapped[int | None] = mapped_column(ForeignKey("collection.id"), nullable=True)
+    pid: Mapped[int | None] = mapped_column(Integer, nullable=True)  # worker process running the job
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow())
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    
+    def __repr__(self) -> str:
+        return f"<Job(id={self.id}, stage={self.stage}, status={self.status})>"
+
+
+class Build(Base):
+    """Build tracks a source collection's build into its "<name> (built)" collection, for incremental rebuilds."""
+    
+    __tablename__ = "build"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    source_collection_id: Mapped[int] = mapped_column(ForeignKey("collection.id"))
+    target_collection_id: Mapped[int] = mapped_column(ForeignKey("collection.id"), unique=True)
+    options: Mapped[str] = mapped_column(Text, nullable=False)  # JSON list of the options shaping the output
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # database time the last run started
+    built_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)  # `started_at` of the last completed run
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow())
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=utcnow(), onupdate=utcnow())
+    
+    def __repr__(self) -> str:
+        return f"<Build(id={self.id}, source={self.source_collection_id}, target={self.target_collection_id})>"
+
+
+class BuiltTransaction(Base):
+    """BuiltTransaction links a built transaction to the source part it was built from, with that part's input fingerprint."""
+    
+    __tablename__ = "built_transaction"
+    __table_args__ = (
+        # On a 64-bit key rather than the chain and hash: a build writes a row per
+        # transaction, in random key order, and the smaller index stays cached
+        UniqueConstraint("build_id", "tx_key", name="uq_built_transaction_tx"),
+        # Senders too, for the same reason
+        Index("ix_built_transaction_sender", "build_id", "sender_key"),
+        # Deleting parts looks up the rows referencing them; orphans are (NULL, build_id)
+        Index("ix_built_transaction_source_part_id", "source_part_id", "build_id"),
+        # Grouped builds leave every built part id NULL
+        Index(
+            "ix_built_transaction_built_part_id", "built_part_id",
+            sqlite_where=literal_column("built_part_id IS NOT NULL"),
+            postgresql_where=literal_column("built_part_id IS NOT NULL")
+        ),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    build_id: Mapped[int] = mapped_column(ForeignKey("build.id"))
+    source_part_id: Mapped[int | None] = mapped_column(ForeignKey("collection_part.id"), nullable=True)  # None once deleted
+    built_part_id: Mapped[int | None] = mapped_column(ForeignKey("collection_part.id"), nullable=True)  # ungrouped builds
+    chain: Mapped[str] = mapped_column(String(32), nullable=False)
+    tx_hash: Mapped[str] = mapped_column(String(66), nullable=False)
+    tx_key: Mapped[int] = mapped_column(BigInteger, nullable=False)  # hash of the chain and tx hash
+    sender: Mapped[str | None] = mapped_column(String(42), nullable=True)
+    sender_key: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # hash of the chain and sender
+    fingerprint: Mapped[int] = mapped_column(BigInteger, nullable=False)  # hash of the content hash, enrichment version and fields read
+    # Inputs of the sender's group, aggregated again when the group changes
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # 1 for failed transactions
+    value: Mapped[float | None] = mapped_column(Float, nullable=True)
+    block_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    timestamp: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    from_label: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    
+    def __repr__(self) -> str:
+        return f"<BuiltTransaction(build_id={self.build_id}, chain={self.chain}, tx_hash={self.tx_hash})>"
+
+
+class BuiltGroup(Base):
+    """BuiltGroup links a sender to the built part holding its transaction group (grouped builds)."""
+    
+    __tablename__ = "built_group"
+    __table_args__ = (
+        UniqueConstraint("build_id", "chain", "sender", name="uq_built_group_sender"),
+        Index("ix_built_group_built_part_id", "built_part_id"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    build_id: Mapped[int] = mapped_column(ForeignKey("build.id"))
+    chain: Mapped[str] = mapped_column(String(32), nullable=False)
+    sender: Mapped[str | None] = mapped_column(String(42), nullable=True)
+    built_part_id: Mapped[int] = mapped_column(ForeignKey("collection_part.id"))
+    
+    def __repr__(self) -> str:
+        return f"<BuiltGroup(build_id={self.build_id}, chain={self.chain}, sender={self.sender})>"
+
+
+class LookupCacheEntry(Base):
+    """LookupCacheEntry persists enrichment lookup results shared by all processes."""
+    
+    __tablename__ = "lookup_cache"
+    
+    namespace: Mapped[str] = mapped_column(String(64), primary_key=True)  # resolver, e.g. "contract:ethereum"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)  # e.g. an address
+    value: Mapped[str] = mapped_column(Text, nullable=False)  # JSON string
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    
+    def __repr__(self) -> str:
+        return f"<LookupCacheEntry(namespace={self.namespace}, key={self.key})>"
+
+
+class StatsCounter(Base):
+    """StatsCounter holds table row counts, kept current by the crud write paths."""
+    
+    __tablename__ = "stats_counter"
+    
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)  # table name, e.g. "collection_part"
+    value: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    def __repr__(self) -> str:
+        return f"<StatsCounter(name={self.name}, value={self.value})>"
+
+
+class DailyActivity(Base):
+    """DailyActivity counts collected transactions per day and chain, kept current by the crud write paths."""
+    
+    __tablename__ = "daily_activity"
+    
+    day: Mapped[date] = mapped_column(Date, primary_key=True)  # UTC day of the transaction's block
+    chain: Mapped[str] = mapped_column(String(32), primary_key=True)
+    transactions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    
+    def __repr__(self) -> str:
+        return f"<DailyActivity(day={self.day}, chain={self.chain}, transactions={self.transactions})>"
+
@@ -0,0 +1,205 @@
+"""Full-text search index over collection parts.
+
+Every part's name, content (its own or its blob's) and the `SEARCH_FIELDS` of
+its `data` are indexed in `collection_part_search`, keyed by part id: an FTS5
+table on SQLite, a `tsvector` per part under a GIN index on PostgreSQL.
+The write paths of `fdc.db.crud` keep it current in the writing transaction,
+with one statement per chunk like the stats tables (row triggers would flush
+FTS5's pending index data on every row of a bulk insert).
+
+Text is split into case-folded tokens on whitespace and punctuation, so an
+address or a tx hash is a single token and is found with one index lookup.
+A search query is a list of terms that must all match; a term ending with `*`
+matches a token prefix. Hits are scored by relevance (BM25 on SQLite,
+`ts_rank` on PostgreSQL, names and fields weighing more than contents), lower
+scores ranking first on both.
+
+The index is created with the `collection_part` table (`create_all`) and by
+its migration (`search_index_ddl`).
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Integer, String, bindparam, column, literal_column, table
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement, FunctionElement, TableClause
+
+from .dialects import dialect_name
+
+SEARCH_TABLE = "collection_part_search"
+
+# `data` fields indexed with a part's name and content: what parts are looked up by
+SEARCH_FIELDS = (
+    "$.tx_hash", "$.from", "$.to", "$.block_hash",
+    "$.enrichment.from_label", "$.enrichment.to_label", "$.enrichment.protocol", "$.enrichment.token.symbol",
+)
+
+# FTS5 BM25 weights of the name, content and fields columns (PostgreSQL: weights A, C and B)
+SQLITE_RANK = "bm25(4.0, 1.0, 2.0)"
+
+_WORD = re.compile(r"\w")
+
+
+def _sqlite_fields(row: str) -> str:
+    return " || ' ' || ".join(f"coalesce(json_extract({row}.data, '{path}'), '')" for path in SEARCH_FIELDS)
+
+
+def _postgresql_fields() -> str:
+    steps = (",".join(path[2:].split(".")) for path in SEARCH_FIELDS)
+    return " || ' ' || ".join(f"coalesce(document #>> '{{{step}}}', '')" for step in steps)
+
+
+def _index_row(dialect: str) -> Dict[str, str]:
+    """The columns of an index row and their values for a `collection_part` row (SQL selecting from it)."""
+    content = "coalesce(collection_part.content, (SELECT content FROM part_blob WHERE hash = collection_part.content_hash))"
+    if dialect == "postgresql":
+        return {
+            "part_id": "collection_part.id",
+            "document": f"{SEARCH_TABLE}_document(collection_part.name, {content}, collection_part.data)",
+        }
+    return {
+        "rowid": "collection_part.id",
+        "name": "collection_part.name",
+        "content": content,
+        "fields": _sqlite_fields("collection_part"),
+    }
+
+
+def search_index_ddl(dialect: str) -> Tuple[List[str], List[str]]:
+    """The statements creating the search index of a `dialect` database (indexing the existing parts) and dropping it."""
+    row = _index_row(dialect)
+    populate = f"INSERT INTO {SEARCH_TABLE} ({', '.join(row)}) SELECT {', '.join(row.values())} FROM collection_part"
+    if dialect == "postgresql":
+        create = [
+            f"CREATE TABLE {SEARCH_TABLE} (part_id INTEGER PRIMARY KEY, document TSVECTOR NOT NULL)",
+            f"CREATE INDEX ix_{SEARCH_TABLE}_document ON {SEARCH_TABLE} USING GIN (document)",
+            f"CREATE FUNCTION {SEARCH_TABLE}_fields(data TEXT) RETURNS TEXT LANGUAGE sql IMMUTABLE AS $$ "
+            f"SELECT {_postgresql_fields()} FROM (SELECT CAST(data AS JSONB) AS document) AS part $$",
+            f"CREATE FUNCTION {SEARCH_TABLE}_document(name TEXT, content TEXT, data TEXT) RETURNS TSVECTOR "
+            "LANGUAGE sql IMMUTABLE AS $$ "
+            "SELECT setweight(to_tsvector('simple', coalesce(name, '')), 'A') "
+            f"|| setweight(to_tsvector('simple', {SEARCH_TABLE}_fields(data)), 'B') "
+            "|| setweight(to_tsvector('simple', coalesce(content, '')), 'C') $$",
+            populate,
+        ]
+        drop = [
+            f"DROP TABLE {SEARCH_TABLE}",
+            f"DROP FUNCTION {SEARCH_TABLE}_document(TEXT, TEXT, TEXT)",
+            f"DROP FUNCTION {SEARCH_TABLE}_fields(TEXT)",
+        ]
+        return create, drop
+    create = [
+        # A regular FTS5 table: it keeps a copy of the indexed text, which its
+        # deletes read; contentless tables only support deletes from SQLite 3.43.
+        # Diacritics are kept like PostgreSQL's 'simple' configuration does,
+        # which also spares the tokenizer a lookup per character.
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(name, content, fields, "
+        "tokenize = 'unicode61 remove_diacritics 0')",
+        f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rank) VALUES ('rank', '{SQLITE_RANK}')",
+        populate,
+    ]
+    return create, [f"DROP TABLE {SEARCH_TABLE}"]
+
+
+def search_index_row(bind) -> Tuple[TableClause, List[ColumnElement]]:
+    """The search index table of `bind` and the values of a part's index row, to insert from a select of the parts."""
+    row = _index_row(dialect_name(bind))
+    return table(SEARCH_TABLE, *map(column, row)), [literal_column(value) for value in row.values()]
+
+
+def search_index_stale(bind) -> ColumnElement:
+    """Condition on a part joined with its `search_table` row: the row no longer matches the part's text."""
+    row = _index_row(dialect_name(bind))
+    if "document" in row:
+        return literal_column(f"({SEARCH_TABLE}.document IS DISTINCT FROM {row['document']})")
+    changed = (f"{SEARCH_TABLE}.{name} IS NOT {row[name]}" for name in ("name", "content", "fields"))
+    return literal_column("(%s)" % " OR ".join(changed))
+
+
+def search_terms(query: str) -> List[Tuple[str, bool]]:
+    """Split a search query into `(term, prefix)` pairs; terms without a letter or digit are dropped."""
+    terms = []
+    for word in query.split():
+        term = word.rstrip("*")
+        if _WORD.search(term):
+            terms.append((term, term != word))
+    return terms
+
+
+def _fts5_query(terms: List[Tuple[str, bool]]) -> str:
+    # Every term a quoted string, tokenized like the indexed text: no FTS5 operators
+    return " ".join('"%s"%s' % (term.replace('"', '""'), "*" if prefix else "") for term, prefix in terms)
+
+
+def _tsquery(terms: List[Tuple[str, bool]]) -> str:
+    # `to_tsquery` input of quoted lexemes, which it tokenizes like the indexed text
+    return " & ".join(
+        "'%s'%s" % (term.replace("\\", "\\\\").replace("'", "''"), ":*" if prefix else "") for term, prefix in terms
+    )
+
+
+search_table = table(SEARCH_TABLE)
+
+
+class _search_query(FunctionElement):
+    """Base of the constructs bound to a search query, carrying it in each backend's syntax."""
+
+    inherit_cache = True
+
+    def __init__(self, query: str):
+        terms = search_terms(query)
+        super().__init__(bindparam(None, _fts5_query(terms), String), bindparam(None, _tsquery(terms), String))
+
+
+class search_match(_search_query):
+    """Condition on `search_table`: the part matches the search query (which must have `search_terms`)."""
+
+    name = "search_match"
+    inherit_cache = True
+
+
+class search_score(_search_query):
+    """Relevance of the `search_table` row to the search query it matches; lower is better."""
+
+    name = "search_score"
+    inherit_cache = True
+
+
+class search_part_id(FunctionElement):
+    """Part id of a `search_table` row."""
+
+    name = "search_part_id"
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(search_match)
+def _search_match_default(element, compiler, **kw):
+    return "%s MATCH %s" % (SEARCH_TABLE, compiler.process(element.clauses.clauses[0], **kw))
+
+
+@compiles(search_match, "postgresql")
+def _search_match_postgresql(element, compiler, **kw):
+    return "%s.document @@ to_tsquery('simple', %s)" % (SEARCH_TABLE, compiler.process(element.clauses.clauses[1], **kw))
+
+
+@compiles(search_score)
+def _search_score_default(element, compiler, **kw):
+    return "%s.rank" % SEARCH_TABLE
+
+
+@compiles(search_score, "postgresql")
+def _search_score_postgresql(element, compiler, **kw):
+    query = compiler.process(element.clauses.clauses[1], **kw)
+    return "-ts_rank(%s.document, to_tsquery('simple', %s))" % (SEARCH_TABLE, query)
+
+
+@compiles(search_part_id)
+def _search_part_id_default(element, compiler, **kw):
+    return "%s.rowid" % SEARCH_TABLE
+
+
+@compiles(search_part_id, "postgresql")
+def _search_part_id_postgresql(element, compiler, **kw):
+    return "%s.part_id" % SEARCH_TABLE
@@ -2,15 +2,59 @@
 
 import logging
 from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session as SQLAlchemySession
 
-from fdc.db.session import Session
+from fdc.db.session import Session, get_engine
 
 logger = logging.getLogger(__name__)
 
+# Session of the unit of work open in the current thread (or task), if any
+_current_session: ContextVar[Optional[SQLAlchemySession]] = ContextVar("fdc_unit_of_work", default=None)
+
+
+@contextmanager
+def unit_of_work(engine: Optional[Engine] = None) -> Iterator[SQLAlchemySession]:
+    """Share one session and one pooled connection with every `get_session()` inside the block.
+
+    The connection is checked out of `engine`'s pool (the shared engine by
+    default) once, for the whole block: reads share its transaction, and a
+    write's commit (`fdc.db.crud` commits its own writes) ends it, the next
+    read starting another one on the same connection. Committed at the end of
+    the block, rolled back if it raises. Nested blocks join the outer one.
+    """
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+    with (engine or get_engine()).connect() as connection:
+        session = SQLAlchemySession(bind=connection)
+        token = _current_session.set(session)
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            _current_session.reset(token)
+            session.close()
+
+
 @contextmanager
 def get_session():
-    """Provide a transactional scope around a series of operations."""
+    """Provide a transactional scope around a series of operations.
+
+    Inside a `unit_of_work()` this is the unit of work's session, which the
+    unit of work commits and closes.
+    """
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
     session = Session()
     try:
         yield session
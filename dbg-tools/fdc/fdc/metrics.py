@@ -0,0 +1,402 @@
+"""Process-wide performance metrics: query timings, render timers, stage throughput.
+
+Everything is recorded in `REGISTRY`, a thread-safe set of counters and
+fixed-bucket histograms plus per-statement query totals:
+
+* `instrument_engine` times every SQL statement an engine runs
+  (`fdc_db_query_seconds`, and per statement for the slowest-queries table);
+* `timed` / `Registry.timer` time render functions and loaders
+  (`fdc_render_seconds`, `fdc_cache_load_seconds`);
+* `StageMeter` records rows and per-batch latency of the pipeline stages
+  (`fdc_stage_rows_total`, `fdc_stage_batch_seconds`);
+* reruns and cache lookups are plain counters.
+
+Stage engines run in worker processes, so every process writes its registry to
+`FDC_METRICS_DIR` (default `~/.internal-tools/metrics`) as `<pid>.json` with
+`flush()`, and `collect()` merges the files of all processes. The files of
+exited processes keep their totals until they are `RETENTION` old, when
+`collect()` removes them. The Performance view and `fdc metrics` (JSON or
+Prometheus text) read that merged snapshot.
+Set `FDC_METRICS=0` to turn recording off.
+
+This module only uses the standard library, so importing it stays cheap.
+"""
+
+import bisect
+import functools
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ENABLED = os.environ.get("FDC_METRICS", "1").lower() not in ("0", "false", "no", "off")
+METRICS_DIR = Path(os.environ.get("FDC_METRICS_DIR") or os.path.expanduser("~/.internal-tools/metrics"))
+
+# Histogram bucket upper bounds, in seconds (Prometheus `le`; +Inf is implicit)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Touched by `clear()`; processes reset their registry on the next flush after it
+RESET_MARKER = "reset"
+
+# Seconds after its last flush when a process' file is removed; a live process writes it again on its next flush
+RETENTION = 24 * 3600.0
+
+# Distinct statements tracked per process; the rest are counted under "(other)"
+MAX_STATEMENTS = 500
+MAX_STATEMENT_LENGTH = 300
+
+_WHITESPACE = re.compile(r"\s+")
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def normalize_statement(statement: str) -> str:
+    """The key a SQL statement is aggregated under: whitespace collapsed, truncated."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    if len(statement) > MAX_STATEMENT_LENGTH:
+        statement = statement[:MAX_STATEMENT_LENGTH - 1] + "…"
+    return statement
+
+
+_statement_keys: Dict[str, Tuple[str, Tuple[str, Labels]]] = {}
+
+
+def _statement_key(statement: str) -> Tuple[str, Tuple[str, Labels]]:
+    """(normalized statement, `fdc_db_query_seconds` histogram key) of a statement."""
+    operation = statement.split(None, 1)[0].upper() if statement.strip() else "?"
+    return normalize_statement(statement), ("fdc_db_query_seconds", _labels({"operation": operation}))
+
+
+class Registry:
+    """Counters, histograms and per-statement query totals of one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters: Dict[Tuple[str, Labels], float] = {}
+            # name, labels -> [count, sum, bucket counts (non-cumulative, last is +Inf)]
+            self._histograms: Dict[Tuple[str, Labels], list] = {}
+            # statement -> [count, total seconds, max seconds]
+            self._statements: Dict[str, list] = {}
+            self._last_flush = 0.0
+            self._reset_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add `value` to a counter."""
+        if not ENABLED:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record a duration in a histogram."""
+        if not ENABLED:
+            return
+        key = (name, _labels(labels))
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0, 0.0, [0] * (len(BUCKETS) + 1)]
+            histogram[0] += 1
+            histogram[1] += seconds
+            histogram[2][bucket] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Time the `with` block into the `name` histogram."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record_query(self, statement: str, seconds: float) -> None:
+        """Record one executed SQL statement."""
+        if not ENABLED:
+            return
+        # Statements are compiled once and repeated, so their keys are memoized by text
+        keys = _statement_keys.get(statement)
+        if keys is None:
+            keys = _statement_key(statement)
+            if len(_statement_keys) < 4 * MAX_STATEMENTS:
+                _statement_keys[statement] = keys
+        key, histogram_key = keys
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(histogram_key)
+            if histogram is None:
+                histogram = self._histograms[histogram_key] = [0, 0.0, [0] * (len(BUCKETS) + 1)]
+            histogram[0] += 1
+            histogram[1] += seconds
+            histogram[2][bucket] += 1
+            totals = self._statements.get(key)
+            if totals is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    key = "(other)"
+                    totals = self._statements.get(key)
+                if totals is None:
+                    totals = self._statements[key] = [0, 0.0, 0.0]
+            totals[0] += 1
+            totals[1] += seconds
+            if seconds > totals[2]:
+                totals[2] = seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """The registry as a JSON-serializable dict (the format `collect` merges)."""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "updated": time.time(),
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self._counters.items()
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "count": count, "sum": total, "buckets": list(buckets)}
+                    for (name, labels), (count, total, buckets) in self._histograms.items()
+                ],
+                "statements": [
+                    {"statement": statement, "count": count, "total": total, "max": longest}
+                    for statement, (count, total, longest) in self._statements.items()
+                ],
+            }
+
+    def flush(self, directory: Optional[Path] = None, min_interval: float = 1.0, force: bool = False) -> None:
+        """Write the snapshot to `<directory>/<pid>.json`, at most once per `min_interval`."""
+        if not ENABLED:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < min_interval:
+            return
+        self._last_flush = now
+        directory = Path(directory or METRICS_DIR)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            marker = directory / RESET_MARKER
+            if marker.exists() and marker.stat().st_mtime > self._reset_at:
+                self.reset()  # `clear()` was called, maybe from another process
+                self._last_flush = now
+            path = directory / f"{os.getpid()}.json"
+            temporary = path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(self.snapshot()))
+            os.replace(temporary, path)
+        except OSError:
+            pass  # metrics must never break the app
+
+
+REGISTRY = Registry()
+
+
+def timed(name: str = "fdc_render_seconds", **labels):
+    """Decorator timing every call into the `name` histogram, labelled with the function name."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with REGISTRY.timer(name, function=function.__name__, **labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class StageMeter:
+    """Rows and per-batch latency of a pipeline stage.
+
+    Call `batch(rows)` after each batch; its latency is the time since the
+    previous batch (or since the meter was created), so it covers reading,
+    processing and writing the batch.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._last = time.perf_counter()
+
+    def batch(self, rows: int) -> None:
+        now = time.perf_counter()
+        REGISTRY.inc("fdc_stage_rows_total", rows, stage=self.stage)
+        REGISTRY.observe("fdc_stage_batch_seconds", now - self._last, stage=self.stage)
+        self._last = now
+
+
+_instrumented_engines = weakref.WeakSet()
+
+
+def instrument_engine(engine):
+    """Time every statement `engine` executes into `REGISTRY`. Idempotent."""
+    if not ENABLED or engine in _instrumented_engines:
+        return engine
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _query_started(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("fdc_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _query_finished(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["fdc_query_started"].pop()
+        REGISTRY.record_query(statement, time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _query_failed(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("fdc_query_started"):
+            connection.info["fdc_query_started"].pop()
+
+    _instrumented_engines.add(engine)
+    return engine
+
+
+def _merge(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    counters: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], list] = {}
+    statements: Dict[str, list] = {}
+    processes = []
+    for snapshot in snapshots:
+        processes.append({"pid": snapshot["pid"], "updated": snapshot["updated"]})
+        for counter in snapshot["counters"]:
+            key = (counter["name"], _labels(counter["labels"]))
+            counters[key] = counters.get(key, 0) + counter["value"]
+        for histogram in snapshot["histograms"]:
+            key = (histogram["name"], _labels(histogram["labels"]))
+            merged = histograms.setdefault(key, [0, 0.0, [0] * (len(BUCKETS) + 1)])
+            merged[0] += histogram["count"]
+            merged[1] += histogram["sum"]
+            merged[2] = [a + b for a, b in zip(merged[2], histogram["buckets"])]
+        for row in snapshot["statements"]:
+            merged = statements.setdefault(row["statement"], [0, 0.0, 0.0])
+            merged[0] += row["count"]
+            merged[1] += row["total"]
+            merged[2] = max(merged[2], row["max"])
+    return {
+        "processes": processes,
+        "counters": [
+            {"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(counters.items())
+        ],
+        "histograms": [
+            {"name": name, "labels": dict(labels), "count": count, "sum": total, "buckets": buckets}
+            for (name, labels), (count, total, buckets) in sorted(histograms.items())
+        ],
+        "statements": sorted(
+            ({"statement": statement, "count": count, "total": total, "max": longest}
+             for statement, (count, total, longest) in statements.items()),
+            key=lambda row: row["total"], reverse=True
+        ),
+    }
+
+
+def _modified(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return float("inf")  # already gone
+
+
+def collect(directory: Optional[Path] = None) -> Dict[str, Any]:
+    """Merge the metrics of every process: the flushed files plus this process' live registry."""
+    directory = Path(directory or METRICS_DIR)
+    own = f"{os.getpid()}.json"
+    live = REGISTRY.snapshot()
+    snapshots = [live] if live["counters"] or live["histograms"] or live["statements"] else []
+    stale = time.time() - RETENTION
+    for path in sorted(directory.glob("*.json")) if directory.is_dir() else []:
+        if path.name == own:
+            continue
+        try:
+            snapshot = json.loads(path.read_text())
+            updated = snapshot["updated"]
+        except (OSError, ValueError):
+            snapshot, updated = None, _modified(path)  # being replaced, or left half-written by a killed process
+        if updated < stale:
+            path.unlink(missing_ok=True)
+        elif snapshot is not None:
+            snapshots.append(snapshot)
+    for path in directory.glob("*.tmp") if directory.is_dir() else []:
+        if _modified(path) < stale:
+            path.unlink(missing_ok=True)
+    return _merge(snapshots)
+
+
+def clear(directory: Optional[Path] = None) -> None:
+    """Reset the metrics of every process: delete the flushed files and mark the reset.
+
+    Other processes (e.g. idle stage workers) reset their registry on their
+    next `flush()`, so their old totals do not come back.
+    """
+    REGISTRY.reset()
+    directory = Path(directory or METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / RESET_MARKER).touch()
+    for path in directory.glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+def quantile(histogram: Dict[str, Any], q: float) -> Optional[float]:
+    """Estimate the `q` quantile of a snapshot histogram (linear within a bucket)."""
+    count = histogram["count"]
+    if not count:
+        return None
+    rank, seen = q * count, 0
+    for index, bucket_count in enumerate(histogram["buckets"]):
+        if bucket_count and seen + bucket_count >= rank:
+            lower = BUCKETS[index - 1] if index else 0.0
+            upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+            return lower + (upper - lower) * (rank - seen) / bucket_count
+        seen += bucket_count
+    return BUCKETS[-1]
+
+
+def counter_values(snapshot: Dict[str, Any], name: str, label: str) -> Dict[str, float]:
+    """`{label value: counter value}` of the `name` counters of a snapshot."""
+    return {row["labels"].get(label, ""): row["value"] for row in snapshot["counters"] if row["name"] == name}
+
+
+def to_json(snapshot: Dict[str, Any]) -> str:
+    return json.dumps(snapshot, indent=2)
+
+
+def _prometheus_labels(labels: Dict[str, str], **extra) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def to_prometheus(snapshot: Dict[str, Any]) -> str:
+    """Prometheus text exposition of a snapshot (per-statement totals are JSON only)."""
+    lines: List[str] = []
+    typed = set()
+    for counter in snapshot["counters"]:
+        if counter["name"] not in typed:
+            typed.add(counter["name"])
+            lines.append(f"# TYPE {counter['name']} counter")
+        lines.append(f"{counter['name']}{_prometheus_labels(counter['labels'])} {counter['value']:g}")
+    for histogram in snapshot["histograms"]:
+        name, labels = histogram["name"], histogram["labels"]
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{name}_bucket{_prometheus_labels(labels, le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_prometheus_labels(labels)} {histogram['sum']:g}")
+        lines.append(f"{name}_count{_prometheus_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
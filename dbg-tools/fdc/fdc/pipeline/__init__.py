@@ -0,0 +1 @@
+"""Processing pipeline engines (collector, enricher, builder) for FDC."""
@@ -0,0 +1,742 @@
+"""Transaction Builder stage engine - vectorized over columnar batches.
+
+The builder never materializes ORM objects: the fields it needs are extracted
+by the database (`crud.iter_collection_part_fields`) and each keyset batch
+becomes a pandas DataFrame. Deduplication by tx hash within a batch, value
+conversion, the failed-transaction filter, summaries and the per-sender
+grouping are all column operations, and grouping keeps only per-batch partial
+aggregates that are periodically merged, so memory is bounded by the batch
+size plus the number of distinct senders. Across batches, a transaction
+described by several parts is deduplicated through the build state (keyed by
+chain and tx hash), where the latest part wins. Source parts are unique per
+name and payload (`content_hash`), so re-collected ranges are not built
+twice; built parts are derived data, so they are written without hashing.
+
+Builds are incremental. Every built transaction is recorded in the build
+state (`fdc.db.crud`, `built_transaction`) with its source part and an input
+fingerprint: a hash of the part's content hash, enrichment version and every
+field the build reads. Building an already built collection again reads only
+the parts written or updated since the last run (an index range on
+`updated_at`), and rewrites only the transactions whose fingerprint changed
+and the sender groups they belong to, which are aggregated again from the
+build state. Changing the options, 'Rebuild existing transactions' or an
+interrupted run builds from scratch.
+
+Large collections are built from scratch in parallel: each worker process
+prepares one id-range shard (`fdc.pipeline.shards`) of at most `SHARD_BATCHES`
+batches and the parent writes the shards' transactions, batch by batch, in
+shard order.
+"""
+
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from fdc.db import crud
+from fdc.db.analytics import ANALYTICS_BACKEND, iter_collection_part_frames
+from fdc.db.session import Session
+from fdc.metrics import REGISTRY, StageMeter
+from fdc.pipeline.shards import (
+    SHARD_WORKERS, Shard, database_url, map_shards, plan_shards, shard_rows_for, worker_sessions
+)
+
+GROUP_TRANSACTIONS = "Group related transactions"
+INCLUDE_FAILED = "Include failed transactions"
+GENERATE_SUMMARIES = "Generate transaction summaries"
+REBUILD = "Rebuild existing transactions"
+
+# Option -> default, in display order
+BUILD_OPTIONS = {
+    GROUP_TRANSACTIONS: True,
+    INCLUDE_FAILED: False,
+    GENERATE_SUMMARIES: True,
+    REBUILD: False,
+}
+DEFAULT_BUILD_OPTIONS = [option for option, default in BUILD_OPTIONS.items() if default]
+
+# Batches per shard of a parallel build: a shard's prepared transactions are held until the parent writes them
+SHARD_BATCHES = 4
+
+BUILT_SUFFIX = " (built)"
+
+# Output name -> (collection_part column, JSON path or None for the column itself)
+TRANSACTION_FIELDS: Dict[str, Tuple[str, Optional[str]]] = {
+    "type": ("type", None),
+    "chain": ("chain", None),
+    "block_number": ("block_number", None),
+    "tx_hash": ("tx_hash", None),
+    "timestamp": ("data", "$.timestamp"),
+    "from": ("from_address", None),
+    "to": ("data", "$.to"),
+    "status": ("content", "$.status"),
+    "value": ("content", "$.value"),
+    "from_label": ("data", "$.enrichment.from_label"),
+    "to_label": ("data", "$.enrichment.to_label"),
+    "protocol": ("data", "$.enrichment.protocol"),
+    "token": ("data", "$.enrichment.token.symbol"),
+}
+
+# Grouping by sender only needs a subset; every JSON path costs a parse per row
+GROUP_FIELDS = ("type", "chain", "block_number", "tx_hash", "timestamp", "from", "status", "value", "from_label")
+
+# Read by every build, besides the fields above, for the input fingerprints
+FINGERPRINT_FIELDS: Dict[str, Tuple[str, Optional[str]]] = {
+    "content_hash": ("content_hash", None),
+    "enrichment_version": ("data", "$.enrichment.version"),
+}
+
+# Non-string fields, typed for the DuckDB scan (SQLite and PostgreSQL return them typed)
+FIELD_TYPES = {"block_number": "BIGINT", "timestamp": "BIGINT", "enrichment_version": "BIGINT"}
+
+# How partial group aggregates are merged
+_GROUP_AGGREGATES = {
+    "from_label": "first",
+    "tx_count": "sum",
+    "failed_count": "sum",
+    "value": "sum",
+    "first_block": "min",
+    "last_block": "max",
+    "first_timestamp": "min",
+    "last_timestamp": "max",
+}
+
+WEI_PER_ETHER = 10 ** 18
+
+# Build state rows written (and committed, see `crud.upsert_built_transactions`) at once
+STATE_WRITE_ROWS = 250_000
+
+# Combines the per-field hashes of a fingerprint
+_HASH_MULTIPLIER = np.uint64(1_000_003)
+
+# Byte values of two-hex-digit strings, by the digits' ASCII codes read as a little-endian uint16; 256 marks non-hex
+_HEX_PAIRS = np.full(1 << 16, 256, dtype=np.uint16)
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdefABCDEF", dtype=np.uint8).astype(np.uint16)
+_HEX_VALUES = np.r_[np.arange(16), np.arange(10, 16)].astype(np.uint16)
+_HEX_PAIRS[_HEX_DIGITS[:, None] | _HEX_DIGITS[None, :] << 8] = _HEX_VALUES[:, None] << 4 | _HEX_VALUES[None, :]
+
+
+@dataclass
+class BuildStats:
+    """Result of a builder run."""
+
+    source_parts: int = 0
+    transactions: int = 0
+    failed_skipped: int = 0
+    duplicates: int = 0
+    built_parts: int = 0  # written or updated
+    unchanged: int = 0  # already built from the same inputs
+    removed: int = 0  # built parts deleted
+    incremental: bool = False
+    collection_id: Optional[int] = None
+    elapsed: float = 0.0
+
+    def add(self, other: "BuildStats") -> None:
+        """Add the row counts of a shard's stats."""
+        self.source_parts += other.source_parts
+        self.transactions += other.transactions
+        self.failed_skipped += other.failed_skipped
+        self.duplicates += other.duplicates
+
+
+def _hex_limbs(values: pd.Series, digits: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse hex strings ("0x" optional, None for zero) of up to `digits` digits as big-endian 64-bit limbs.
+
+    Vectorized over fixed-width byte strings: each string is zero-padded to
+    `digits` digits, every two digits become a byte and every 8 bytes one
+    uint64 limb. Returns the `(rows, digits // 16)` limbs and which rows
+    parsed (the others are zero).
+    """
+    strings = values.to_numpy(dtype=object, na_value="")
+    try:
+        raw = strings.astype(f"S{digits + 3}")  # the prefix, and one byte to tell longer strings
+        ascii = np.ones(len(strings), dtype=bool)
+    except UnicodeEncodeError:
+        ascii = np.fromiter((value.isascii() for value in strings), dtype=bool, count=len(strings))
+        raw = np.where(ascii, strings, "").astype(f"S{digits + 3}")
+    # Leading zeros do not change the value, so they go with the prefix
+    stripped = np.strings.lstrip(raw, b"0xX")
+    parsed = ascii & (np.strings.str_len(stripped) <= digits)
+    padded = np.strings.zfill(np.where(parsed, stripped, b""), digits).astype(f"S{digits}")
+    pairs = _HEX_PAIRS[padded.view("<u2")].reshape(len(raw), digits // 2)
+    parsed &= (pairs < 256).all(axis=1)
+    pairs[~parsed] = 0
+    return pairs.astype(np.uint8).view(">u8").astype(np.uint64), parsed
+
+
+def _hex_to_ether(values: pd.Series) -> np.ndarray:
+    """Convert hex wei strings (None for missing) to float ether."""
+    limbs, parsed = _hex_limbs(values, 64)
+    if not parsed.all():
+        raise ValueError(f"Invalid hex wei value: {values.iloc[int(np.argmin(parsed))]!r}")
+    wei = np.zeros(len(values), dtype=np.float64)
+    for limb in limbs.T:
+        wei = wei * 2.0 ** 64 + limb
+    return wei / WEI_PER_ETHER
+
+
+def _format_ether(values: pd.Series) -> pd.Series:
+    return values.round(4).astype(str) + " ETH"
+
+
+def _tx_keys(frame: pd.DataFrame) -> np.ndarray:
+    """Signed 64-bit keys of the transactions' (chain, tx hash) in the build state."""
+    return _hex_keys(frame["chain"], frame["tx_hash"], 64)
+
+
+def _sender_keys(frame: pd.DataFrame) -> np.ndarray:
+    """Signed 64-bit keys of the transactions' (chain, sender) in the build state."""
+    return _hex_keys(frame["chain"], frame["from"], 48)
+
+
+def _hex_keys(chains: pd.Series, values: pd.Series, digits: int) -> np.ndarray:
+    """Signed 64-bit keys of (chain, hex value) pairs, for values of up to `digits` digits.
+
+    Tx hashes and addresses are already uniform, so a key is the XOR of the
+    value's 64-bit limbs and a hash of the chain. Stored, so chains are
+    hashed with `hashlib` rather than pandas' hashing, which may change
+    between versions; so are the rare values that are not hex.
+    """
+    limbs, parsed = _hex_limbs(values, digits)
+    codes, unique_chains = pd.factorize(chains)
+    chain_keys = np.array([_blake2b_key(chain) for chain in unique_chains], dtype=np.uint64)
+    keys = np.bitwise_xor.reduce(limbs, axis=1) ^ chain_keys[codes]
+    for row in np.flatnonzero(~parsed):
+        keys[row] = _blake2b_key(f"{chains.iat[row]}:{values.iat[row]}")
+    return keys.view(np.int64)
+
+
+def _blake2b_key(value: str) -> np.uint64:
+    return np.uint64(int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big"))
+
+
+def _contains(sorted_values: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Which of `values` are in the sorted array `sorted_values`."""
+    positions = np.searchsorted(sorted_values, values).clip(max=max(len(sorted_values) - 1, 0))
+    return sorted_values[positions] == values if len(sorted_values) else np.zeros(len(values), dtype=bool)
+
+
+@dataclass(frozen=True)
+class BuildTarget:
+    """The collection a build run writes to, its build state and the parts it reads."""
+
+    build_id: int
+    collection_id: int
+    changed_since: Optional[datetime] = None  # None reads every part (a build from scratch)
+
+    @property
+    def fresh(self) -> bool:
+        return self.changed_since is None
+
+
+class TransactionBuilder:
+    """Builds transactions (or per-sender groups) from a collection's parts."""
+
+    def __init__(
+        self,
+        options: Sequence[str] = DEFAULT_BUILD_OPTIONS,
+        session_factory=Session,
+        batch_size: int = 50_000,
+        max_partial_groups: int = 1_000_000,
+        progress: Optional[Callable[[float], None]] = None,
+        analytics: Optional[str] = None,
+        workers: Optional[int] = None,
+    ):
+        self.options = list(options)
+        self.group = GROUP_TRANSACTIONS in options
+        self.include_failed = INCLUDE_FAILED in options
+        self.summaries = GENERATE_SUMMARIES in options
+        self.rebuild = REBUILD in options
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_partial_groups = max_partial_groups
+        self.progress = progress
+        # "duckdb" scans the source collection through `fdc.db.analytics`
+        self.analytics = ANALYTICS_BACKEND if analytics is None else analytics
+        # Shard worker processes; 1 builds in this process
+        self.workers = SHARD_WORKERS if workers is None else workers
+        self.fields = {
+            name: path for name, path in TRANSACTION_FIELDS.items() if not self.group or name in GROUP_FIELDS
+        }
+        self.fields.update(FINGERPRINT_FIELDS)
+        # Options that shape the output; building with others starts from scratch
+        self.output_options = sorted(option for option in self.options if option != REBUILD)
+
+    def frames(
+        self, db, collection_id: int, after_id: int = 0, until_id: Optional[int] = None,
+        part_ids: Optional[Sequence[int]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Yield the collection's parts (one id range, or the parts `part_ids`) as DataFrames of the fields this build needs."""
+        if self.analytics == "duckdb" and part_ids is None:
+            yield from iter_collection_part_frames(
+                database_url(db), collection_id, self.fields, self.batch_size, FIELD_TYPES, after_id, until_id
+            )
+            return
+        columns = ["part_id", *self.fields]
+        for rows in crud.iter_collection_part_fields(
+            db, collection_id, self.fields, self.batch_size, after_id, until_id, part_ids
+        ):
+            yield pd.DataFrame.from_records(rows, columns=columns)
+
+    def build_range(
+        self, db, collection_id: int, stats: BuildStats, after_id: int = 0, until_id: Optional[int] = None,
+        part_ids: Optional[Sequence[int]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Yield the prepared transactions of every batch of an id range (or of the parts `part_ids`).
+
+        Ungrouped builds also get their built parts' `name`, `data` and `content` columns.
+        """
+        meter = StageMeter("build")
+        for frame in self.frames(db, collection_id, after_id, until_id, part_ids):
+            rows = len(frame)
+            stats.source_parts += rows
+            frame = self.prepare(frame, stats)
+            yield frame if self.group else frame.assign(**self.transaction_parts(frame))
+            meter.batch(rows)
+
+    def prepare(self, frame: pd.DataFrame, stats: BuildStats) -> pd.DataFrame:
+        """Keep one row per transaction, flag failures, convert values and fingerprint the inputs.
+
+        Failed transactions are kept (the build state records them) but only
+        built with 'Include failed transactions', see `included`.
+        """
+        frame = frame[(frame["type"] == "transaction") & frame["chain"].notna() & frame["tx_hash"].notna()]
+        before = len(frame)
+        # Several parts of the batch can describe the same transaction; the latest one wins
+        # (`BuildWriter._changed` drops those already built from a later part of an earlier batch)
+        frame = frame.drop_duplicates(["chain", "tx_hash"], keep="last")
+        stats.duplicates += before - len(frame)
+        failed = (frame["status"] == "0x0").to_numpy()
+        frame = frame.assign(fingerprint=self.fingerprints(frame), failed=failed, value=_hex_to_ether(frame["value"]))
+        skipped = 0 if self.include_failed else int(failed.sum())
+        stats.failed_skipped += skipped
+        stats.transactions += len(frame) - skipped
+        return frame
+
+    def included(self, frame: pd.DataFrame) -> np.ndarray:
+        """Which prepared transactions the output holds."""
+        if self.include_failed:
+            return np.ones(len(frame), dtype=bool)
+        return ~frame["failed"].to_numpy(dtype=bool)
+
+    def fingerprints(self, frame: pd.DataFrame) -> np.ndarray:
+        """Signed 64-bit hashes of the fields read, with values normalized so that every backend hashes them alike."""
+        hashes = np.zeros(len(frame), dtype=np.uint64)
+        for name in self.fields:
+            if name in FIELD_TYPES:
+                values = pd.to_numeric(frame[name]).to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = frame[name].fillna("").to_numpy(dtype=object)
+            hashes = hashes * _HASH_MULTIPLIER ^ pd.util.hash_array(values, categorize=False)
+        return hashes.view(np.int64)
+
+    def transaction_parts(self, frame: pd.DataFrame) -> Dict[str, list]:
+        """The built parts' `name`, `data` and `content` of prepared transactions."""
+        built = frame[[
+            "chain", "block_number", "tx_hash", "timestamp", "from", "to", "value", "failed",
+            "from_label", "to_label", "protocol", "token", "part_id"
+        ]].rename(columns={"part_id": "source_part_id"}).assign(type="built_transaction")
+        return {
+            "name": (frame["chain"] + ":" + frame["tx_hash"]).tolist(),
+            # One C-level serialization per batch instead of json.dumps per row
+            "data": built.to_json(orient="records", lines=True).splitlines(),
+            "content": self.transaction_summaries(frame).tolist() if self.summaries else [None] * len(frame),
+        }
+
+    @staticmethod
+    def transaction_summaries(frame: pd.DataFrame) -> pd.Series:
+        sender = frame["from_label"].fillna(frame["from"])
+        target = frame["to_label"].fillna(frame["to"]).fillna("contract creation")
+        summary = sender + " -> " + target + ": " + _format_ether(frame["value"])
+        summary = summary.where(frame["protocol"].isna(), summary + " via " + frame["protocol"].fillna(""))
+        summary = summary.where(frame["token"].isna(), summary + " (" + frame["token"].fillna("") + ")")
+        return summary.where(~frame["failed"], summary + " [failed]")
+
+    @staticmethod
+    def partial_groups(frame: pd.DataFrame) -> pd.DataFrame:
+        """Per-sender partial aggregates of one batch."""
+        return frame.groupby(["chain", "from"], sort=False).agg(
+            from_label=("from_label", "first"),
+            tx_count=("tx_hash", "size"),
+            failed_count=("failed", "sum"),
+            value=("value", "sum"),
+            first_block=("block_number", "min"),
+            last_block=("block_number", "max"),
+            first_timestamp=("timestamp", "min"),
+            last_timestamp=("timestamp", "max"),
+        )
+
+    @staticmethod
+    def merge_groups(partials: List[pd.DataFrame]) -> pd.DataFrame:
+        """Combine partial aggregates into one row per sender."""
+        merged = pd.concat(partials)
+        return merged.groupby(level=["chain", "from"], sort=False).agg(_GROUP_AGGREGATES)
+
+    def group_parts(self, groups: pd.DataFrame) -> Iterator[dict]:
+        """Turn merged sender groups into built part mappings, in batches."""
+        groups = groups.sort_values("tx_count", ascending=False, kind="stable").reset_index()
+        for start in range(0, len(groups), self.batch_size):
+            batch = groups.iloc[start:start + self.batch_size]
+            names = (batch["chain"] + ":" + batch["from"]).tolist()
+            data = batch.assign(type="transaction_group").to_json(orient="records", lines=True).splitlines()
+            if self.summaries:
+                contents = (
+                    batch["from_label"].fillna(batch["from"]) + " sent " + batch["tx_count"].astype(str)
+                    + " transactions (" + batch["failed_count"].astype(str) + " failed) totalling "
+                    + _format_ether(batch["value"]) + " in blocks " + batch["first_block"].astype(str)
+                    + "-" + batch["last_block"].astype(str)
+                ).tolist()
+            else:
+                contents = [None] * len(batch)
+            for name, row, content in zip(names, data, contents):
+                yield {"name": name, "data": row, "content": content}
+
+    def prepare_target(self, db, collection_id: int) -> BuildTarget:
+        """Find or create the "<name> (built)" collection of a source and start a build run into it.
+
+        A collection built before with the same options is built
+        incrementally, from the parts changed since its last run. Otherwise
+        (and when rebuilding) it is emptied and built from scratch: right
+        away when the last run was interrupted, as its build state may be
+        ahead of the built parts, and only on request for a collection built
+        with other options or before builds were tracked.
+        """
+        source = crud.get_collection(db, collection_id)
+        if source is None:
+            raise ValueError(f"Collection {collection_id} does not exist")
+        name = source.name + BUILT_SUFFIX
+        target = crud.get_collection_by_name(db, name)
+        if target is None:
+            target = crud.create_collection(db, name, f"Transactions built from collection #{collection_id}")
+        build = crud.get_build(db, target.id)
+        same = (
+            build is not None and build.source_collection_id == collection_id
+            and json.loads(build.options) == self.output_options
+        )
+        completed = build is not None and build.built_at is not None and build.built_at == build.started_at
+        if same and completed and not self.rebuild:
+            changed_since = build.built_at
+            crud.start_build(db, build.id)
+            return BuildTarget(build.id, target.id, changed_since)
+        if crud.get_last_part_id(db, target.id):
+            if build is None and not self.rebuild:
+                raise ValueError(f"'{name}' is already built; enable '{REBUILD}' to build it again")
+            if not same and not self.rebuild:
+                raise ValueError(f"'{name}' was built with other options; enable '{REBUILD}' to build it again")
+        if build is not None:
+            # Its transactions are kept, so that the run only rewrites those it builds differently
+            crud.reset_build(db, build.id, collection_id, self.output_options)
+        crud.delete_collection_parts(db, target.id)
+        if build is None:
+            build = crud.create_build(db, collection_id, target.id, self.output_options)
+        crud.start_build(db, build.id)
+        return BuildTarget(build.id, target.id)
+
+    def build_collection(self, collection_id: int) -> BuildStats:
+        """Build a collection into its "<name> (built)" collection, from scratch or incrementally."""
+        started = time.perf_counter()
+        stats = BuildStats()
+        with self.session_factory() as db:
+            target = self.prepare_target(db, collection_id)
+            stats.collection_id = target.collection_id
+            stats.incremental = not target.fresh
+            writer = BuildWriter(self, db, stats, target)
+            if not target.fresh:
+                part_ids = crud.get_changed_part_ids(db, collection_id, target.changed_since)
+                total = len(part_ids)
+                results = self.build_range(db, collection_id, stats, part_ids=part_ids)
+            else:
+                total = crud.count_collection_parts(db, collection_id)
+                if self.workers > 1 and total > self.batch_size:
+                    shard_rows = shard_rows_for(total, self.workers, self.batch_size, SHARD_BATCHES)
+                    shards = plan_shards(db, collection_id, shard_rows)
+                    results = map_shards(
+                        _build_shard, shards, database_url(db), self.options, self.batch_size, self.analytics,
+                        collection_id, workers=self.workers
+                    )
+                else:
+                    results = self.build_range(db, collection_id, stats)
+            for result in results:
+                if isinstance(result, tuple):  # a shard: its batches of transactions and its stats
+                    frames, shard_stats = result
+                    stats.add(shard_stats)
+                else:
+                    frames = [result]
+                for frame in frames:
+                    writer.add(frame)
+                if self.progress and total:
+                    self.progress(min(1.0, stats.source_parts / total))
+            writer.finish()
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+
+def _native(values: pd.Series) -> list:
+    """A column as a list of DB-native Python values (None for missing ones)."""
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+class BuildWriter:
+    """Writes the prepared transactions of a build run into its target collection and build state as they arrive.
+
+    Every batch is compared with the build state by chain and tx hash: new
+    transactions are added, those whose latest source part or its fingerprint
+    changed replace what was built from them before, and the rest is
+    skipped. The state rows are written `STATE_WRITE_ROWS` at a time, and
+    ungrouped builds insert, update or delete the built parts right away.
+    Grouped builds from scratch keep (and periodically merge) partial sender
+    groups of the new transactions until `finish` writes them; every other
+    changed group is aggregated again from the build state by `finish`.
+    """
+
+    def __init__(self, builder: TransactionBuilder, db, stats: BuildStats, target: BuildTarget):
+        self.builder = builder
+        self.db = db
+        self.stats = stats
+        self.target = target
+        self.partials: List[pd.DataFrame] = []
+        self.partial_rows = 0
+        self.order = 0 if target.fresh else crud.get_next_part_order(db, target.collection_id)
+        # Sorted keys of the transactions written so far (builds from scratch)
+        self.seen = np.empty(0, dtype=np.int64)
+        self.changed_groups: Set[Tuple[str, str]] = set()
+        # `built_transaction` columns of the batches not written yet
+        self.state: List[Dict[str, list]] = []
+        self.state_rows = 0
+
+    def add(self, frame: Optional[pd.DataFrame]) -> None:
+        """Take a batch of prepared transactions (with their built parts, ungrouped)."""
+        if frame is None or not len(frame):
+            return
+        changed = self._changed(frame)
+        if not len(changed):
+            return
+        included = self.builder.included(changed)
+        known = (changed["_merge"] == "both").to_numpy()
+        removed: List[int] = []
+        if self.builder.group:
+            built_part_ids = [None] * len(changed)
+            self._add_to_groups(changed, included, known)
+        else:
+            built_part_ids, removed = self._write_parts(changed, included)
+        self.state.append(self._state_columns(changed, built_part_ids))
+        self.state_rows += len(changed)
+        if removed or self.state_rows >= STATE_WRITE_ROWS:
+            # Before the parts are deleted, so that the state stops referencing them
+            self._write_state()
+        self._delete_parts(removed)
+
+    def _write_state(self) -> None:
+        """Write the `built_transaction` rows of the batches taken since the last write."""
+        if not self.state:
+            return
+        columns = {name: [value for state in self.state for value in state[name]] for name in self.state[0]}
+        crud.upsert_built_transactions(self.db, self.target.build_id, columns)
+        self.state, self.state_rows = [], 0
+
+    def _changed(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """The transactions of a batch that are new or changed, with what was built from them before."""
+        keys = _tx_keys(frame)
+        frame = frame.reset_index(drop=True).assign(tx_key=keys)
+        candidates = keys
+        if self.target.fresh:
+            # Only the transactions of earlier batches can be in the build state yet
+            candidates = keys[_contains(self.seen, keys)]
+            self.seen = np.sort(np.concatenate([self.seen, keys]), kind="stable")
+        if len(candidates):
+            self._write_state()  # the lookup only sees written rows
+        existing = pd.DataFrame(
+            crud.get_built_transactions(self.db, self.target.build_id, candidates.tolist()) if len(candidates) else [],
+            columns=["chain", "tx_key", "old_part_id", "old_fingerprint", "built_part_id", "old_sender"]
+        ).astype({"tx_key": "int64", "old_part_id": "Int64", "old_fingerprint": "Int64", "built_part_id": "Int64"})
+        merged = frame.merge(existing, on=["chain", "tx_key"], how="left", indicator=True)
+        # An earlier part than the one built from, or the same part with the same inputs
+        older = (merged["old_part_id"] > merged["part_id"]).fillna(False).to_numpy(dtype=bool)
+        same = (
+            (merged["old_part_id"] == merged["part_id"]) & (merged["old_fingerprint"] == merged["fingerprint"])
+        ).fillna(False).to_numpy(dtype=bool)
+        self.stats.duplicates += int(older.sum())
+        if self.target.fresh:
+            # Built from an earlier batch's part; the latest one wins
+            self.stats.duplicates += int((~older & (merged["_merge"] == "both")).sum())
+        self.stats.unchanged += int(same.sum())
+        return merged[~older & ~same].reset_index(drop=True)
+
+    def _write_parts(self, changed: pd.DataFrame, included: np.ndarray) -> Tuple[list, List[int]]:
+        """Insert, update or drop the built parts of changed transactions (ungrouped builds).
+
+        Returns every transaction's built part id (None when it is left out)
+        and the ids of the parts to delete.
+        """
+        has_part = changed["built_part_id"].notna().to_numpy()
+        old_ids = _native(changed["built_part_id"])
+        names, data, contents = changed["name"].tolist(), changed["data"].tolist(), changed["content"].tolist()
+        updates = [
+            {"id": old_ids[i], "data": data[i], "content": contents[i]} for i in np.flatnonzero(included & has_part)
+        ]
+        if updates:
+            crud.bulk_update_collection_parts(self.db, updates)
+        inserts = np.flatnonzero(included & ~has_part)
+        new_ids = crud.bulk_create_derived_parts(self.db, self.target.collection_id, (
+            {"name": names[i], "data": data[i], "content": contents[i], "order": self.order + position}
+            for position, i in enumerate(inserts)
+        ))
+        self.order += len(inserts)
+        self.stats.built_parts += len(updates) + len(new_ids)
+        built_part_ids = [
+            (old_ids[i] if has_part[i] else new_ids[names[i]]) if included[i] else None for i in range(len(changed))
+        ]
+        return built_part_ids, [old_ids[i] for i in np.flatnonzero(~included & has_part)]
+
+    def _add_to_groups(self, changed: pd.DataFrame, included: np.ndarray, known: np.ndarray) -> None:
+        """Aggregate new transactions into partial groups (builds from scratch), or mark their groups changed."""
+        builder = self.builder
+        if self.target.fresh:
+            new = changed[~known & included]
+            if len(new):
+                partial = builder.partial_groups(new)
+                self.partials.append(partial)
+                self.partial_rows += len(partial)
+            if self.partial_rows > builder.max_partial_groups:
+                self.partials = [builder.merge_groups(self.partials)]
+                self.partial_rows = len(self.partials[0])
+            changed = changed[known]
+        # The group a changed transaction joins, and the one it leaves
+        self.changed_groups.update(zip(changed["chain"], changed["from"]))
+        self.changed_groups.update(zip(changed["chain"], changed["old_sender"].fillna(changed["from"])))
+
+    def _state_columns(self, changed: pd.DataFrame, built_part_ids: list) -> Dict[str, list]:
+        """`built_transaction` columns of changed transactions."""
+        return {
+            "source_part_id": _native(changed["part_id"]),
+            "built_part_id": built_part_ids,
+            "chain": _native(changed["chain"]),
+            "tx_hash": _native(changed["tx_hash"]),
+            "tx_key": changed["tx_key"].tolist(),
+            "sender": _native(changed["from"]),
+            "sender_key": _native(pd.Series(_sender_keys(changed), dtype="Int64").where(changed["from"].notna())),
+            "fingerprint": _native(changed["fingerprint"]),
+            "failed": changed["failed"].astype(int).tolist(),
+            "value": _native(changed["value"]),
+            "block_number": _native(pd.to_numeric(changed["block_number"]).astype("Int64")),
+            "timestamp": _native(pd.to_numeric(changed["timestamp"]).astype("Int64")),
+            "from_label": _native(changed["from_label"]),
+        }
+
+    def _remove_orphans(self) -> None:
+        """Remove the transactions whose source part was deleted (e.g. by a reorg rewind).
+
+        Runs last, so that transactions collected again under new parts took
+        their state rows (and built parts) over.
+        """
+        orphans = crud.get_orphaned_built_transactions(self.db, self.target.build_id)
+        if not orphans:
+            return
+        crud.delete_orphaned_built_transactions(self.db, self.target.build_id)
+        if self.builder.group:
+            self.changed_groups.update((chain, sender) for chain, _, _, _, _, sender in orphans)
+        else:
+            self._delete_parts([built_part_id for _, _, _, _, built_part_id, _ in orphans if built_part_id is not None])
+
+    def _delete_parts(self, part_ids: List[int]) -> None:
+        if part_ids:
+            self.stats.removed += crud.delete_collection_parts_by_id(self.db, self.target.collection_id, part_ids)
+
+    def _write_groups(self, groups: pd.DataFrame, existing: Dict[Tuple[str, str], int]) -> None:
+        """Insert the built parts of new sender groups and update those of `existing` ones."""
+        parts, updates = [], []
+        for part in self.builder.group_parts(groups):
+            key = tuple(part["name"].split(":", 1))  # "<chain>:<sender>"
+            if key in existing:
+                updates.append({"id": existing[key], "data": part["data"], "content": part["content"]})
+            else:
+                parts.append(part)
+        if updates:
+            crud.bulk_update_collection_parts(self.db, updates)
+        start = self.order
+        new_ids = crud.bulk_create_derived_parts(self.db, self.target.collection_id, (
+            {**part, "order": start + position} for position, part in enumerate(parts)
+        ))
+        self.order += len(new_ids)
+        crud.create_built_groups(
+            self.db, self.target.build_id, {tuple(name.split(":", 1)): part_id for name, part_id in new_ids.items()}
+        )
+        self.stats.built_parts += len(updates) + len(new_ids)
+
+    def _update_groups(self, keys: Set[Tuple[str, str]]) -> None:
+        """Aggregate changed sender groups again from the build state and rewrite their built parts."""
+        builder = self.builder
+        keys = [key for key in keys if isinstance(key[1], str)]  # transactions without a sender form no group
+        senders = dict(zip(keys, _sender_keys(pd.DataFrame(keys, columns=["chain", "from"])).tolist()))
+        members = pd.DataFrame(
+            crud.get_group_members(self.db, self.target.build_id, senders, builder.include_failed),
+            columns=["chain", "from", "tx_hash", "failed", "value", "block_number", "timestamp", "from_label"]
+        ).astype({"failed": bool})
+        groups = builder.merge_groups([builder.partial_groups(members)]) if len(members) else None
+        existing = crud.get_built_groups(self.db, self.target.build_id, keys)
+        gone = [key for key in existing if groups is None or key not in groups.index]
+        if gone:
+            crud.delete_built_groups(self.db, self.target.build_id, gone)
+            self._delete_parts([existing.pop(key) for key in gone])
+        if groups is not None:
+            self._write_groups(groups, existing)
+
+    def finish(self) -> None:
+        """Remove orphaned transactions, write the sender groups (grouped builds) and record the run as completed."""
+        self._write_state()
+        if not self.target.fresh:
+            self._remove_orphans()
+        if self.builder.group:
+            if self.partials:
+                groups = self.builder.merge_groups(self.partials)
+                if self.changed_groups:
+                    # Aggregated from the build state below instead
+                    groups = groups[~groups.index.isin(list(self.changed_groups))]
+                self._write_groups(groups, {})
+                self.partials, self.partial_rows = [], 0
+            if self.changed_groups:
+                self._update_groups(self.changed_groups)
+                self.changed_groups = set()
+        crud.finish_build(self.db, self.target.build_id)
+
+
+def _build_shard(
+    url: str, options: Sequence[str], batch_size: int, analytics: str, collection_id: int, shard: Shard
+) -> Tuple[List[pd.DataFrame], BuildStats]:
+    """Shard worker: the batches of prepared transactions of one shard, and its stats."""
+    builder = TransactionBuilder(
+        options, session_factory=worker_sessions(url), batch_size=batch_size, analytics=analytics, workers=1
+    )
+    stats = BuildStats()
+    with builder.session_factory() as db:
+        results = list(builder.build_range(db, collection_id, stats, shard.after_id, shard.until_id))
+    REGISTRY.flush(force=True)
+    return results, stats
+
+
+def build(collection_id: int, options: Sequence[str] = DEFAULT_BUILD_OPTIONS, **kwargs) -> BuildStats:
+    """Run the builder synchronously over a collection."""
+    return TransactionBuilder(options, **kwargs).build_collection(collection_id)
+
+
+def run_job(job) -> str:
+    """Job runner entry point for the Transaction Builder stage (see `fdc.pipeline.jobs`)."""
+    if job.collection_id is None:
+        raise ValueError("The Transaction Builder needs a collection to build")
+    options = job.params.get("options", DEFAULT_BUILD_OPTIONS)
+    stats = build(job.collection_id, options, session_factory=job.session_factory, progress=job.report)
+    kind = "sender groups" if GROUP_TRANSACTIONS in options else "transactions"
+    if stats.incremental:
+        return (
+            f"Updated {stats.built_parts:,} {kind} from {stats.source_parts:,} changed parts "
+            f"({stats.unchanged:,} unchanged, {stats.removed:,} removed) in {stats.elapsed:.1f}s"
+        )
+    return (
+        f"Built {stats.built_parts:,} {kind} from {stats.transactions:,} transactions "
+        f"({stats.failed_skipped:,} failed skipped, {stats.duplicates:,} duplicates) in {stats.elapsed:.1f}s"
+    )
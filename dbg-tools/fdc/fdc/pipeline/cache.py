@@ -0,0 +1,183 @@
+"""Two-tier lookup cache used by the enricher resolvers.
+
+Tier one is an in-process LRU with per-entry TTL, tier two is the persistent
+`lookup_cache` table shared by every worker process. `LookupCache.get_many`
+also deduplicates in-flight loads, so concurrent blocks asking for the same
+router or token contract trigger a single remote lookup.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from fdc.db import crud
+from fdc.db.session import Session
+
+# Sentinel distinguishing "not cached" from a cached None
+_MISSING = object()
+
+Loader = Callable[[list], Awaitable[Dict[str, Any]]]
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 100_000, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = _MISSING) -> Any:
+        """Return the live value for `key` (refreshing its LRU position) or `default`."""
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store `value`, evicting the least recently used entry when full."""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+@dataclass
+class CacheStats:
+    """Hit and miss counters of a `LookupCache`."""
+
+    memory_hits: int = 0
+    db_hits: int = 0
+    inflight_hits: int = 0
+    misses: int = 0
+
+    def add(self, other: "CacheStats") -> None:
+        """Add another cache's counters (e.g. a shard worker's)."""
+        self.memory_hits += other.memory_hits
+        self.db_hits += other.db_hits
+        self.inflight_hits += other.inflight_hits
+        self.misses += other.misses
+
+    @property
+    def lookups(self) -> int:
+        return self.memory_hits + self.db_hits + self.inflight_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return 1 - self.misses / self.lookups if self.lookups else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"cache hit rate {self.hit_rate:.1%} (memory {self.memory_hits:,}, db {self.db_hits:,}, "
+            f"in-flight {self.inflight_hits:,}, misses {self.misses:,})"
+        )
+
+
+class LookupCache:
+    """Memory + SQLite cache in front of batched, async resolvers."""
+
+    def __init__(self, session_factory=Session, maxsize: int = 100_000, memory_ttl: float = 3600.0):
+        self.session_factory = session_factory
+        self.memory = TTLCache(maxsize, memory_ttl)
+        self.stats = CacheStats()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    async def get_many(
+        self, namespace: str, keys: Iterable[str], loader: Loader,
+        ttl: timedelta = timedelta(days=7), persistent: bool = True
+    ) -> Dict[str, Any]:
+        """Resolve `keys` through memory, the database, in-flight loads and finally `loader`.
+
+        `loader` receives the list of keys missing from every tier and returns
+        a mapping of resolved values; keys it omits are cached as None.
+        Non-persistent namespaces skip the database tier.
+        """
+        results: Dict[str, Any] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            value = self.memory.get((namespace, key))
+            if value is not _MISSING:
+                self.stats.memory_hits += 1
+                results[key] = value
+            elif (namespace, key) in self._inflight:
+                self.stats.inflight_hits += 1
+                waiting[key] = self._inflight[(namespace, key)]
+            else:
+                missing.append(key)
+
+        if missing:
+            # Claim the keys before the first await so concurrent callers wait on us
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            for key, future in futures.items():
+                self._inflight[(namespace, key)] = future
+            try:
+                loaded = await self._load(namespace, missing, loader, ttl, persistent)
+            except BaseException as e:
+                for future in futures.values():
+                    future.set_exception(e)
+                    future.exception()  # mark retrieved; the caller re-raises
+                raise
+            finally:
+                for key in missing:
+                    self._inflight.pop((namespace, key), None)
+            for key, future in futures.items():
+                future.set_result(loaded.get(key))
+            results.update(loaded)
+
+        for key, future in waiting.items():
+            results[key] = await future
+        return results
+
+    async def _load(
+        self, namespace: str, keys: list, loader: Loader, ttl: timedelta, persistent: bool
+    ) -> Dict[str, Any]:
+        """Fill `keys` from the database tier, then from `loader`."""
+        found: Dict[str, Any] = {}
+        if persistent:
+            found = await asyncio.to_thread(self._db_get, namespace, keys)
+            self.stats.db_hits += len(found)
+        remaining = [key for key in keys if key not in found]
+        if remaining:
+            self.stats.misses += len(remaining)
+            fetched = await loader(remaining)
+            fetched = {key: fetched.get(key) for key in remaining}
+            if persistent:
+                await asyncio.to_thread(self._db_put, namespace, fetched, ttl)
+            found.update(fetched)
+        for key, value in found.items():
+            self.memory.set((namespace, key), value, min(ttl.total_seconds(), self.memory.ttl))
+        return found
+
+    def _db_get(self, namespace: str, keys: list) -> Dict[str, Any]:
+        with self.session_factory() as db:
+            return crud.get_cached_lookups(db, namespace, keys)
+
+    def _db_put(self, namespace: str, values: Dict[str, Any], ttl: timedelta) -> None:
+        with self.session_factory() as db:
+            # Naive UTC, like every time the database stores
+            expires_at = datetime.now(timezone.utc).replace(tzinfo=None) + ttl
+            crud.put_cached_lookups(db, namespace, values, expires_at)
+
+
+_shared_cache: Optional[LookupCache] = None
+
+
+def get_lookup_cache() -> LookupCache:
+    """Return the process-wide cache, so consecutive jobs in a worker share tier one."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = LookupCache()
+    return _shared_cache
@@ -0,0 +1,170 @@
+"""Local stand-in JSON-RPC server for exercising the pipeline without a real node.
+
+Serves a deterministic fake chain: block `n` always has the same hash and the
+same transactions, so collector runs are reproducible. Latency, failure rate
+and the maximum batch size can be tuned to exercise retries and adaptive
+batching.
+
+Usage: python -m fdc.pipeline.devnet --port 8545 --chain-id 1
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from aiohttp import web
+
+
+def _hash(*parts) -> str:
+    """Deterministic 32-byte hex hash of `parts`."""
+    return "0x" + hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()
+
+
+def _address(seed) -> str:
+    """Deterministic 20-byte hex address for `seed`."""
+    return "0x" + hashlib.sha256(f"address:{seed}".encode()).hexdigest()[:40]
+
+
+class Devnet:
+    """A fake EVM chain answering the JSON-RPC methods the pipeline uses."""
+
+    def __init__(
+        self, chain_id: int = 1, head: int = 1_000_000, block_time: float = 12.0, txs_per_block: int = 5,
+        latency: float = 0.0, failure_rate: float = 0.0, max_batch: int = 1000, addresses: int = 200
+    ):
+        self.chain_id = chain_id
+        self.head = head
+        self.block_time = block_time
+        self.txs_per_block = txs_per_block
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_batch = max_batch
+        self.addresses = addresses
+        self.genesis_time = int(time.time() - head * block_time)
+        self.requests = 0
+        self._contracts = {_address(seed) for seed in range(addresses // 10 or 1)}
+
+    def block(self, number: int, full: bool) -> dict:
+        """Build block `number`; transactions are objects when `full`."""
+        rng = random.Random(f"{self.chain_id}:{number}")
+        block_hash = _hash(self.chain_id, "block", number)
+        transactions = []
+        for index in range(self.txs_per_block):
+            tx_hash = _hash(self.chain_id, "tx", number, index)
+            transactions.append({
+                "hash": tx_hash,
+                "blockHash": block_hash,
+                "blockNumber": hex(number),
+                "transactionIndex": hex(index),
+                # A small address pool so the same routers/tokens repeat, like mainnet
+                "from": _address(rng.randrange(self.addresses)),
+                "to": _address(rng.randrange(self.addresses // 10 or 1)),
+                "value": hex(rng.randrange(10 ** 18)),
+                "gas": hex(21000 + rng.randrange(200000)),
+                "input": "0x" + rng.choice(["", "a9059cbb", "38ed1739", "095ea7b3"]),
+                "nonce": hex(rng.randrange(1000)),
+                "status": hex(0 if rng.random() < 0.05 else 1),
+            } if full else tx_hash)
+        return {
+            "number": hex(number),
+            "hash": block_hash,
+            "parentHash": _hash(self.chain_id, "block", number - 1),
+            "timestamp": hex(int(self.genesis_time + number * self.block_time)),
+            "transactions": transactions,
+        }
+
+    def dispatch(self, method: str, params: list):
+        """Answer a single JSON-RPC call."""
+        if method == "eth_chainId":
+            return hex(self.chain_id)
+        if method == "eth_blockNumber":
+            return hex(self.head)
+        if method == "eth_getBlockByNumber":
+            tag, full = params[0], bool(params[1]) if len(params) > 1 else False
+            number = self.head if tag == "latest" else int(tag, 16)
+            return self.block(number, full) if number <= self.head else None
+        if method == "eth_getCode":
+            return "0x6080" if self.is_contract(params[0]) else "0x"
+        if method == "eth_call":
+            return self.call(params[0]["to"], params[0]["data"][:10])
+        raise KeyError(method)
+
+    def is_contract(self, address: str) -> bool:
+        """Every address that is a transaction target is a (token) contract."""
+        return address in self._contracts
+
+    def call(self, address: str, selector: str) -> str:
+        """Answer ERC20 metadata calls of token contracts; anything else reverts."""
+        if not self.is_contract(address):
+            raise ValueError("execution reverted")
+        if selector == "0x313ce567":  # decimals()
+            return "0x" + (18).to_bytes(32, "big").hex()
+        text = {"0x06fdde03": f"Token {address[2:6]}", "0x95d89b41": f"T{address[2:5].upper()}"}.get(selector)
+        if text is None:
+            raise ValueError("execution reverted")
+        encoded = text.encode()
+        return "0x" + (32).to_bytes(32, "big").hex() + len(encoded).to_bytes(32, "big").hex() + encoded.ljust(32, b"\0").hex()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """aiohttp handler for single and batch JSON-RPC requests."""
+        self.requests += 1
+        payload = await request.json()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            return web.Response(status=503, text="flaky devnet")
+        calls = payload if isinstance(payload, list) else [payload]
+        if len(calls) > self.max_batch:
+            return web.Response(status=413, text="batch too large")
+        replies = []
+        for call in calls:
+            try:
+                replies.append({"jsonrpc": "2.0", "id": call["id"], "result": self.dispatch(call["method"], call.get("params", []))})
+            except KeyError:
+                replies.append({"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32601, "message": "Method not found"}})
+            except ValueError as e:
+                replies.append({"jsonrpc": "2.0", "id": call["id"], "error": {"code": 3, "message": str(e)}})
+        return web.json_response(replies if isinstance(payload, list) else replies[0], dumps=json.dumps)
+
+
+# The `Devnet` served by an app started with `start_devnet` (`runner.app[DEVNET]`)
+DEVNET = web.AppKey("devnet", Devnet)
+
+
+async def start_devnet(host: str = "127.0.0.1", port: int = 8545, **options) -> web.AppRunner:
+    """Start a devnet on `host:port` in the running loop; call `.cleanup()` to stop."""
+    devnet = Devnet(**options)
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app[DEVNET] = devnet
+    app.router.add_post("/", devnet.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in JSON-RPC server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--chain-id", type=int, default=1)
+    parser.add_argument("--block-time", type=float, default=12.0)
+    parser.add_argument("--txs-per-block", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-batch", type=int, default=1000)
+    args = parser.parse_args()
+    devnet = Devnet(
+        chain_id=args.chain_id, block_time=args.block_time, txs_per_block=args.txs_per_block,
+        latency=args.latency, failure_rate=args.failure_rate, max_batch=args.max_batch
+    )
+    app = web.Application(client_max_size=64 * 1024 ** 2)
+    app.router.add_post("/", devnet.handle)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+"""Enricher stage engine - labels, contract, token and protocol lookups.
+
+Every resolver sits behind the shared `LookupCache` (in-process LRU/TTL plus
+the persistent `lookup_cache` table). Lookups are batched per block: the
+unique keys of all transactions in a block go to each resolver at once, and
+in-flight deduplication makes concurrent blocks share a single remote call
+for the routers and tokens that appear in most transactions.
+
+Parts that already carry an enrichment of the current version with the
+selected options are skipped, and parts whose payload (`content_hash`) was
+already enriched in another collection copy that enrichment instead of
+resolving it again, so re-collected overlapping ranges cost almost nothing.
+
+Large collections are enriched by several worker processes at once, one
+id-range shard each (`fdc.pipeline.shards`); every worker writes its own
+parts and has its own in-process cache tier.
+"""
+
+import asyncio
+import dataclasses
+import functools
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiohttp
+
+from fdc.db import crud
+from fdc.db.session import Session
+from fdc.metrics import REGISTRY, StageMeter
+from fdc.pipeline.cache import CacheStats, LookupCache, get_lookup_cache
+from fdc.pipeline.collector import SOURCES, RpcClient, call_with_retries
+from fdc.pipeline.shards import (
+    SHARD_WORKERS, Shard, database_url, map_shards, plan_shards, shard_rows_for, worker_sessions
+)
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the enrichment output changes shape, so builds can tell
+# stale enrichments apart.
+ENRICHMENT_VERSION = 1
+
+ENRICHMENT_OPTIONS = [
+    "Address Labeling",
+    "Contract Resolution",
+    "Token Data",
+    "Protocol Identification",
+]
+
+# Well-known mainnet addresses. Extend with FDC_ADDRESS_LABELS pointing to a
+# JSON file of {"0xaddress": "label"}.
+KNOWN_LABELS = {
+    "0x7a250d5630b4cf539739df2c5dacb4c659f2488d": "Uniswap V2: Router",
+    "0xe592427a0aece92de3edee1f18e0157c05861564": "Uniswap V3: Router",
+    "0x68b3465833fb72a70ecdf485e0e4c7bd8665fc45": "Uniswap V3: Router 2",
+    "0x3fc91a3afd70395cd496c647d5a6cc9d4b2b7fad": "Uniswap: Universal Router",
+    "0x1111111254eeb25477b68fb85ed929f73a960582": "1inch: Aggregation Router V5",
+    "0x00000000000000adc04c56bf30ac9d3c0aaf14dc": "OpenSea: Seaport 1.5",
+    "0xdac17f958d2ee523a2206206994597c13d831ec7": "Tether: USDT",
+    "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48": "Circle: USDC",
+    "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2": "Wrapped Ether: WETH",
+}
+
+# 4-byte selectors -> protocol / action
+SELECTOR_PROTOCOLS = {
+    "a9059cbb": "ERC20: transfer",
+    "23b872dd": "ERC20: transferFrom",
+    "095ea7b3": "ERC20: approve",
+    "38ed1739": "Uniswap V2: swapExactTokensForTokens",
+    "7ff36ab5": "Uniswap V2: swapExactETHForTokens",
+    "18cbafe5": "Uniswap V2: swapExactTokensForETH",
+    "414bf389": "Uniswap V3: exactInputSingle",
+    "c04b8d59": "Uniswap V3: exactInput",
+    "3593564c": "Uniswap: execute",
+    "12aa3caf": "1inch: swap",
+}
+
+# Selectors whose target is an ERC20 token contract
+TOKEN_SELECTORS = {"a9059cbb", "23b872dd", "095ea7b3"}
+
+# ERC20 metadata calls: name(), symbol(), decimals()
+_TOKEN_CALLS = (("name", "0x06fdde03"), ("symbol", "0x95d89b41"), ("decimals", "0x313ce567"))
+
+
+def _load_labels() -> Dict[str, str]:
+    """Known labels merged with the optional FDC_ADDRESS_LABELS file."""
+    labels = dict(KNOWN_LABELS)
+    path = os.environ.get("FDC_ADDRESS_LABELS")
+    if path:
+        with open(path) as f:
+            labels.update((address.lower(), label) for address, label in json.load(f).items())
+    return labels
+
+
+def _selector(tx: dict) -> Optional[str]:
+    """The 4-byte function selector of a transaction, if it calls one."""
+    data = tx.get("input") or ""
+    return data[2:10].lower() if len(data) >= 10 else None
+
+
+def _decode_string(result: Optional[str]) -> Optional[str]:
+    """Decode an ABI `string` (or legacy `bytes32`) return value."""
+    if not result or result == "0x":
+        return None
+    data = bytes.fromhex(result[2:])
+    if len(data) == 32:
+        return data.rstrip(b"\0").decode(errors="replace") or None
+    if len(data) >= 64:
+        offset = int.from_bytes(data[:32], "big")
+        length = int.from_bytes(data[offset:offset + 32], "big")
+        return data[offset + 32:offset + 32 + length].decode(errors="replace")
+    return None
+
+
+def _decode_uint(result: Optional[str]) -> Optional[int]:
+    """Decode an ABI `uint` return value."""
+    if not result or result == "0x":
+        return None
+    return int(result, 16)
+
+
+@dataclass
+class Resolver:
+    """A cached lookup: which keys a transaction needs and how to load them."""
+
+    option: str
+    name: str
+    keys: Callable[[dict], Iterable[str]]
+    load: Callable[[Optional[RpcClient], List[str]], Any]
+    apply: Callable[[dict, dict, Dict[str, Any]], None]
+    persistent: bool = True
+    ttl: timedelta = timedelta(days=7)
+
+
+def _label_resolver(labels: Dict[str, str]) -> Resolver:
+    async def load(client, addresses):
+        return {address: labels.get(address) for address in addresses}
+
+    def apply(enrichment, tx, values):
+        enrichment["from_label"] = values.get((tx.get("from") or "").lower())
+        enrichment["to_label"] = values.get((tx.get("to") or "").lower())
+
+    return Resolver(
+        "Address Labeling", "label",
+        keys=lambda tx: [address.lower() for address in (tx.get("from"), tx.get("to")) if address],
+        load=load, apply=apply, persistent=False, ttl=timedelta(hours=1)
+    )
+
+
+async def _load_contracts(client: Optional[RpcClient], addresses: List[str]) -> Dict[str, Any]:
+    if client is None:
+        return {}
+    codes = await call_with_retries(lambda: client.batch(
+        [("eth_getCode", [address, "latest"]) for address in addresses], allow_errors=True
+    ))
+    return {
+        address: {"is_contract": bool(code and code != "0x"), "code_size": (len(code) - 2) // 2 if code else 0}
+        for address, code in zip(addresses, codes)
+    }
+
+
+def _apply_contract(enrichment, tx, values):
+    contract = values.get((tx.get("to") or "").lower())
+    enrichment["to_is_contract"] = contract["is_contract"] if contract else None
+
+
+async def _load_tokens(client: Optional[RpcClient], addresses: List[str]) -> Dict[str, Any]:
+    if client is None:
+        return {}
+    calls = [
+        ("eth_call", [{"to": address, "data": selector}, "latest"])
+        for address in addresses for _, selector in _TOKEN_CALLS
+    ]
+    results = await call_with_retries(lambda: client.batch(calls, allow_errors=True))
+    tokens = {}
+    for i, address in enumerate(addresses):
+        name, symbol, decimals = results[i * 3:i * 3 + 3]
+        token = {"name": _decode_string(name), "symbol": _decode_string(symbol), "decimals": _decode_uint(decimals)}
+        tokens[address] = token if any(value is not None for value in token.values()) else None
+    return tokens
+
+
+def _apply_token(enrichment, tx, values):
+    enrichment["token"] = values.get((tx.get("to") or "").lower()) if _selector(tx) in TOKEN_SELECTORS else None
+
+
+def _protocol_resolver(labels: Dict[str, str]) -> Resolver:
+    def key(tx):
+        return f"{(tx.get('to') or '').lower()}:{_selector(tx) or ''}"
+
+    async def load(client, keys):
+        protocols = {}
+        for item in keys:
+            address, selector = item.split(":")
+            label = labels.get(address)
+            protocols[item] = SELECTOR_PROTOCOLS.get(selector) or (label.split(":")[0] if label else None)
+        return protocols
+
+    def apply(enrichment, tx, values):
+        enrichment["protocol"] = values.get(key(tx))
+
+    return Resolver(
+        "Protocol Identification", "protocol", keys=lambda tx: [key(tx)],
+        load=load, apply=apply, persistent=False, ttl=timedelta(hours=1)
+    )
+
+
+def build_resolvers() -> List[Resolver]:
+    """All resolvers, in the order of `ENRICHMENT_OPTIONS`."""
+    labels = _load_labels()
+    return [
+        _label_resolver(labels),
+        Resolver(
+            "Contract Resolution", "contract",
+            keys=lambda tx: [tx["to"].lower()] if tx.get("to") else [],
+            load=_load_contracts, apply=_apply_contract, ttl=timedelta(days=30)
+        ),
+        Resolver(
+            "Token Data", "token",
+            keys=lambda tx: [tx["to"].lower()] if tx.get("to") and _selector(tx) in TOKEN_SELECTORS else [],
+            load=_load_tokens, apply=_apply_token, ttl=timedelta(days=7)
+        ),
+        _protocol_resolver(labels),
+    ]
+
+
+@dataclass
+class EnrichStats:
+    """Result of an enricher run."""
+
+    parts: int = 0
+    blocks: int = 0
+    skipped: int = 0  # already enriched
+    reused: int = 0  # enrichment copied from a part with the same payload
+    elapsed: float = 0.0
+    cache_summary: str = ""
+
+
+class Enricher:
+    """Enriches collected transactions through cached, batched resolvers."""
+
+    def __init__(
+        self,
+        options: Sequence[str] = ENRICHMENT_OPTIONS[:2],
+        session_factory=Session,
+        cache: Optional[LookupCache] = None,
+        batch_size: int = 2000,
+        block_concurrency: int = 16,
+        progress: Optional[Callable[[float], None]] = None,
+        workers: Optional[int] = None,
+        force: bool = False,
+    ):
+        self.options = list(options)
+        self.resolvers = [resolver for resolver in build_resolvers() if resolver.option in options]
+        self.session_factory = session_factory
+        self.cache = cache or get_lookup_cache()
+        self.batch_size = batch_size
+        self.block_concurrency = block_concurrency
+        self.progress = progress
+        # Shard worker processes used by `run`; 1 enriches in this process
+        self.workers = SHARD_WORKERS if workers is None else workers
+        # Enrich every part again, even those already enriched with these options
+        self.force = force
+        self._clients: Dict[str, RpcClient] = {}
+        self._sessions: List[aiohttp.ClientSession] = []
+
+    def _client(self, chain: str) -> Optional[RpcClient]:
+        """Pooled RPC client for `chain` (None for chains without a source)."""
+        if chain not in self._clients:
+            source = next((source for source in SOURCES.values() if source.chain == chain), None)
+            if source is None:
+                return None
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=source.max_concurrency),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+            self._sessions.append(session)
+            self._clients[chain] = RpcClient(session, source.rpc_url)
+        return self._clients[chain]
+
+    def is_enriched(self, data: dict) -> bool:
+        """Whether part `data` holds an enrichment of this version made with (at least) this run's options."""
+        enrichment = data.get("enrichment") or {}
+        return (
+            enrichment.get("version") == ENRICHMENT_VERSION
+            and set(self.options) <= set(enrichment.get("options", ()))
+        )
+
+    def copy_enrichments(self, db, collection_id: int, parts: List[dict]) -> List[dict]:
+        """`id`/`data` updates for the parts whose payload another collection already has enriched.
+
+        Lookups are made per chain, so only an enrichment of the same payload
+        on the same chain is copied.
+        """
+        by_payload = defaultdict(list)
+        for part in parts:
+            if part["content_hash"] and part["data"].get("type") == "transaction":
+                by_payload[(part["content_hash"], part["data"].get("chain"))].append(part)
+        hashes = {digest for digest, _ in by_payload}
+        updates = []
+        for digest, data in crud.get_part_data_by_hash(db, hashes, exclude_collection_id=collection_id):
+            data = json.loads(data or "{}")
+            enrichment = data.get("enrichment")
+            key = (digest, data.get("chain"))
+            if key in by_payload and enrichment and self.is_enriched({"enrichment": enrichment}):
+                updates.extend(
+                    {"id": part["id"], "data": {**part["data"], "enrichment": enrichment}}
+                    for part in by_payload.pop(key)
+                )
+        return updates
+
+    async def enrich_parts(self, parts: List[dict]) -> List[dict]:
+        """Enrich parts (`id`, `data` dict, `content` raw tx JSON) and return `id`/`data` updates."""
+        blocks = defaultdict(list)
+        for part in parts:
+            data = part["data"]
+            if data.get("type") == "transaction":
+                blocks[(data["chain"], data["block_number"])].append(part)
+        semaphore = asyncio.Semaphore(self.block_concurrency)
+
+        async def enrich_block(chain, block_parts):
+            async with semaphore:
+                return await self._enrich_block(chain, block_parts)
+
+        results = await asyncio.gather(*(enrich_block(chain, block_parts) for (chain, _), block_parts in blocks.items()))
+        return [update for block_updates in results for update in block_updates]
+
+    async def _enrich_block(self, chain: str, parts: List[dict]) -> List[dict]:
+        """Run every resolver once for all transactions of a block."""
+        txs = [json.loads(part["content"]) for part in parts]
+        enrichments = [{"version": ENRICHMENT_VERSION, "options": self.options} for _ in parts]
+        client = self._client(chain)
+        for resolver in self.resolvers:
+            keys = [key for tx in txs for key in resolver.keys(tx)]
+            if not keys:
+                values = {}
+            else:
+                values = await self.cache.get_many(
+                    f"{resolver.name}:{chain}", keys,
+                    lambda missing, resolver=resolver: resolver.load(client, missing),
+                    ttl=resolver.ttl, persistent=resolver.persistent
+                )
+            for enrichment, tx in zip(enrichments, txs):
+                resolver.apply(enrichment, tx, values)
+        return [
+            {"id": part["id"], "data": {**part["data"], "enrichment": enrichment}}
+            for part, enrichment in zip(parts, enrichments)
+        ]
+
+    def run(self, collection_id: int) -> EnrichStats:
+        """Enrich a collection, in parallel shards when it spans more than one batch."""
+        with self.session_factory() as db:
+            total = crud.count_collection_parts(db, collection_id)
+            if self.workers <= 1 or total <= self.batch_size:
+                return asyncio.run(self.enrich_collection(collection_id))
+            shards = plan_shards(db, collection_id, shard_rows_for(total, self.workers, self.batch_size))
+            url = database_url(db)
+        started = time.perf_counter()
+        stats, cache_stats = EnrichStats(), CacheStats()
+        for shard_stats, shard_cache_stats in map_shards(
+            _enrich_shard, shards, url, self.options, self.batch_size, self.block_concurrency, self.force,
+            collection_id, workers=self.workers
+        ):
+            stats.parts += shard_stats.parts
+            stats.blocks += shard_stats.blocks
+            stats.skipped += shard_stats.skipped
+            stats.reused += shard_stats.reused
+            cache_stats.add(shard_cache_stats)
+            if self.progress and total:
+                self.progress(min(1.0, stats.parts / total))
+        stats.elapsed = time.perf_counter() - started
+        stats.cache_summary = cache_stats.summary()
+        return stats
+
+    async def enrich_collection(
+        self, collection_id: int, after_id: int = 0, until_id: Optional[int] = None
+    ) -> EnrichStats:
+        """Enrich every transaction part of a collection (or of an id range), one keyset page at a time."""
+        started = time.perf_counter()
+        stats = EnrichStats()
+        # The lookup cache is shared by the jobs of a worker; count this run's lookups only
+        lookups, misses = self.cache.stats.lookups, self.cache.stats.misses
+        try:
+            with self.session_factory() as db:
+                total = await asyncio.to_thread(crud.count_collection_parts, db, collection_id) if self.progress else 0
+                await self.enrich_range(db, collection_id, stats, after_id, until_id, total)
+        finally:
+            await self.close()
+        stats.elapsed = time.perf_counter() - started
+        stats.cache_summary = self.cache.stats.summary()
+        REGISTRY.inc("fdc_cache_requests_total", self.cache.stats.lookups - lookups, cache="enricher_lookup")
+        REGISTRY.inc("fdc_cache_misses_total", self.cache.stats.misses - misses, cache="enricher_lookup")
+        return stats
+
+    async def enrich_range(
+        self, db, collection_id: int, stats: EnrichStats, after_id: int = 0, until_id: Optional[int] = None,
+        total: int = 0
+    ) -> None:
+        """Enrich the parts with `after_id < id <= until_id` into `stats`; progress is relative to `total`."""
+        meter = StageMeter("enrich")
+        while True:
+            page = await asyncio.to_thread(
+                crud.get_collection_parts, db, collection_id, limit=self.batch_size, after_id=after_id,
+                until_id=until_id
+            )
+            if not page:
+                break
+            after_id = page[-1].id
+            parts = [
+                {
+                    "id": part.id, "data": json.loads(part.data or "{}"), "content": part.content,
+                    "content_hash": part.content_hash
+                }
+                for part in page
+            ]
+            pending = parts if self.force else [part for part in parts if not self.is_enriched(part["data"])]
+            stats.skipped += len(parts) - len(pending)
+            updates = []
+            if pending and not self.force:
+                updates = await asyncio.to_thread(self.copy_enrichments, db, collection_id, pending)
+                stats.reused += len(updates)
+                copied = {update["id"] for update in updates}
+                pending = [part for part in pending if part["id"] not in copied]
+            updates += await self.enrich_parts(pending)
+            if updates:
+                await asyncio.to_thread(crud.bulk_update_collection_parts, db, updates)
+            stats.parts += len(page)
+            meter.batch(len(page))
+            stats.blocks += len({(part["data"].get("chain"), part["data"].get("block_number")) for part in parts})
+            if self.progress and total:
+                self.progress(min(1.0, stats.parts / total))
+
+    async def close(self) -> None:
+        """Close the pooled RPC sessions (they are reopened on the next lookup)."""
+        for session in self._sessions:
+            await session.close()
+        self._sessions.clear()
+        self._clients.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def _worker_cache(url: str) -> LookupCache:
+    """Lookup cache of a shard worker, shared by the shards it runs."""
+    return LookupCache(worker_sessions(url))
+
+
+def _enrich_shard(
+    url: str, options: Sequence[str], batch_size: int, block_concurrency: int, force: bool, collection_id: int,
+    shard: Shard
+) -> Tuple[EnrichStats, CacheStats]:
+    """Shard worker: enrich one shard; return its stats and its cache counters."""
+    cache = _worker_cache(url)
+    before = dataclasses.asdict(cache.stats)
+    enricher = Enricher(
+        options, session_factory=worker_sessions(url), cache=cache, batch_size=batch_size,
+        block_concurrency=block_concurrency, workers=1, force=force
+    )
+    stats = asyncio.run(enricher.enrich_collection(collection_id, shard.after_id, shard.until_id))
+    REGISTRY.flush(force=True)
+    return stats, CacheStats(**{name: value - before[name] for name, value in dataclasses.asdict(cache.stats).items()})
+
+
+def enrich(collection_id: int, options: Sequence[str] = ENRICHMENT_OPTIONS[:2], **kwargs) -> EnrichStats:
+    """Run the enricher synchronously over a collection (sharded over `workers` processes)."""
+    return Enricher(options, **kwargs).run(collection_id)
+
+
+def run_job(job) -> str:
+    """Job runner entry point for the Enricher stage (see `fdc.pipeline.jobs`)."""
+    if job.collection_id is None:
+        raise ValueError("The Enricher needs a collection to enrich")
+    stats = enrich(
+        job.collection_id, job.params.get("options", ENRICHMENT_OPTIONS[:2]),
+        session_factory=job.session_factory, progress=job.report, force=job.params.get("force", False)
+    )
+    return (
+        f"Enriched {stats.parts:,} parts in {stats.elapsed:.1f}s ({stats.skipped:,} already enriched, "
+        f"{stats.reused:,} copied from identical parts), {stats.cache_summary}"
+    )
@@ -0,0 +1,203 @@
+"""Background job runner for the pipeline stages.
+
+Stage engines run in a process pool, outside the Streamlit script thread. Each
+run is a row in the `job` table: the UI starts, stops and resets jobs through
+this module and polls the row for status and progress, so a run keeps going
+across page reloads and is shared by every open tab.
+"""
+
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session as SQLAlchemySession
+
+from fdc.db import crud
+from fdc.db.dialects import utcnow
+from fdc.db.models import Job
+from fdc.db.session import Session
+from fdc.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Stage name -> "module:function" of the engine entry point. Runners receive a
+# `JobContext` and return a short summary message.
+STAGE_RUNNERS = {
+    "collect": "fdc.pipeline.collector:run_job",
+    "enrich": "fdc.pipeline.enricher:run_job",
+    "build": "fdc.pipeline.builder:run_job",
+}
+
+ACTIVE_STATUSES = ("pending", "running", "stopping")
+
+MAX_WORKERS = int(os.environ.get("FDC_JOB_WORKERS", os.cpu_count() or 2))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class JobStopped(Exception):
+    """Raised inside a worker when the job was stopped or reset."""
+
+
+class JobContext:
+    """Handle given to stage runners for parameters and progress reporting."""
+
+    def __init__(self, job: Job, session_factory=Session, min_interval: float = 0.5):
+        self.job_id = job.id
+        self.params: Dict[str, Any] = json.loads(job.params or "{}")
+        self.collection_id = job.collection_id
+        self.session_factory = session_factory
+        self.min_interval = min_interval
+        self._last_report = 0.0
+
+    def report(self, progress: float, message: Optional[str] = None, force: bool = False) -> None:
+        """Publish progress (0..1), throttled to one write per `min_interval`.
+
+        Also flushes this worker's metrics, so the Performance view sees them
+        while the job runs. Raises `JobStopped` once the job is no longer running.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_report < self.min_interval:
+            return
+        self._last_report = now
+        with self.session_factory() as db:
+            if not crud.set_job_progress(db, self.job_id, progress, message):
+                raise JobStopped(self.job_id)
+        REGISTRY.flush()
+
+    def set_collection(self, collection_id: int) -> None:
+        """Record the collection the job writes to."""
+        self.collection_id = collection_id
+        with self.session_factory() as db:
+            crud.update_job(db, self.job_id, {"collection_id": collection_id})
+
+
+def _transition(db: SQLAlchemySession, job_id: int, from_statuses, **values) -> bool:
+    """Atomically move a job to new values if it is in one of `from_statuses` (`updated_at` is set by the database)."""
+    result = db.execute(
+        update(Job).where(Job.id == job_id, Job.status.in_(from_statuses)).values(**values)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    """Check whether a worker process is still alive on this host."""
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_interrupted_jobs(db: SQLAlchemySession) -> int:
+    """Mark active jobs left behind by a previous server process as errored."""
+    count = 0
+    for job in db.query(Job).filter(Job.status.in_(ACTIVE_STATUSES)).all():
+        if not _pid_alive(job.pid):
+            count += _transition(
+                db, job.id, ACTIVE_STATUSES, status="error", message="Interrupted",
+                finished_at=utcnow()
+            )
+    return count
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """Return the process pool shared by every session of this server."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            with Session() as db:
+                recover_interrupted_jobs(db)
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _executor
+
+
+def start_job(
+    db: SQLAlchemySession, stage: str, params: Optional[Dict[str, Any]] = None,
+    collection_id: Optional[int] = None
+) -> Job:
+    """Create a job for `stage` and submit it to the process pool."""
+    if stage not in STAGE_RUNNERS:
+        raise ValueError(f"Unknown stage: {stage}")
+    executor = get_executor()
+    job = crud.create_job(db, stage, params, collection_id)
+    executor.submit(run_job, job.id)
+    return job
+
+
+def stop_job(db: SQLAlchemySession, job_id: int) -> None:
+    """Ask a job to stop; pending jobs are stopped before they start."""
+    now = utcnow()
+    if not _transition(db, job_id, ("pending",), status="stopped", finished_at=now):
+        _transition(db, job_id, ("running",), status="stopping")
+
+
+def reset_stage(db: SQLAlchemySession, stage: str) -> None:
+    """Stop the latest job of a stage (if any) and return the stage to idle."""
+    job = crud.get_latest_job(db, stage)
+    if job and job.status != "reset":
+        _transition(
+            db, job.id, ACTIVE_STATUSES + ("stopped", "completed", "error"), status="reset",
+            finished_at=job.finished_at or utcnow()
+        )
+
+
+def stage_status(job: Optional[Job]) -> str:
+    """Map a job to the UI stage status (idle, running, completed, error)."""
+    if job is None or job.status in ("reset", "stopped"):
+        return "idle"
+    if job.status in ACTIVE_STATUSES:
+        return "running"
+    return job.status
+
+
+def _load_runner(stage: str):
+    """Import the runner function registered for `stage`."""
+    module_name, function_name = STAGE_RUNNERS[stage].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def run_job(job_id: int) -> None:
+    """Execute a job in the current (worker) process."""
+    with Session() as db:
+        now = utcnow()
+        if not _transition(db, job_id, ("pending",), status="running", pid=os.getpid(), started_at=now):
+            return  # stopped or reset before a worker picked it up
+        job = crud.get_job(db, job_id)
+        context = JobContext(job)
+        started = time.perf_counter()
+        try:
+            message = _load_runner(job.stage)(context)
+        except JobStopped:
+            _transition(db, job_id, ("stopping",), status="stopped", finished_at=utcnow())
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, job.stage)
+            _transition(
+                db, job_id, ("running", "stopping"), status="error", message=f"{type(e).__name__}: {e}",
+                finished_at=utcnow()
+            )
+        else:
+            finished = utcnow()
+            # Stopped after its last (throttled) report: the runner never saw it, but the job is stopped all the same
+            if not _transition(
+                db, job_id, ("running",), status="completed", progress=1.0, message=message, finished_at=finished
+            ):
+                _transition(db, job_id, ("stopping",), status="stopped", message=message, finished_at=finished)
+        finally:
+            REGISTRY.observe("fdc_job_seconds", time.perf_counter() - started, stage=job.stage)
+            REGISTRY.flush(force=True)
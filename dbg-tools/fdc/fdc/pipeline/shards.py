@@ -0,0 +1,112 @@
+"""Parallel processing of a collection in id-range shards.
+
+A collection is cut into consecutive id ranges of `shard_rows` parts each
+(`plan_shards`), and a stage function runs on every range in a process pool
+(`map_shards`). Results come back in shard order whatever order the workers
+finish in, so stages merge them exactly as a single process would have
+produced them. Shard sizes are multiples of the stage's batch size, so each
+shard reads the same batches as a sequential run. At most
+`IN_FLIGHT_PER_WORKER` shards per worker are running or waiting to be
+consumed, so the results held at once do not grow with the collection.
+
+Workers open their own engine for the database URL they are given; set the
+number of worker processes with `FDC_SHARD_WORKERS` (default: one per CPU).
+"""
+
+import functools
+import itertools
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Sequence, TypeVar
+
+from sqlalchemy.orm import sessionmaker
+
+from fdc.db import crud
+from fdc.db.session import create_database_engine
+
+SHARD_WORKERS = int(os.environ.get("FDC_SHARD_WORKERS") or os.cpu_count() or 1)
+
+# Shards per worker: more shards balance uneven ranges and refresh progress more often
+SHARDS_PER_WORKER = 4
+
+# Shards submitted ahead per worker: enough to keep the workers busy while the results are consumed
+IN_FLIGHT_PER_WORKER = 2
+
+Result = TypeVar("Result")
+
+
+@dataclass(frozen=True)
+class Shard:
+    """The parts of a collection with `after_id < id <= until_id`."""
+
+    index: int
+    after_id: int
+    until_id: int
+    rows: int
+
+
+def shard_rows_for(total: int, workers: int, batch_size: int, max_batches: Optional[int] = None) -> int:
+    """Parts per shard: about `SHARDS_PER_WORKER` shards per worker, a multiple of `batch_size`.
+
+    `max_batches` caps the shards of stages whose results grow with the parts
+    of a shard.
+    """
+    shards = max(workers * SHARDS_PER_WORKER, 1)
+    batches = max(math.ceil(total / shards / batch_size), 1)
+    return (batches if max_batches is None else min(batches, max_batches)) * batch_size
+
+
+def plan_shards(db, collection_id: int, shard_rows: int) -> List[Shard]:
+    """Cut a collection into shards of `shard_rows` parts, in id order."""
+    total = crud.count_collection_parts(db, collection_id)
+    shards, after_id = [], 0
+    for index, until_id in enumerate(crud.get_collection_part_id_cuts(db, collection_id, shard_rows)):
+        shards.append(Shard(index, after_id, until_id, min(shard_rows, total - index * shard_rows)))
+        after_id = until_id
+    return shards
+
+
+def database_url(db) -> str:
+    """URL (with password) of a session's database, to hand to shard workers."""
+    return db.get_bind().url.render_as_string(hide_password=False)
+
+
+@functools.lru_cache(maxsize=None)
+def worker_sessions(url: str) -> sessionmaker:
+    """Session factory of a shard worker for `url`, one engine per process."""
+    return sessionmaker(create_database_engine(url))
+
+
+def map_shards(
+    function: Callable[..., Result], shards: Sequence[Shard], *args, workers: Optional[int] = None
+) -> Iterator[Result]:
+    """Yield `function(*args, shard)` for every shard, in shard order.
+
+    With more than one worker and shard the calls run in a process pool
+    (`function` must be a picklable module-level function), at most
+    `IN_FLIGHT_PER_WORKER` per worker at a time; otherwise they run in this
+    process. Closing the iterator early cancels the shards
+    that have not started.
+    """
+    workers = min(SHARD_WORKERS if workers is None else workers, len(shards))
+    if workers <= 1:
+        for shard in shards:
+            yield function(*args, shard)
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        pending = iter(shards)
+        ahead = itertools.islice(pending, workers * IN_FLIGHT_PER_WORKER)
+        futures = deque(executor.submit(function, *args, shard) for shard in ahead)
+        try:
+            while futures:
+                result = futures.popleft().result()
+                for shard in itertools.islice(pending, 1):
+                    futures.append(executor.submit(function, *args, shard))
+                yield result
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,218 @@
+"""Headless streaming pipeline - collect, enrich and build in one process.
+
+`Pipeline` runs the three stage engines at once, chained through bounded
+queues of part ids: after every batch the collector commits, the
+collection's last part id is handed to the enricher, which enriches up to it
+and hands the id on to the builder. Enrichment starts on the first collected
+batch and building on the first enriched one, so RPC fetches, lookups and
+the build overlap instead of running one after the other.
+
+A full queue blocks the stage feeding it: a slow builder holds back the
+enricher, and a slow enricher holds back the collector's writer and, through
+the collector's own fetch queue, its RPC fetchers. A stage that falls behind
+takes every id waiting in its queue at once and processes the whole range.
+
+The enricher starts from the collection's first part, so parts collected by
+earlier runs are enriched too (or skipped when they already are). A
+collection built before with the same options is built incrementally (see
+`fdc.pipeline.builder`): of the parts collected by earlier runs, the builder
+reads only those written or updated since the last build, which includes
+those this run enriches. `fdc run` drives the pipeline from the command line.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Sequence
+
+from fdc.db import crud
+from fdc.db.session import Session
+from fdc.pipeline.builder import DEFAULT_BUILD_OPTIONS, BuildStats, BuildTarget, BuildWriter, TransactionBuilder
+from fdc.pipeline.collector import CollectStats, Collector, create_target_collection, first_error, resolve_sources
+from fdc.pipeline.enricher import ENRICHMENT_OPTIONS, EnrichStats, Enricher
+
+# Part ids waiting between two stages; each id stands for a committed write batch
+DEFAULT_QUEUE_SIZE = 4
+
+
+@dataclass
+class PipelineStats:
+    """Result (and live counters) of a pipeline run."""
+
+    collection_id: Optional[int] = None
+    collect: CollectStats = field(default_factory=CollectStats)
+    enrich: EnrichStats = field(default_factory=EnrichStats)
+    build: BuildStats = field(default_factory=BuildStats)
+    collect_progress: float = 0.0
+    queued: List[int] = field(default_factory=list)  # ids waiting in each queue, upstream first
+    elapsed: float = 0.0
+
+
+async def _ranges(queue: asyncio.Queue) -> AsyncIterator[int]:
+    """Yield the part ids a stage may advance to, until the upstream stage ends the stream with None.
+
+    Ids that queued up while the stage was busy are taken at once and
+    yielded as their maximum.
+    """
+    done = False
+    while not done:
+        items = [await queue.get()]
+        while not queue.empty():
+            items.append(queue.get_nowait())
+        done = items[-1] is None
+        ids = [item for item in items if item is not None]
+        if ids:
+            yield max(ids)
+
+
+class Pipeline:
+    """Collects a time range into a collection while enriching and building it."""
+
+    def __init__(
+        self,
+        source_names: Sequence[str],
+        time_range: str = "Custom",
+        enrich_options: Optional[Sequence[str]] = ENRICHMENT_OPTIONS[:2],
+        build_options: Optional[Sequence[str]] = DEFAULT_BUILD_OPTIONS,
+        collection_id: Optional[int] = None,
+        session_factory=Session,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        force: bool = False,
+        progress: Optional[Callable[[PipelineStats], None]] = None,
+        progress_interval: float = 1.0,
+    ):
+        self.source_names = list(source_names)
+        self.time_range = time_range
+        # None skips the stage
+        self.enrich_options = enrich_options
+        self.build_options = build_options
+        self.collection_id = collection_id
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.force = force
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.stats = PipelineStats()
+        self.build_target: Optional[BuildTarget] = None
+        # Last part id before this run; incremental builds read the parts up to it only when changed
+        self.known_part_id = 0
+        self.queues: List[asyncio.Queue] = []
+        self._last_report = 0.0
+
+    def _report(self, force: bool = False) -> None:
+        """Forward the live stats to the progress callback, at most once per `progress_interval`."""
+        now = time.monotonic()
+        if self.progress and (force or now - self._last_report >= self.progress_interval):
+            self._last_report = now
+            self.stats.queued = [queue.qsize() for queue in self.queues]
+            self.progress(self.stats)
+
+    def _collect_progress(self, fraction: float) -> None:
+        self.stats.collect_progress = fraction
+        self._report()
+
+    async def run(self, since: datetime, until: Optional[datetime] = None) -> PipelineStats:
+        """Run every stage over `[since, until)` and return the stats once the last one finishes."""
+        started = time.perf_counter()
+        builder = None
+        with self.session_factory() as db:
+            if self.collection_id is None:
+                self.collection_id = create_target_collection(db, self.source_names, self.time_range).id
+            self.stats.collection_id = self.collection_id
+            if self.build_options is not None:
+                # Before collecting, so a collection built with other options fails the run right away
+                builder = TransactionBuilder(self.build_options, session_factory=self.session_factory, workers=1)
+                self.build_target = builder.prepare_target(db, self.collection_id)
+                self.stats.build.collection_id = self.build_target.collection_id
+                self.stats.build.incremental = not self.build_target.fresh
+                if not self.build_target.fresh:
+                    self.known_part_id = crud.get_last_part_id(db, self.collection_id)
+        enriched = asyncio.Queue(maxsize=self.queue_size) if builder else None
+        collected = asyncio.Queue(maxsize=self.queue_size) if self.enrich_options is not None else enriched
+        self.queues = [queue for queue in (collected, enriched) if queue is not None]
+        try:
+            async with asyncio.TaskGroup() as group:
+                if self.enrich_options is not None:
+                    group.create_task(self._enrich(collected, enriched))
+                if builder:
+                    group.create_task(self._build(builder, enriched))
+                group.create_task(self._collect(collected, since, until))
+        except ExceptionGroup as group:
+            raise first_error(group) from None
+        self.stats.elapsed = time.perf_counter() - started
+        self._report(force=True)
+        return self.stats
+
+    async def _collect(self, outbox: Optional[asyncio.Queue], since: datetime, until: Optional[datetime]) -> None:
+        collector = Collector(
+            session_factory=self.session_factory, progress=self._collect_progress,
+            on_write=outbox.put if outbox else None
+        )
+        self.stats.collect = await collector.collect(
+            self.collection_id, resolve_sources(self.source_names), since, until
+        )
+        if outbox is None:
+            return
+        # Also covers runs that had nothing new to collect
+        with self.session_factory() as db:
+            await outbox.put(await asyncio.to_thread(crud.get_last_part_id, db, self.collection_id))
+        await outbox.put(None)
+
+    async def _enrich(self, inbox: asyncio.Queue, outbox: Optional[asyncio.Queue]) -> None:
+        enricher = Enricher(self.enrich_options, session_factory=self.session_factory, workers=1, force=self.force)
+        stats = self.stats.enrich
+        started = time.perf_counter()
+        after_id = 0
+        try:
+            with self.session_factory() as db:
+                async for until_id in _ranges(inbox):
+                    if until_id > after_id:
+                        await enricher.enrich_range(db, self.collection_id, stats, after_id, until_id)
+                        after_id = until_id
+                        self._report()
+                    if outbox:
+                        await outbox.put(after_id)
+        finally:
+            await enricher.close()
+        stats.elapsed = time.perf_counter() - started
+        stats.cache_summary = enricher.cache.stats.summary()
+        if outbox:
+            await outbox.put(None)
+
+    async def _build(self, builder: TransactionBuilder, inbox: asyncio.Queue) -> None:
+        stats = self.stats.build
+        started = time.perf_counter()
+        after_id = 0
+        target = self.build_target
+        with self.session_factory() as db:
+            writer = BuildWriter(builder, db, stats, target)
+
+            def build_range(after_id: int, until_id: int) -> None:
+                known_id = min(until_id, self.known_part_id)
+                if after_id < known_id:
+                    part_ids = crud.get_changed_part_ids(
+                        db, self.collection_id, target.changed_since, after_id, known_id
+                    )
+                    if part_ids:
+                        for result in builder.build_range(db, self.collection_id, stats, part_ids=part_ids):
+                            writer.add(result)
+                    after_id = known_id
+                if until_id > after_id:
+                    for result in builder.build_range(db, self.collection_id, stats, after_id, until_id):
+                        writer.add(result)
+
+            async for until_id in _ranges(inbox):
+                if until_id > after_id:
+                    await asyncio.to_thread(build_range, after_id, until_id)
+                    after_id = until_id
+                    self._report()
+            await asyncio.to_thread(writer.finish)
+        stats.elapsed = time.perf_counter() - started
+
+
+def run_pipeline(
+    source_names: Sequence[str], since: datetime, until: Optional[datetime] = None, **options
+) -> PipelineStats:
+    """Run the streaming pipeline synchronously; keyword arguments are forwarded to `Pipeline`."""
+    return asyncio.run(Pipeline(source_names, **options).run(since, until))
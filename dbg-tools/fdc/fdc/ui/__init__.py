@@ -7,20 +7,25 @@ from fdc.ui.components import (
 )
 
 from fdc.ui.sidebar import render_sidebar
+from fdc.ui.performance import render_performance_view
 from fdc.ui.stages import (
     render_collector_stage,
     render_enricher_stage,
     render_builder_stage
 )
-from fdc.ui.auto_progress import update_progress
+from fdc.ui.auto_progress import render_stage_progress
+from fdc.ui.connection import get_connection, rerun_unit_of_work
 
 __all__ = [
     'render_status_indicator',
     'render_process_controls',
     'render_db_viewer',
     'render_sidebar',
+    'render_performance_view',
     'render_collector_stage',
     'render_enricher_stage',
     'render_builder_stage',
-    'update_progress'
+    'render_stage_progress',
+    'get_connection',
+    'rerun_unit_of_work'
 ]
@@ -1,33 +1,40 @@
-"""Auto progress update functionality for the Fast & Dirty Commit app."""
+"""Live progress widgets for the Fast & Dirty Commit app.
+
+Stage engines publish their progress to their `job` row (`JobContext.report`),
+which is the progress channel. While a stage runs, only its progress widget is
+refreshed: a `st.fragment` re-runs every `JOB_POLL_INTERVAL` seconds and reads
+the shared `load_stage_jobs` snapshot, so the rest of the page is left alone and
+the database is read once per interval however many tabs are watching. When the
+run finishes the fragment triggers one full rerun to refresh the stage controls.
+"""
+
+from typing import Optional
 
 import streamlit as st
-import time
-
-def update_progress():
-    """Update progress for running processes (for demo purposes)."""
-    # Auto-increment progress for collecting stage
-    if st.session_state.collect_status == "running" and st.session_state.progress["collect"] < 1.0:
-        st.session_state.progress["collect"] += 0.1
-        if st.session_state.progress["collect"] >= 1.0:
-            st.session_state.collect_status = "completed"
-            st.session_state.progress["collect"] = 1.0
-        time.sleep(0.1)
-        st.rerun()
-    
-    # Auto-increment progress for enriching stage
-    if st.session_state.enrich_status == "running" and st.session_state.progress["enrich"] < 1.0:
-        st.session_state.progress["enrich"] += 0.08
-        if st.session_state.progress["enrich"] >= 1.0:
-            st.session_state.enrich_status = "completed"
-            st.session_state.progress["enrich"] = 1.0
-        time.sleep(0.1)
-        st.rerun()
-    
-    # Auto-increment progress for building stage
-    if st.session_state.build_status == "running" and st.session_state.progress["build"] < 1.0:
-        st.session_state.progress["build"] += 0.05
-        if st.session_state.progress["build"] >= 1.0:
-            st.session_state.build_status = "completed"
-            st.session_state.progress["build"] = 1.0
-        time.sleep(0.1)
+
+from fdc.metrics import REGISTRY
+from fdc.pipeline.jobs import stage_status
+from fdc.ui.connection import rerun_unit_of_work
+from fdc.ui.data import JOB_POLL_INTERVAL, JobSnapshot, load_stage_jobs
+
+
+def render_stage_progress(stage: str, verb: str, job: Optional[JobSnapshot]):
+    """Render a stage's progress bar (live while it runs) or its last job message."""
+    if stage_status(job) == "running":
+        _render_live_progress(stage, verb)
+    elif job and job.message:
+        st.caption(job.message)
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def _render_live_progress(stage: str, verb: str):
+    REGISTRY.inc("fdc_reruns_total", kind="progress")
+    # Fragment runs skip `app()`, so they open their own unit of work
+    with rerun_unit_of_work():
+        job = load_stage_jobs()[stage]
+    if stage_status(job) != "running":
+        # Finished, failed or stopped - refresh the stage controls and the viewer once
         st.rerun()
+    st.session_state.progress[stage] = job.progress
+    st.progress(job.progress, text=f"{verb}: {job.progress*100:.0f}%")
+    REGISTRY.flush()
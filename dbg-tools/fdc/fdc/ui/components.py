@@ -1,8 +1,14 @@
 """Basic UI components for the Fast & Dirty Commit app."""
 
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-from fdc.db.models import Collection, CollectionPart
+from fdc.db.export import EXPORT_FORMATS, export_to_tempfile
+from fdc.db.setup import get_session
+from fdc.metrics import timed
+from fdc.ui.data import get_table_versions, load_collection_name, load_search_page, load_table_page
 
 def render_status_indicator(status, stage_name):
     """Render a status indicator for a process stage."""
@@ -37,49 +43,108 @@ def render_process_controls(stage_name, status):
     
     return {"start": start_btn, "stop": stop_btn, "reset": reset_btn}
 
+def _reset_viewer_page(filter_key):
+    """Reset the keyset cursors when the table or the filters change."""
+    if st.session_state.get("viewer_filter_key") != filter_key:
+        st.session_state.viewer_filter_key = filter_key
+        st.session_state.viewer_cursors = [0]
+
+
+def _next_page(cursor):
+    """Push the last seen id (or the next offset) so the next page starts after it."""
+    st.session_state.viewer_cursors.append(cursor)
+
+
+def _previous_page():
+    """Pop back to the cursor of the previous page."""
+    if len(st.session_state.viewer_cursors) > 1:
+        st.session_state.viewer_cursors.pop()
+
+
+def _date_bounds(from_date, to_date):
+    """Convert the inclusive date inputs into a half-open datetime range."""
+    created_from = datetime.combine(from_date, time.min) if from_date else None
+    created_to = datetime.combine(to_date + timedelta(days=1), time.min) if to_date else None
+    return created_from, created_to
+
+
+@timed()
 def render_db_viewer(selected_table):
     """Render the database viewer component."""
     st.subheader(f"Database Table: {selected_table}")
 
-    conn = st.connection('sql')
-    
+    data = None
+    export_collection_id = None
+
+    # Table filters - compiled to SQL WHERE clauses by fdc.db.crud
+    with st.expander("Table Filters"):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            search = st.text_input(
+                "Search:", placeholder="Search in table...",
+                help="Parts are matched by whole words (an address, a tx hash, a label), best matches first; "
+                     "end a word with * to match its beginning"
+            )
+            page_size = st.selectbox("Rows per page:", [25, 50, 100, 500], index=2)
+
+        with col2:
+            from_date = st.date_input("From Date:", value=None)
+            to_date = st.date_input("To Date:", value=None)
+
+    created_from, created_to = _date_bounds(from_date, to_date)
+    filters = dict(search=search or None, created_from=created_from, created_to=created_to)
+
+    versions = get_table_versions()
+    # Searched parts are ranked, so their pages are cursored by offset instead of by the last id
+    ranked = False
     if selected_table == "collection":
-        with conn.session as s:
-            data = s.query(Collection).all()
-            if data:
-                # Convert to pandas DataFrame, expand with nice columns
-                data = pd.DataFrame([item.__dict__ for item in data])
-                st.info("Asdfsad")
-                # Remove SQLAlchemy internal state column
-                if '_sa_instance_state' in data.columns:
-                    data = data.drop('_sa_instance_state', axis=1)
-                # Select and reorder columns
-                data = data[['id', 'name', 'description', 'created_at', 'updated_at']]
-            else:
-                st.info("No collections found.")
+        _reset_viewer_page((selected_table, search, from_date, to_date, page_size))
+        after_id = st.session_state.viewer_cursors[-1]
+        # Fetch one extra row to know whether there is a next page
+        rows = load_table_page(
+            selected_table, versions.get(selected_table, 0), limit=page_size + 1, after_id=after_id, **filters
+        )
+        if rows.empty:
+            st.info("No collections found.")
+        else:
+            data = rows
     elif selected_table == "collection_part":
         collection_id = st.number_input("Collection ID", min_value=1, value=1)
-        with conn.session as s:
-            # Verify collection exists
-            collection = s.query(Collection).filter(Collection.id == collection_id).first()
-            if collection:
-                st.write(f"Viewing parts for collection: {collection.name}")
-                data = s.query(CollectionPart).filter(CollectionPart.collection_id == collection_id).all()
-                if data:
-                    # Convert SQLAlchemy objects to dict first for cleaner DataFrame conversion
-                    data = pd.DataFrame([item.__dict__ for item in data])
-                    # Remove SQLAlchemy internal state column
-                    if '_sa_instance_state' in data.columns:
-                        data = data.drop('_sa_instance_state', axis=1)
-                    # Select and reorder columns
-                    data = data[['id', 'collection_id', 'name', 'content', 'data', 'order', 'created_at', 'updated_at']]
-                else:
-                    st.info(f"No parts found for collection ID {collection_id}")
+        _reset_viewer_page((selected_table, collection_id, search, from_date, to_date, page_size))
+        after_id = st.session_state.viewer_cursors[-1]
+        # Verify collection exists
+        collection_name = load_collection_name(collection_id, versions.get("collection", 0))
+        if collection_name is not None:
+            export_collection_id = collection_id
+            st.write(f"Viewing parts for collection: {collection_name}")
+            ranked = bool(search)
+            if ranked:
+                rows = load_search_page(
+                    versions.get(selected_table, 0), search, limit=page_size + 1, offset=after_id,
+                    collection_id=collection_id, created_from=created_from, created_to=created_to
+                )
             else:
-                st.error(f"Collection with ID {collection_id} not found")
+                rows = load_table_page(
+                    selected_table, versions.get(selected_table, 0), limit=page_size + 1, after_id=after_id,
+                    collection_id=collection_id, **filters
+                )
+            if rows.empty:
+                st.info(f"No parts found for collection ID {collection_id}")
+            else:
+                data = rows
+        else:
+            st.error(f"Collection with ID {collection_id} not found")
     else:
         # Display not supported table message
         st.info(f"Table {selected_table} not supported.")
+        return
+    has_next = data is not None and len(data) > page_size
+    if data is not None:
+        data = data.iloc[:page_size].copy()
+    next_cursor = None
+    if has_next:
+        next_cursor = after_id + page_size if ranked else int(data['id'].iloc[-1])
     # Check if we have data to display
     if isinstance(data, pd.DataFrame) and not data.empty:
         # Format datetime columns for better display
@@ -103,35 +168,75 @@ def render_db_viewer(selected_table):
     elif isinstance(data, pd.DataFrame):
         st.info(f"No data available for {selected_table}")
     
-    # Table filters (basic functionality)
-    with st.expander("Table Filters"):
-        col1, col2 = st.columns(2)
-        
-        # This is just a UI placeholder for actual filters
-        with col1:
-            st.text_input("Search:", placeholder="Search in table...")
-            st.selectbox("Status:", ["All", "Active", "Inactive", "Pending"])
-        
-        with col2:
-            st.date_input("From Date:")
-            st.date_input("To Date:")
-    
-    
-    
-    # Pagination UI (placeholder for actual pagination)
+    # Keyset pagination - each page is an `id > last_seen` seek (or the next
+    # offset of ranked search hits), so no page count
+    page = len(st.session_state.viewer_cursors)
     col1, col2, col3 = st.columns([1, 1, 1])
     with col1:
-        st.button("← Previous")
+        st.button("← Previous", disabled=page == 1, on_click=_previous_page)
     with col2:
-        st.write("Page 1 of 1")
+        st.write(f"Page {page}")
     with col3:
-        st.button("Next →")
+        st.button(
+            "Next →", disabled=not has_next, on_click=_next_page,
+            args=(next_cursor,) if has_next else None
+        )
     
-    # Export buttons
-    st.download_button(
-        "Export as CSV",
-        data.to_csv(index=False).encode('utf-8'),
-        f"{selected_table}.csv",
-        "text/csv",
-        key=f"export_{selected_table}"
-    )
+    # Export - streamed to a temp file only when asked for, covering every
+    # page that matches the current filters
+    if data is not None:
+        render_export_controls(selected_table, st.session_state.viewer_filter_key, filters, export_collection_id)
+
+
+def render_export_controls(table, filter_key, filters, collection_id=None):
+    """Render the export format picker, the prepare button and, once built, the download button."""
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        fmt = st.selectbox("Export format:", list(EXPORT_FORMATS), key=f"export_format_{table}")
+    export_key = (filter_key, fmt)
+    prepared = st.session_state.get("viewer_export")
+    if prepared and prepared["key"] != export_key:
+        _discard_export()
+        prepared = None
+    exported = _read_export(prepared) if prepared else None
+    expired = prepared is not None and exported is None
+    if expired:
+        _discard_export()
+        prepared = None
+    with col2:
+        if prepared is None:
+            if expired:
+                st.caption("The prepared export expired; prepare it again.")
+            if st.button("Prepare export", key=f"prepare_export_{table}"):
+                with st.spinner("Exporting..."), get_session() as s:
+                    path = export_to_tempfile(s, table, fmt, collection_id=collection_id, **filters)
+                st.session_state.viewer_export = {"key": export_key, "path": str(path)}
+                st.rerun()
+        else:
+            extension, mime = EXPORT_FORMATS[fmt]
+            st.download_button(
+                f"Download {fmt.upper()}",
+                exported,
+                f"{table}{extension}",
+                mime,
+                key=f"export_{table}"
+            )
+
+
+def _read_export(prepared):
+    """Read a prepared export file; None once it is gone.
+
+    A later export (of any session) removes stale prepared files, see
+    `remove_stale_exports`, so the file may vanish between reruns.
+    """
+    try:
+        return Path(prepared["path"]).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _discard_export():
+    """Remove a prepared export file that no longer matches the viewer."""
+    prepared = st.session_state.pop("viewer_export", None)
+    if prepared:
+        Path(prepared["path"]).unlink(missing_ok=True)
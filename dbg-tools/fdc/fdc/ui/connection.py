@@ -0,0 +1,28 @@
+"""Shared Streamlit SQL connection for the Fast & Dirty Commit app."""
+
+import streamlit as st
+
+from fdc.db.session import SQLALCHEMY_DATABASE_URL, configure_sqlite, engine_options
+from fdc.db.setup import unit_of_work
+from fdc.metrics import instrument_engine
+
+
+def get_connection():
+    """Return `st.connection('sql')` on the FDC database (`FDC_DATABASE_URL`).
+
+    SQLite pragmas are applied and statements are timed into `fdc.metrics`.
+    """
+    conn = st.connection('sql', url=SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+    configure_sqlite(conn.engine)
+    instrument_engine(conn.engine)
+    return conn
+
+
+def rerun_unit_of_work():
+    """Open the unit of work of a script run (or fragment run) on the app's connection.
+
+    Every renderer's `fdc.db.setup.get_session()` inside it shares one
+    session, so a rerun checks one connection out of the pool instead of one
+    per widget.
+    """
+    return unit_of_work(get_connection().engine)
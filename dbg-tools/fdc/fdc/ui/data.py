@@ -0,0 +1,113 @@
+"""Cached table reads for the Fast & Dirty Commit app.
+
+Frames are memoized with `st.cache_data`, keyed by the query arguments and the
+table's version counter (bumped by every `fdc.db.crud` write, including the
+ones made by background jobs). Reruns that leave a view unchanged cost one
+lookup of the version counters instead of re-running the query.
+
+The latest job of every stage is cached for `JOB_POLL_INTERVAL` seconds and
+shared by all sessions, so the progress widgets of any number of open tabs read
+the `job` table once per interval.
+
+Loaders read through `fdc.db.setup.get_session()`, i.e. on the connection of
+the rerun's unit of work (`fdc.ui.connection.rerun_unit_of_work`).
+
+Every loader counts its lookups and cache misses (`fdc_cache_requests_total` /
+`fdc_cache_misses_total` in `fdc.metrics`) and times the misses, for the
+Performance view's cache hit rates.
+"""
+
+import functools
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import streamlit as st
+import pandas as pd
+
+from fdc.db import crud
+from fdc.db.frames import read_collection_names, read_search_page, read_table_page
+from fdc.db.setup import get_session
+from fdc.metrics import REGISTRY
+
+# Seconds between progress refreshes while a background job is running
+JOB_POLL_INTERVAL = 0.5
+
+STAGES = ("collect", "enrich", "build")
+
+
+@dataclass(frozen=True)
+class JobSnapshot:
+    """The fields of a `Job` row the UI shows, detached from any session."""
+
+    id: int
+    status: str
+    progress: float
+    message: Optional[str]
+    collection_id: Optional[int]
+
+
+def counted_cache(name: str, **cache_options):
+    """`st.cache_data(**cache_options)` that records lookups, misses and miss latency under `cache=name`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def load(*args, **kwargs):
+            REGISTRY.inc("fdc_cache_misses_total", cache=name)
+            with REGISTRY.timer("fdc_cache_load_seconds", cache=name):
+                return function(*args, **kwargs)
+
+        cached = st.cache_data(**cache_options)(load)
+
+        @functools.wraps(function)
+        def lookup(*args, **kwargs):
+            REGISTRY.inc("fdc_cache_requests_total", cache=name)
+            return cached(*args, **kwargs)
+
+        lookup.clear = cached.clear
+        return lookup
+    return decorate
+
+
+def get_table_versions() -> Dict[str, int]:
+    """Read the current version counter of every table."""
+    with get_session() as s:
+        return crud.get_table_versions(s)
+
+
+@counted_cache("table_page", max_entries=256, show_spinner=False)
+def load_table_page(table: str, version: int, **query) -> pd.DataFrame:
+    """Cached `fdc.db.frames.read_table_page`; `version` only keys the cache."""
+    with get_session() as s:
+        return read_table_page(s.connection(), table, **query)
+
+
+@counted_cache("search_page", max_entries=256, show_spinner=False)
+def load_search_page(version: int, search: str, **query) -> pd.DataFrame:
+    """Cached `fdc.db.frames.read_search_page`; `version` (of `collection_part`) only keys the cache."""
+    with get_session() as s:
+        return read_search_page(s.connection(), search, **query)
+
+
+@counted_cache("collection_name", max_entries=256, show_spinner=False)
+def load_collection_name(collection_id: int, version: int) -> Optional[str]:
+    """Cached name of a collection (None if it does not exist)."""
+    with get_session() as s:
+        return read_collection_names(s.connection(), collection_ids=[collection_id]).get(collection_id)
+
+
+@counted_cache("collection_labels", max_entries=16, show_spinner=False)
+def load_collection_labels(version: int, limit: int = 100) -> Dict[int, str]:
+    """Cached `{id: "#id name"}` of the first `limit` collections, for selectboxes."""
+    with get_session() as s:
+        names = read_collection_names(s.connection(), limit)
+    return {collection_id: f"#{collection_id} {name}" for collection_id, name in names.items()}
+
+
+@counted_cache("stage_jobs", ttl=JOB_POLL_INTERVAL, show_spinner=False)
+def load_stage_jobs() -> Dict[str, Optional[JobSnapshot]]:
+    """Latest job of every stage; call `load_stage_jobs.clear()` after starting, stopping or resetting one."""
+    with get_session() as s:
+        jobs = {stage: crud.get_latest_job(s, stage) for stage in STAGES}
+        return {
+            stage: JobSnapshot(job.id, job.status, job.progress or 0.0, job.message, job.collection_id) if job else None
+            for stage, job in jobs.items()
+        }
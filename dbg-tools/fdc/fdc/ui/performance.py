@@ -0,0 +1,125 @@
+"""Performance view for the Fast & Dirty Commit app.
+
+Shows the metrics recorded by `fdc.metrics`, merged over the Streamlit server
+and the stage workers: rerun counts, the slowest SQL statements, render
+timers, cache hit rates and stage throughput.
+"""
+
+import pandas as pd
+import streamlit as st
+
+from fdc import metrics
+
+# Rows of the slowest-queries table
+SLOWEST_QUERIES = 20
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _histograms(snapshot, name, label):
+    """`{label value: histogram}` of the `name` histograms of a snapshot."""
+    return {row["labels"].get(label, ""): row for row in snapshot["histograms"] if row["name"] == name}
+
+
+def _reset_metrics():
+    metrics.clear()
+
+
+@metrics.timed()
+def render_performance_view():
+    """Render the Performance view."""
+    st.subheader("Performance")
+    snapshot = metrics.collect()
+
+    reruns = metrics.counter_values(snapshot, "fdc_reruns_total", "kind")
+    queries = _histograms(snapshot, "fdc_db_query_seconds", "operation").values()
+    requests = metrics.counter_values(snapshot, "fdc_cache_requests_total", "cache")
+    misses = metrics.counter_values(snapshot, "fdc_cache_misses_total", "cache")
+    lookups = sum(requests.values())
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("App reruns", f"{reruns.get('app', 0):,.0f}")
+    with col2:
+        st.metric("Progress refreshes", f"{reruns.get('progress', 0):,.0f}")
+    with col3:
+        st.metric(
+            "SQL statements", f"{sum(row['count'] for row in queries):,}",
+            help=f"{sum(row['sum'] for row in queries):.2f}s in total"
+        )
+    with col4:
+        st.metric("Cache hit rate", f"{1 - sum(misses.values()) / lookups:.1%}" if lookups else "-")
+    st.caption(f"Merged over {len(snapshot['processes'])} process(es), see `fdc metrics`.")
+
+    st.markdown("**Slowest queries** (by total time)")
+    statements = snapshot["statements"][:SLOWEST_QUERIES]
+    if statements:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "statement": row["statement"], "calls": row["count"], "total (ms)": _ms(row["total"]),
+                    "mean (ms)": _ms(row["total"] / row["count"]), "max (ms)": _ms(row["max"]),
+                }
+                for row in statements
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.caption("No queries recorded yet.")
+
+    st.markdown("**Render timers**")
+    renders = _histograms(snapshot, "fdc_render_seconds", "function")
+    if renders:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "function": function, "calls": row["count"], "mean (ms)": _ms(row["sum"] / row["count"]),
+                    "p95 (ms)": _ms(metrics.quantile(row, 0.95)),
+                }
+                for function, row in sorted(renders.items(), key=lambda item: -item[1]["sum"])
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.markdown("**Cache hit rates**")
+    if requests:
+        loads = _histograms(snapshot, "fdc_cache_load_seconds", "cache")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "cache": cache, "lookups": int(count),
+                    "hit rate": f"{1 - misses.get(cache, 0) / count:.1%}" if count else "-",
+                    "mean miss (ms)": _ms(loads[cache]["sum"] / loads[cache]["count"]) if cache in loads else None,
+                }
+                for cache, count in sorted(requests.items())
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.markdown("**Stage throughput**")
+    rows = metrics.counter_values(snapshot, "fdc_stage_rows_total", "stage")
+    if rows:
+        batches = _histograms(snapshot, "fdc_stage_batch_seconds", "stage")
+        jobs = _histograms(snapshot, "fdc_job_seconds", "stage")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "stage": stage, "jobs": jobs[stage]["count"] if stage in jobs else 0, "rows": int(count),
+                    "rows/s": round(count / batches[stage]["sum"]) if batches[stage]["sum"] else None,
+                    "batches": batches[stage]["count"],
+                    "p95 batch (ms)": _ms(metrics.quantile(batches[stage], 0.95)),
+                }
+                for stage, count in sorted(rows.items())
+            ]),
+            use_container_width=True,
+            hide_index=True
+        )
+    else:
+        st.caption("No stage has run since the metrics were reset.")
+
+    st.button("Reset metrics", on_click=_reset_metrics)
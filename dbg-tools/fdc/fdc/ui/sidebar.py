@@ -3,12 +3,20 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import random
 
+from fdc.db import crud
+from fdc.db.setup import get_session
+from fdc.metrics import timed
+
+# Views of the main area, selected in the sidebar
+VIEWS = ("Database", "Performance")
+
+@timed()
 def render_sidebar():
-    conn = st.connection('sql')
     """Render the sidebar with database explorer and stats."""
     with st.sidebar:
+        st.radio("View:", VIEWS, key="view", horizontal=True)
+
         st.header("Database Explorer")
         # Get tables dynamically from `Base`
         from fdc.db.models import Base
@@ -25,33 +33,32 @@ def render_sidebar():
         )
         st.session_state.selected_table = selected_table
         
-        # Quick stats section
+        # Quick stats section - maintained counters, no table scans
         st.divider()
         st.subheader("Quick Stats")
+        with get_session() as s:
+            stats = crud.get_stats(s)
+            activity = crud.get_daily_activity(s)
         col1, col2 = st.columns(2)
         with col1:
-            with conn.session as s:
-                from fdc.db.models import Collection, CollectionPart
-                collection_count = s.query(Collection).count()
-                st.metric("Collection", f"{collection_count:,}")
+            st.metric("Collection", f"{stats.get('collection', 0):,}")
         
         with col2:
-            # Show real parts count if database session is available
-            with conn.session as s:
-                from fdc.db.models import Collection, CollectionPart
-                parts_count = s.query(CollectionPart).count()
-                st.metric("Collection Parts", f"{parts_count:,}")
+            st.metric("Collection Parts", f"{stats.get('collection_part', 0):,}")
         
-        # Simple mock visualizations
+        # Collected transactions per day and chain
         st.divider()
         st.subheader("Transaction Activity")
-        data = pd.DataFrame({
-            'date': pd.date_range(start='2023-01-01', periods=10),
-            'count': [random.randint(50, 300) for _ in range(10)]
-        })
-        fig = px.line(data, x='date', y='count')
-        fig.update_layout(margin=dict(l=20, r=20, t=30, b=20))
-        st.plotly_chart(fig, use_container_width=True)
+        if activity:
+            data = pd.DataFrame(
+                [(row.day, row.chain, row.transactions) for row in activity],
+                columns=["date", "chain", "count"]
+            )
+            fig = px.line(data, x='date', y='count', color='chain')
+            fig.update_layout(margin=dict(l=20, r=20, t=30, b=20))
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.caption("No transactions collected yet.")
         
     # Return the selected table for easy access
     return st.session_state.selected_table
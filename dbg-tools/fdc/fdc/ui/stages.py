@@ -1,10 +1,27 @@
 """Process stage UI components for the Fast & Dirty Commit app."""
 
+from datetime import datetime, time, timedelta, timezone
+
 import streamlit as st
+from fdc.db.crud import get_checkpoints
+from fdc.db.setup import get_session
+from fdc.metrics import timed
+from fdc.pipeline.builder import BUILD_OPTIONS
+from fdc.pipeline.enricher import ENRICHMENT_OPTIONS
+from fdc.pipeline.jobs import reset_stage, stage_status, start_job, stop_job
+from fdc.ui.auto_progress import render_stage_progress
 from fdc.ui.components import render_status_indicator, render_process_controls
+from fdc.ui.data import get_table_versions, load_collection_labels, load_stage_jobs
 
+@timed()
 def render_collector_stage():
     """Render the Collector stage UI components."""
+    collections = load_collection_labels(get_table_versions().get("collection", 0))
+    job = load_stage_jobs()["collect"]
+    # The job table is the source of truth, so status survives page reloads
+    st.session_state.collect_status = stage_status(job)
+    st.session_state.progress["collect"] = job.progress if job else 0
+
     with st.expander("1. Collector", expanded=True):
         render_status_indicator(st.session_state.collect_status, "Collector")
         
@@ -19,6 +36,20 @@ def render_collector_stage():
             "Time Range:",
             options=["Last hour", "Last 24 hours", "Last week", "Last month", "Custom"]
         )
+        params = {"sources": selected_sources, "time_range": time_range}
+        
+        # Collecting into an existing collection resumes from its checkpoints
+        target_collection = st.selectbox(
+            "Target Collection:", [None, *collections],
+            format_func=lambda collection_id: collections.get(collection_id, "New collection")
+        )
+        if target_collection is not None:
+            with get_session() as s:
+                checkpoints = get_checkpoints(s, target_collection)
+            if checkpoints:
+                st.caption("Resumes from " + ", ".join(
+                    f"{checkpoint.source} block {checkpoint.block_number:,}" for checkpoint in checkpoints
+                ))
         
         if time_range == "Custom":
             col1, col2 = st.columns(2)
@@ -32,41 +63,60 @@ def render_collector_stage():
                 end_date = st.date_input("End Date")
                 if "collection_end_date" not in st.session_state:
                     st.session_state.collection_end_date = end_date
+            params["since"] = datetime.combine(start_date, time.min, timezone.utc).isoformat()
+            params["until"] = datetime.combine(end_date + timedelta(days=1), time.min, timezone.utc).isoformat()
         
         # Controls
         controls = render_process_controls("Collector", st.session_state.collect_status)
         
         # Progress bar
-        if st.session_state.collect_status == "running":
-            st.progress(st.session_state.progress["collect"], text=f"Collecting: {st.session_state.progress['collect']*100:.0f}%")
+        render_stage_progress("collect", "Collecting", job)
         
         # Handle button clicks
         if controls["start"]:
-            st.session_state.collect_status = "running"
-            st.session_state.progress["collect"] = 0.1
-            st.rerun()
+            if not selected_sources:
+                st.warning("Select at least one data source.")
+            else:
+                with get_session() as s:
+                    start_job(s, "collect", params, collection_id=target_collection)
+                load_stage_jobs.clear()
+                st.rerun()
         
         if controls["stop"] and st.session_state.collect_status == "running":
-            st.session_state.collect_status = "idle"
+            with get_session() as s:
+                stop_job(s, job.id)
+            load_stage_jobs.clear()
             st.rerun()
         
         if controls["reset"]:
-            st.session_state.collect_status = "idle"
-            st.session_state.progress["collect"] = 0
+            with get_session() as s:
+                reset_stage(s, "collect")
+            load_stage_jobs.clear()
             st.rerun()
 
+@timed()
 def render_enricher_stage():
     """Render the Enricher stage UI components."""
+    collections = load_collection_labels(get_table_versions().get("collection", 0))
+    jobs = load_stage_jobs()
+    job, collect_job = jobs["enrich"], jobs["collect"]
+    st.session_state.enrich_status = stage_status(job)
+    st.session_state.progress["enrich"] = job.progress if job else 0
+
     with st.expander("2. Enricher", expanded=True):
         render_status_indicator(st.session_state.enrich_status, "Enricher")
         
+        # Default to the collection the Collector wrote to last
+        collection_ids = list(collections)
+        default = collect_job.collection_id if collect_job and collect_job.collection_id in collections else None
+        target_collection = st.selectbox(
+            "Collection:", collection_ids, format_func=collections.get,
+            index=collection_ids.index(default) if default is not None else 0,
+            key="enrich_collection"
+        ) if collection_ids else None
+        
         # Enrichment options
-        enrichment_options = [
-            "Address Labeling", 
-            "Contract Resolution", 
-            "Token Data", 
-            "Protocol Identification"
-        ]
+        enrichment_options = ENRICHMENT_OPTIONS
         # Store selections in session state for potential future use
         selected_enrichments = st.multiselect(
             "Enrichment Options:", 
@@ -75,6 +125,10 @@ def render_enricher_stage():
         )
         if "selected_enrichments" not in st.session_state:
             st.session_state.selected_enrichments = selected_enrichments
+        reenrich = st.checkbox(
+            "Re-enrich enriched parts", value=False, key="enrich_force",
+            help="By default, parts already enriched with these options are skipped"
+        )
         
         # Controls
         controls = render_process_controls("Enricher", st.session_state.enrich_status)
@@ -84,36 +138,56 @@ def render_enricher_stage():
             st.warning("Collector hasn't completed yet. Enrichment may have incomplete data.")
         
         # Progress bar
-        if st.session_state.enrich_status == "running":
-            st.progress(st.session_state.progress["enrich"], text=f"Enriching: {st.session_state.progress['enrich']*100:.0f}%")
+        render_stage_progress("enrich", "Enriching", job)
         
         # Handle button clicks
         if controls["start"]:
-            st.session_state.enrich_status = "running"
-            st.session_state.progress["enrich"] = 0.1
-            st.rerun()
+            if target_collection is None:
+                st.warning("There is no collection to enrich yet.")
+            else:
+                with get_session() as s:
+                    start_job(
+                        s, "enrich", {"options": selected_enrichments, "force": reenrich},
+                        collection_id=target_collection
+                    )
+                load_stage_jobs.clear()
+                st.rerun()
         
         if controls["stop"] and st.session_state.enrich_status == "running":
-            st.session_state.enrich_status = "idle"
+            with get_session() as s:
+                stop_job(s, job.id)
+            load_stage_jobs.clear()
             st.rerun()
         
         if controls["reset"]:
-            st.session_state.enrich_status = "idle"
-            st.session_state.progress["enrich"] = 0
+            with get_session() as s:
+                reset_stage(s, "enrich")
+            load_stage_jobs.clear()
             st.rerun()
 
+@timed()
 def render_builder_stage():
     """Render the Builder stage UI components."""
+    collections = load_collection_labels(get_table_versions().get("collection", 0))
+    jobs = load_stage_jobs()
+    job, source_job = jobs["build"], jobs["enrich"] or jobs["collect"]
+    st.session_state.build_status = stage_status(job)
+    st.session_state.progress["build"] = job.progress if job else 0
+
     with st.expander("3. Transaction Builder", expanded=True):
         render_status_indicator(st.session_state.build_status, "Transaction Builder")
         
+        # Default to the collection the previous stage worked on
+        collection_ids = list(collections)
+        default = source_job.collection_id if source_job and source_job.collection_id in collections else None
+        target_collection = st.selectbox(
+            "Collection:", collection_ids, format_func=collections.get,
+            index=collection_ids.index(default) if default is not None else 0,
+            key="build_collection"
+        ) if collection_ids else None
+        
         # Builder options
-        builder_options = {
-            "Group related transactions": True,
-            "Include failed transactions": False,
-            "Generate transaction summaries": True,
-            "Rebuild existing transactions": False
-        }
+        builder_options = dict(BUILD_OPTIONS)
         
         for option, default in builder_options.items():
             builder_options[option] = st.checkbox(option, value=default, key=f"build_option_{option}")
@@ -126,20 +200,27 @@ def render_builder_stage():
             st.warning("Enrichment hasn't completed yet. Building may have incomplete data.")
         
         # Progress bar
-        if st.session_state.build_status == "running":
-            st.progress(st.session_state.progress["build"], text=f"Building: {st.session_state.progress['build']*100:.0f}%")
+        render_stage_progress("build", "Building", job)
         
         # Handle button clicks
         if controls["start"]:
-            st.session_state.build_status = "running"
-            st.session_state.progress["build"] = 0.1
-            st.rerun()
+            if target_collection is None:
+                st.warning("There is no collection to build yet.")
+            else:
+                options = [option for option, enabled in builder_options.items() if enabled]
+                with get_session() as s:
+                    start_job(s, "build", {"options": options}, collection_id=target_collection)
+                load_stage_jobs.clear()
+                st.rerun()
         
         if controls["stop"] and st.session_state.build_status == "running":
-            st.session_state.build_status = "idle"
+            with get_session() as s:
+                stop_job(s, job.id)
+            load_stage_jobs.clear()
             st.rerun()
         
         if controls["reset"]:
-            st.session_state.build_status = "idle"
-            st.session_state.progress["build"] = 0
+            with get_session() as s:
+                reset_stage(s, "build")
+            load_stage_jobs.clear()
             st.rerun()
@@ -3,13 +3,14 @@ import sys
 from logging.config import fileConfig
 
 from alembic import context
-from sqlalchemy import engine_from_config, pool
 
 # Add the parent directory to sys.path so that we can import fdc
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import Base from our models
-from fdc.db.session import Base
+from fdc.db.migrate import BACKFILL_TABLE
+from fdc.db.search import SEARCH_TABLE
+from fdc.db.session import SQLALCHEMY_DATABASE_URL, Base, get_engine
 
 # Import models to ensure they're registered with SQLAlchemy
 # These imports are needed for Alembic to detect model changes
@@ -22,8 +23,10 @@ from fdc.db.models import Collection, CollectionPart  # noqa: F401
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-fileConfig(config.config_file_name)
+# This line sets up loggers basically. Skipped when run in-process through
+# `fdc.db.migrate`, which leaves the host's logging alone.
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -35,6 +38,11 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+def include_name(name, type_, parent_names):
+    """Keep Alembic-unmanaged tables (backfill bookkeeping, the part search index) out of autogenerate."""
+    return not (type_ == "table" and (name == BACKFILL_TABLE or name.startswith(SEARCH_TABLE)))
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -47,12 +55,15 @@ def run_migrations_offline():
     script output.
 
     """
-    url = config.get_main_option("sqlalchemy.url")
+    url = config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
     context.configure(
         url=url,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+        transaction_per_migration=True,
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -62,23 +73,32 @@ def run_migrations_offline():
 def run_migrations_online():
     """Run migrations in 'online' mode.
 
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
+    `fdc.db.migrate` passes an open connection of the app's engine in
+    `config.attributes`; a plain `alembic` invocation connects through the same
+    engine (URL and SQLite pragmas from `fdc.db.session`). Each revision runs
+    in its own transaction, and SQLite ALTERs are rendered in batch mode.
 
     """
-    connectable = engine_from_config(
-        config.get_section(config.config_ini_section),
-        prefix="sqlalchemy.",
-        poolclass=pool.NullPool,
-    )
+    connection = config.attributes.get("connection")
+    if connection is None:
+        with get_engine().connect() as connection:
+            _run_migrations(connection)
+            connection.commit()
+    else:
+        _run_migrations(connection)
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
 
-        with context.begin_transaction():
-            context.run_migrations()
+def _run_migrations(connection):
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+        transaction_per_migration=True,
+        include_name=include_name,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
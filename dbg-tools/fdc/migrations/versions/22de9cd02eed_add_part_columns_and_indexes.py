@@ -0,0 +1,52 @@
+"""add part columns and indexes
+
+Revision ID: 22de9cd02eed
+Revises: a41d9e6f0c27
+Create Date: 2026-10-18 03:13:03.860582
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '22de9cd02eed'
+down_revision = 'a41d9e6f0c27'
+branch_labels = None
+depends_on = None
+
+
+# Hot `data` fields promoted to stored generated columns
+PART_COLUMNS = [
+    ('type', sa.String(length=32), '$.type'),
+    ('chain', sa.String(length=32), '$.chain'),
+    ('block_number', sa.Integer(), '$.block_number'),
+    ('tx_hash', sa.String(length=66), '$.tx_hash'),
+    ('from_address', sa.String(length=42), '$.from'),
+]
+
+
+def upgrade():
+    # SQLite can only ALTER TABLE ADD virtual generated columns, so rebuild the
+    # table; the stored values are computed while the rows are copied over.
+    with op.batch_alter_table('collection_part', recreate='always') as batch_op:
+        for name, type_, path in PART_COLUMNS:
+            batch_op.add_column(
+                sa.Column(name, type_, sa.Computed(f"json_extract(data, '{path}')", persisted=True), nullable=True)
+            )
+    op.create_index('ix_collection_part_collection_id', 'collection_part', ['collection_id'], unique=False)
+    op.create_index('ix_collection_part_collection_order', 'collection_part', ['collection_id', 'order'], unique=False)
+    op.create_index('ix_collection_part_collection_created', 'collection_part', ['collection_id', 'created_at'], unique=False)
+    op.create_index('ix_collection_part_collection_block', 'collection_part', ['collection_id', 'chain', 'block_number'], unique=False)
+    op.create_index('ix_collection_part_tx_hash', 'collection_part', ['tx_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_collection_part_tx_hash', table_name='collection_part')
+    op.drop_index('ix_collection_part_collection_block', table_name='collection_part')
+    op.drop_index('ix_collection_part_collection_created', table_name='collection_part')
+    op.drop_index('ix_collection_part_collection_order', table_name='collection_part')
+    op.drop_index('ix_collection_part_collection_id', table_name='collection_part')
+    with op.batch_alter_table('collection_part', recreate='always') as batch_op:
+        for name, _, _ in reversed(PART_COLUMNS):
+            batch_op.drop_column(name)
@@ -0,0 +1,41 @@
+"""add job table
+
+Revision ID: 3c1f7a9b2d40
+Revises: 95629d8f8184
+Create Date: 2026-10-18 10:12:03.118245
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f7a9b2d40'
+down_revision = '95629d8f8184'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('stage', sa.String(length=32), nullable=False),
+    sa.Column('status', sa.String(length=32), nullable=False),
+    sa.Column('progress', sa.Float(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('params', sa.Text(), nullable=True),
+    sa.Column('collection_id', sa.Integer(), nullable=True),
+    sa.Column('pid', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['collection_id'], ['collection.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_stage_id', 'job', ['stage', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_stage_id', table_name='job')
+    op.drop_table('job')
@@ -0,0 +1,29 @@
+"""add part search index
+
+Revision ID: 49d74ee14460
+Revises: e4c7a1f9b352
+Create Date: 2026-10-19 02:41:07.512884
+
+"""
+from alembic import op
+
+from fdc.db.search import search_index_ddl
+
+
+# revision identifiers, used by Alembic.
+revision = '49d74ee14460'
+down_revision = 'e4c7a1f9b352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # A virtual table (SQLite) or a table and its functions (PostgreSQL) outside the models, kept
+    # current by `fdc.db.crud`; the existing parts are indexed in the same transaction
+    for statement in search_index_ddl(op.get_context().dialect.name)[0]:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in search_index_ddl(op.get_context().dialect.name)[1]:
+        op.execute(statement)
@@ -0,0 +1,48 @@
+"""add stats tables
+
+Revision ID: 5d0e8b3f6a12
+Revises: 22de9cd02eed
+Create Date: 2026-10-18 15:42:10.318624
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0e8b3f6a12'
+down_revision = '22de9cd02eed'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stats_counter',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('daily_activity',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('chain', sa.String(length=32), nullable=False),
+    sa.Column('transactions', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'chain')
+    )
+    # Seed the stats from the existing data; the crud write paths keep them current from here on
+    op.execute(
+        "INSERT INTO stats_counter (name, value) "
+        "SELECT 'collection', count(*) FROM collection "
+        "UNION ALL SELECT 'collection_part', count(*) FROM collection_part"
+    )
+    op.execute(
+        "INSERT INTO daily_activity (day, chain, transactions) "
+        "SELECT date(json_extract(data, '$.timestamp'), 'unixepoch'), coalesce(chain, ''), count(*) "
+        "FROM collection_part "
+        "WHERE type = 'transaction' AND json_extract(data, '$.timestamp') IS NOT NULL "
+        "GROUP BY 1, 2"
+    )
+
+
+def downgrade():
+    op.drop_table('daily_activity')
+    op.drop_table('stats_counter')
@@ -0,0 +1,34 @@
+"""add collection checkpoint
+
+Revision ID: 7e2b4c8d1a93
+Revises: 3c1f7a9b2d40
+Create Date: 2026-10-18 11:40:27.502611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b4c8d1a93'
+down_revision = '3c1f7a9b2d40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('collection_checkpoint',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('collection_id', sa.Integer(), nullable=False),
+    sa.Column('source', sa.String(length=64), nullable=False),
+    sa.Column('block_number', sa.Integer(), nullable=False),
+    sa.Column('block_hash', sa.String(length=66), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['collection_id'], ['collection.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('collection_id', 'source', name='uq_collection_checkpoint_source')
+    )
+
+
+def downgrade():
+    op.drop_table('collection_checkpoint')
@@ -0,0 +1,62 @@
+"""timestamp server defaults
+
+Revision ID: 8f3b5d1e7c20
+Revises: c6a2f0e9b514
+Create Date: 2026-10-18 23:04:12.518306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from fdc.db.dialects import utcnow
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b5d1e7c20'
+down_revision = 'c6a2f0e9b514'
+branch_labels = None
+depends_on = None
+
+
+# Table -> timestamp columns filled in by the database
+TIMESTAMP_COLUMNS = {
+    'collection': ['created_at', 'updated_at'],
+    'collection_part': ['created_at', 'updated_at'],
+    'collection_checkpoint': ['updated_at'],
+    'job': ['created_at', 'updated_at'],
+}
+
+# Stored generated columns of collection_part (see revision 22de9cd02eed)
+PART_COLUMNS = [
+    ('type', sa.String(length=32), '$.type'),
+    ('chain', sa.String(length=32), '$.chain'),
+    ('block_number', sa.Integer(), '$.block_number'),
+    ('tx_hash', sa.String(length=66), '$.tx_hash'),
+    ('from_address', sa.String(length=42), '$.from'),
+]
+
+
+def _set_defaults(server_default):
+    # SQLite cannot change a column default in place, so its tables are rebuilt
+    rebuild = op.get_bind().dialect.name == 'sqlite'
+    for table, columns in TIMESTAMP_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column, existing_type=sa.DateTime(), existing_nullable=False, server_default=server_default
+                )
+            if rebuild and table == 'collection_part':
+                # Generated columns cannot be copied into the new table; it computes them again
+                for name, type_, path in PART_COLUMNS:
+                    batch_op.drop_column(name)
+                    batch_op.add_column(
+                        sa.Column(name, type_, sa.Computed(f"json_extract(data, '{path}')", persisted=True))
+                    )
+
+
+def upgrade():
+    _set_defaults(utcnow())
+
+
+def downgrade():
+    _set_defaults(None)
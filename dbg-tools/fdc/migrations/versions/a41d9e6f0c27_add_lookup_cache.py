@@ -0,0 +1,30 @@
+"""add lookup cache
+
+Revision ID: a41d9e6f0c27
+Revises: 7e2b4c8d1a93
+Create Date: 2026-10-18 13:05:51.774102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d9e6f0c27'
+down_revision = '7e2b4c8d1a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lookup_cache',
+    sa.Column('namespace', sa.String(length=64), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('value', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('namespace', 'key')
+    )
+
+
+def downgrade():
+    op.drop_table('lookup_cache')
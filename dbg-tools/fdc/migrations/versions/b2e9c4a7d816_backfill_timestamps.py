@@ -0,0 +1,43 @@
+"""backfill timestamps
+
+Revision ID: b2e9c4a7d816
+Revises: 8f3b5d1e7c20
+Create Date: 2026-10-18 23:05:47.093114
+
+"""
+from fdc.db.migrate import Backfill, reset_backfill, run_backfills
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e9c4a7d816'
+down_revision = '8f3b5d1e7c20'
+branch_labels = None
+depends_on = None
+
+
+# Rows written through ORM defaults all got the writing process's start time.
+# Collections take the time their first part was written and started jobs the
+# time they started; `updated_at` never precedes `created_at`.
+_FIRST_PART = "(SELECT min(p.created_at) FROM collection_part p WHERE p.collection_id = collection.id)"
+
+BACKFILLS = [
+    Backfill(
+        "collection_created_at_from_parts", "collection", f"created_at = {_FIRST_PART}", f"created_at < {_FIRST_PART}"
+    ),
+    Backfill("job_created_at_from_started_at", "job", "created_at = started_at", "created_at < started_at"),
+    *(
+        Backfill(f"{table}_updated_at_after_created_at", table, "updated_at = created_at", "updated_at < created_at")
+        for table in ("collection", "collection_part", "job")
+    ),
+]
+
+
+def upgrade():
+    run_backfills(*BACKFILLS)
+
+
+def downgrade():
+    # The original times are not kept; only forget the progress so that an upgrade runs again
+    for backfill in BACKFILLS:
+        reset_backfill(op.get_bind(), backfill.name)
@@ -0,0 +1,49 @@
+"""add part blobs
+
+Revision ID: c6a2f0e9b514
+Revises: 5d0e8b3f6a12
+Create Date: 2026-10-18 21:27:44.902153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from fdc.db.migrate import Backfill, reset_backfill, run_backfills
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6a2f0e9b514'
+down_revision = '5d0e8b3f6a12'
+branch_labels = None
+depends_on = None
+
+
+# Copies blob contents back into their parts before the blob table goes away
+INLINE_CONTENT = Backfill(
+    "collection_part_inline_content", "collection_part",
+    "content = (SELECT part_blob.content FROM part_blob WHERE part_blob.hash = collection_part.content_hash)",
+    "content_hash IS NOT NULL AND content IS NULL"
+)
+
+
+def upgrade():
+    op.create_table('part_blob',
+    sa.Column('hash', sa.String(length=32), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('hash')
+    )
+    # Existing parts keep their content in the row (and no hash); new parts are written through part_blob
+    op.add_column('collection_part', sa.Column('content_hash', sa.String(length=32), nullable=True))
+    # Collection first: bulk inserts then touch the new collection's range of the index only
+    op.create_index(
+        'uq_collection_part_content_hash', 'collection_part', ['collection_id', 'content_hash', 'name'], unique=True
+    )
+
+
+def downgrade():
+    run_backfills(INLINE_CONTENT)
+    reset_backfill(op.get_bind(), INLINE_CONTENT.name)
+    op.drop_index('uq_collection_part_content_hash', table_name='collection_part')
+    # A plain ALTER: a batch rebuild would garble the reflected generated columns
+    op.drop_column('collection_part', 'content_hash')
+    op.drop_table('part_blob')
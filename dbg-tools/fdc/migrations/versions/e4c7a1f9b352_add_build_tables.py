@@ -0,0 +1,94 @@
+"""add build tables
+
+Revision ID: e4c7a1f9b352
+Revises: b2e9c4a7d816
+Create Date: 2026-10-19 00:12:38.640215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from fdc.db.dialects import utcnow
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4c7a1f9b352'
+down_revision = 'b2e9c4a7d816'
+branch_labels = None
+depends_on = None
+
+_BUILT_PART = sa.text('built_part_id IS NOT NULL')
+
+
+def upgrade():
+    op.create_table('build',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('source_collection_id', sa.Integer(), nullable=False),
+    sa.Column('target_collection_id', sa.Integer(), nullable=False),
+    sa.Column('options', sa.Text(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('built_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=utcnow(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=utcnow(), nullable=False),
+    sa.ForeignKeyConstraint(['source_collection_id'], ['collection.id'], ),
+    sa.ForeignKeyConstraint(['target_collection_id'], ['collection.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('target_collection_id')
+    )
+    op.create_table('built_transaction',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('build_id', sa.Integer(), nullable=False),
+    sa.Column('source_part_id', sa.Integer(), nullable=True),
+    sa.Column('built_part_id', sa.Integer(), nullable=True),
+    sa.Column('chain', sa.String(length=32), nullable=False),
+    sa.Column('tx_hash', sa.String(length=66), nullable=False),
+    sa.Column('tx_key', sa.BigInteger(), nullable=False),
+    sa.Column('sender', sa.String(length=42), nullable=True),
+    sa.Column('sender_key', sa.BigInteger(), nullable=True),
+    sa.Column('fingerprint', sa.BigInteger(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('value', sa.Float(), nullable=True),
+    sa.Column('block_number', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.Integer(), nullable=True),
+    sa.Column('from_label', sa.String(length=255), nullable=True),
+    sa.ForeignKeyConstraint(['build_id'], ['build.id'], ),
+    sa.ForeignKeyConstraint(['built_part_id'], ['collection_part.id'], ),
+    sa.ForeignKeyConstraint(['source_part_id'], ['collection_part.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('build_id', 'tx_key', name='uq_built_transaction_tx')
+    )
+    op.create_index('ix_built_transaction_sender', 'built_transaction', ['build_id', 'sender_key'], unique=False)
+    op.create_index(
+        'ix_built_transaction_source_part_id', 'built_transaction', ['source_part_id', 'build_id'], unique=False
+    )
+    op.create_index(
+        'ix_built_transaction_built_part_id', 'built_transaction', ['built_part_id'], unique=False,
+        sqlite_where=_BUILT_PART, postgresql_where=_BUILT_PART
+    )
+    op.create_table('built_group',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('build_id', sa.Integer(), nullable=False),
+    sa.Column('chain', sa.String(length=32), nullable=False),
+    sa.Column('sender', sa.String(length=42), nullable=True),
+    sa.Column('built_part_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['build_id'], ['build.id'], ),
+    sa.ForeignKeyConstraint(['built_part_id'], ['collection_part.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('build_id', 'chain', 'sender', name='uq_built_group_sender')
+    )
+    op.create_index('ix_built_group_built_part_id', 'built_group', ['built_part_id'], unique=False)
+    # Existing built collections have no build state; their next build needs 'Rebuild existing transactions'
+    op.create_index(
+        'ix_collection_part_collection_updated', 'collection_part', ['collection_id', 'updated_at'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_collection_part_collection_updated', table_name='collection_part')
+    op.drop_index('ix_built_group_built_part_id', table_name='built_group')
+    op.drop_table('built_group')
+    op.drop_index('ix_built_transaction_built_part_id', table_name='built_transaction')
+    op.drop_index('ix_built_transaction_source_part_id', table_name='built_transaction')
+    op.drop_index('ix_built_transaction_sender', table_name='built_transaction')
+    op.drop_table('built_transaction')
+    op.drop_table('build')
@@ -0,0 +1,37 @@
+"""Shared fixtures: a fresh SQLite database per test, a free port for a devnet."""
+
+import socket
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from fdc import metrics
+from fdc.db.models import Base
+from fdc.db.session import create_database_engine
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    """Keep the metrics every flush writes out of the user's metrics directory."""
+    monkeypatch.setattr(metrics, "METRICS_DIR", tmp_path / "metrics")
+    return tmp_path / "metrics"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'fdc.sqlite'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(engine)
+
+
+@pytest.fixture
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
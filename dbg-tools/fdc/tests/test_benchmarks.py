@@ -0,0 +1,25 @@
+"""The benchmark suite against its baselines; opt-in with `pytest -m bench` (`make bench`).
+
+`FDC_BENCH_ARGS` passes extra options to `benchmarks/bench_suite.py`, e.g.
+`--only viewer` or `--url postgresql://...`.
+"""
+
+import os
+import shlex
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SUITE = Path(__file__).resolve().parent.parent / "benchmarks" / "bench_suite.py"
+
+
+@pytest.mark.bench
+def test_no_benchmark_regressed():
+    result = subprocess.run(
+        [sys.executable, str(SUITE), *shlex.split(os.environ.get("FDC_BENCH_ARGS", ""))],
+        capture_output=True, text=True
+    )
+    print(result.stdout)
+    assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,114 @@
+"""Vectorized column conversions and builds of `fdc.pipeline.builder`."""
+
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sqlalchemy import select
+
+from fdc.db import crud
+from fdc.db.models import CollectionPart
+from fdc.pipeline.builder import (
+    BUILT_SUFFIX, GROUP_TRANSACTIONS, SHARD_BATCHES, WEI_PER_ETHER, TransactionBuilder, _hex_to_ether, _tx_keys
+)
+from fdc.pipeline.collector import block_to_parts
+from fdc.pipeline.devnet import Devnet
+from fdc.pipeline.shards import shard_rows_for
+
+VALUES = [
+    "0x0", "0x1", "0xde0b6b3a7640000", "0X1F", "0x0000ff", "0xffffffffffffffff", "0x10000000000000000",
+    hex(2 ** 200 + 12345), hex(2 ** 256 - 1), "", None,
+]
+
+
+def test_hex_to_ether():
+    expected = [int(value, 16) / WEI_PER_ETHER if value else 0.0 for value in VALUES]
+    np.testing.assert_allclose(_hex_to_ether(pd.Series(VALUES)), expected, rtol=1e-15, atol=0)
+
+
+@pytest.mark.parametrize("value", ["0xzz", hex(2 ** 256), "0xé"])
+def test_hex_to_ether_rejects_invalid(value):
+    with pytest.raises(ValueError, match="Invalid hex wei value"):
+        _hex_to_ether(pd.Series(["0x1", value]))
+
+
+def test_tx_keys():
+    hashes = [f"0x{number:064x}" for number in (1, 2, 2 ** 255 + 7)]
+    frame = pd.DataFrame({
+        "chain": ["ethereum", "ethereum", "base", "base", "base"],
+        "tx_hash": [*hashes, hashes[0], "not-hex"],
+    })
+    keys = _tx_keys(frame)
+    assert keys.dtype == np.int64
+    assert len(set(keys.tolist())) == len(frame)
+    # Stable across runs: a key's chain part and the fallback are hashed with `hashlib`
+    digest = hashlib.blake2b(b"base:not-hex", digest_size=8).digest()
+    assert keys[4] == int.from_bytes(digest, "big", signed=True)
+    np.testing.assert_array_equal(_tx_keys(frame.iloc[::-1]), keys[::-1])
+
+
+def test_build_keeps_the_latest_part_of_a_transaction(session_factory):
+    devnet = Devnet()
+    parts = [part for number in range(100, 104) for part in block_to_parts("ethereum", devnet.block(number, full=True))]
+    # The first transaction again in the last batch, with another value
+    content = {**json.loads(parts[0]["content"]), "value": "0xde0b6b3a7640000"}
+    parts.append({**parts[0], "content": json.dumps(content)})
+    with session_factory() as db:
+        collection_id = crud.create_collection(db, "duplicates").id
+        crud.bulk_create_collection_parts(db, collection_id, parts)
+    stats = TransactionBuilder([], session_factory=session_factory, batch_size=5, workers=1).build_collection(
+        collection_id
+    )
+    assert stats.duplicates == 1
+    with session_factory() as db:
+        target = crud.get_collection_by_name(db, "duplicates" + BUILT_SUFFIX)
+        built = {
+            name: json.loads(data) for name, data in db.execute(
+                select(CollectionPart.name, CollectionPart.data).where(CollectionPart.collection_id == target.id)
+            )
+        }
+    assert len(built) == len(parts) - 1
+    assert stats.built_parts == len(parts)  # the duplicate updates its transaction's built part
+    assert built[parts[0]["name"]]["value"] == 1.0
+
+
+@pytest.mark.parametrize("options", [[], [GROUP_TRANSACTIONS]])
+def test_parallel_builds_match_sequential_ones(session_factory, metrics_dir, monkeypatch, options):
+    # Shard workers are spawned processes: they find the metrics directory in the environment
+    monkeypatch.setenv("FDC_METRICS_DIR", str(metrics_dir))
+    devnet = Devnet()
+    parts = [part for number in range(100, 112) for part in block_to_parts("ethereum", devnet.block(number, full=True))]
+    built = {}
+    for workers in (1, 3):
+        with session_factory() as db:
+            collection_id = crud.create_collection(db, f"workers {workers}").id
+            crud.bulk_create_collection_parts(db, collection_id, parts)
+        stats = TransactionBuilder(options, session_factory=session_factory, batch_size=5, workers=workers)\
+            .build_collection(collection_id)
+        with session_factory() as db:
+            first_id = crud.get_collection_parts(db, collection_id, limit=1)[0].id
+            rows = db.execute(
+                select(CollectionPart.name, CollectionPart.data, CollectionPart.order)
+                .where(CollectionPart.collection_id == stats.collection_id)
+                .order_by(CollectionPart.order)
+            ).all()
+        transactions = []
+        for name, data, order in rows:
+            data = json.loads(data)
+            # The two source collections differ by their part ids
+            if "source_part_id" in data:
+                data["source_part_id"] -= first_id
+            transactions.append((name, data, order))
+        built[workers] = stats.built_parts, transactions
+    assert len(built[1][1]) > 5
+    assert built[1] == built[3]
+
+
+def test_build_shards_are_capped():
+    # About `SHARDS_PER_WORKER` shards per worker, but no more than `SHARD_BATCHES` batches each
+    assert shard_rows_for(1_000, 2, 10, SHARD_BATCHES) == 10 * SHARD_BATCHES
+    assert shard_rows_for(1_000, 2, 10) == 130
+    assert shard_rows_for(50, 2, 10, SHARD_BATCHES) == 10
@@ -0,0 +1,103 @@
+"""Tiers, in-flight deduplication and counters of the enricher's `LookupCache`."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from fdc.db.dialects import utcnow
+from fdc.db.models import LookupCacheEntry
+from fdc.pipeline import cache
+from fdc.pipeline.cache import CacheStats, LookupCache, TTLCache
+
+
+class Loader:
+    """A resolver recording the keys it is asked for, answering once `release` is set."""
+
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self, keys):
+        self.calls.append(list(keys))
+        await self.release.wait()
+        return {key: self.values[key] for key in keys if key in self.values}
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    memory = TTLCache(maxsize=2, ttl=10)
+    memory.set("a", 1)
+    memory.set("b", 2, ttl=60)
+    now[0] += 11
+    assert memory.get("a", None) is None
+    assert memory.get("b") == 2
+    # The least recently used entry makes room
+    memory.set("c", 3)
+    memory.get("b")
+    memory.set("d", 4)
+    assert memory.get("c", None) is None
+    assert (memory.get("b"), memory.get("d"), len(memory)) == (2, 4, 2)
+
+
+def test_lookups_go_through_the_tiers(session_factory):
+    loader = Loader({"router": "Uniswap"})
+    first = LookupCache(session_factory)
+    # Keys the loader leaves out are cached as None
+    assert asyncio.run(first.get_many("labels", ["router", "unknown", "router"], loader)) == {
+        "router": "Uniswap", "unknown": None
+    }
+    assert asyncio.run(first.get_many("labels", ["router", "unknown"], loader)) == {
+        "router": "Uniswap", "unknown": None
+    }
+    assert first.stats == CacheStats(memory_hits=2, misses=2)
+
+    # Another process finds them in the database
+    second = LookupCache(session_factory)
+    asyncio.run(second.get_many("labels", ["router"], loader))
+    asyncio.run(second.get_many("labels", ["other"], loader, persistent=False))
+    assert second.stats == CacheStats(db_hits=1, misses=1)
+    assert loader.calls == [["router", "unknown"], ["other"]]
+    assert second.stats.hit_rate == 0.5
+    with session_factory() as db:
+        assert db.execute(select(LookupCacheEntry.key).where(LookupCacheEntry.key == "other")).first() is None
+
+
+def test_expired_lookups_are_loaded_again(session_factory):
+    loader = Loader({"token": "USDC"})
+    asyncio.run(LookupCache(session_factory).get_many("tokens", ["token"], loader, ttl=timedelta(seconds=-1)))
+    fresh = LookupCache(session_factory)
+    asyncio.run(fresh.get_many("tokens", ["token"], loader))
+    assert fresh.stats == CacheStats(misses=1)
+    assert len(loader.calls) == 2
+
+
+def test_lookups_expire_in_utc(session_factory):
+    asyncio.run(LookupCache(session_factory).get_many("tokens", ["token"], Loader({}), ttl=timedelta(hours=1)))
+    with session_factory() as db:
+        expires_at, now = db.execute(select(LookupCacheEntry.expires_at, utcnow())).one()
+    if isinstance(now, str):  # SQLite returns the text of a function's result
+        now = datetime.fromisoformat(now)
+    assert timedelta(minutes=59) < expires_at - now <= timedelta(hours=1, minutes=1)
+
+
+def test_concurrent_lookups_share_one_load(session_factory):
+    lookups = LookupCache(session_factory)
+    loader = Loader({"a": 1, "b": 2, "c": 3})
+
+    async def run():
+        loader.release.clear()
+        first = asyncio.create_task(lookups.get_many("labels", ["a", "b"], loader))
+        await asyncio.sleep(0.05)
+        # "a" and "b" are being loaded: only "c" is asked for again
+        second = asyncio.create_task(lookups.get_many("labels", ["b", "c"], loader))
+        await asyncio.sleep(0.05)
+        loader.release.set()
+        return await first, await second
+
+    assert asyncio.run(run()) == ({"a": 1, "b": 2}, {"b": 2, "c": 3})
+    assert sorted(loader.calls) == [["a", "b"], ["c"]]
+    assert lookups.stats == CacheStats(inflight_hits=1, misses=3)
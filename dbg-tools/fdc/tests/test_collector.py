@@ -0,0 +1,211 @@
+"""Collector runs against the local devnet (`fdc.pipeline.devnet`)."""
+
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from fdc.db import crud
+from fdc.db.models import CollectionPart
+from fdc.pipeline.collector import ChainSource, Collector, CollectorError, RpcError
+from fdc.pipeline.devnet import DEVNET, _hash, start_devnet
+
+TXS_PER_BLOCK = 3
+
+
+def run_collector(
+    port, session_factory, collection_id, minutes=10, devnet_setup=None, retries=20, until_minutes=None, **options
+):
+    """Collect the last `minutes` (up to `until_minutes` ago) of a devnet started with `options`."""
+    source = ChainSource("Test devnet", "ethereum", f"http://127.0.0.1:{port}", 12.0, reorg_depth=4)
+    collector = Collector(session_factory=session_factory, backoff=0.001, retries=retries, max_batch=20)
+
+    async def run():
+        runner = await start_devnet(port=port, txs_per_block=TXS_PER_BLOCK, **options)
+        if devnet_setup:
+            devnet_setup(runner.app[DEVNET])
+        try:
+            now = datetime.now(timezone.utc)
+            since = now - timedelta(minutes=minutes)
+            until = now - timedelta(minutes=until_minutes) if until_minutes is not None else None
+            return await collector.collect(collection_id, [source], since, until), runner.app[DEVNET]
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+def collected(session_factory, collection_id):
+    with session_factory() as db:
+        return db.execute(
+            select(CollectionPart.block_number, CollectionPart.tx_hash)
+            .where(CollectionPart.collection_id == collection_id)
+        ).all()
+
+
+@pytest.fixture
+def collection_id(session_factory):
+    with session_factory() as db:
+        return crud.create_collection(db, "devnet").id
+
+
+def test_collects_every_block_once(free_port, session_factory, collection_id):
+    stats, devnet = run_collector(free_port, session_factory, collection_id)
+    source = stats.sources["ethereum"]
+    blocks = source.end_block - source.start_block + 1
+    assert source.end_block == devnet.head
+    assert stats.blocks == blocks
+    assert stats.parts_written == blocks * TXS_PER_BLOCK
+    rows = collected(session_factory, collection_id)
+    assert len(rows) == len(set(rows)) == blocks * TXS_PER_BLOCK
+    assert {number for number, _ in rows} == set(range(source.start_block, source.end_block + 1))
+    # Ranges are fetched as batch requests, not one request per block
+    assert source.requests < blocks
+
+
+def test_batches_shrink_and_retry(free_port, session_factory, collection_id):
+    random.seed(4)
+    # A third of the requests fail, and batches over 4 calls are refused
+    stats, devnet = run_collector(
+        free_port, session_factory, collection_id, failure_rate=0.3, max_batch=4
+    )
+    source = stats.sources["ethereum"]
+    blocks = source.end_block - source.start_block + 1
+    assert source.retries > 0
+    assert stats.blocks == blocks
+    assert len(collected(session_factory, collection_id)) == blocks * TXS_PER_BLOCK
+
+
+def test_gives_up_after_retries(free_port, session_factory, collection_id):
+    def fail_blocks(devnet):
+        # The head is served, every block range fails
+        dispatch = devnet.dispatch
+
+        def failing(method, params):
+            if method == "eth_getBlockByNumber" and params[0] != "latest":
+                raise ValueError("header not found")
+            return dispatch(method, params)
+
+        devnet.dispatch = failing
+
+    with pytest.raises(CollectorError):
+        run_collector(free_port, session_factory, collection_id, devnet_setup=fail_blocks, retries=2)
+    with pytest.raises(RpcError):
+        run_collector(free_port, session_factory, collection_id, failure_rate=1.0, retries=2)
+
+
+def missing_block(offset, times):
+    """Devnet setup: block head-`offset` comes back as None for its first `times` requests."""
+    def setup(devnet):
+        dispatch = devnet.dispatch
+        number = devnet.head - offset
+        misses = [times]
+
+        def missing(method, params):
+            if method == "eth_getBlockByNumber" and params[0] == hex(number) and misses[0]:
+                misses[0] -= 1
+                return None
+            return dispatch(method, params)
+
+        devnet.dispatch = missing
+
+    return setup
+
+
+def test_retries_missing_blocks(free_port, session_factory, collection_id):
+    stats, devnet = run_collector(
+        free_port, session_factory, collection_id, devnet_setup=missing_block(20, times=2)
+    )
+    source = stats.sources["ethereum"]
+    blocks = source.end_block - source.start_block + 1
+    assert source.retries == 2
+    assert stats.blocks == blocks
+    rows = collected(session_factory, collection_id)
+    assert {number for number, _ in rows} == set(range(source.start_block, source.end_block + 1))
+    with session_factory() as db:
+        checkpoint = crud.get_checkpoint(db, collection_id, "ethereum")
+    assert (checkpoint.block_number, checkpoint.block_hash) == (devnet.head, _hash(devnet.chain_id, "block", devnet.head))
+
+
+def test_checkpoint_stops_below_a_missing_block(free_port, session_factory, collection_id):
+    with pytest.raises(CollectorError, match="not available"):
+        run_collector(free_port, session_factory, collection_id, devnet_setup=missing_block(20, times=10), retries=2)
+    with session_factory() as db:
+        checkpoint = crud.get_checkpoint(db, collection_id, "ethereum")
+    assert checkpoint is None or checkpoint.block_number < 1_000_000 - 20
+    # Once the node has the block, a rerun collects it
+    stats, devnet = run_collector(free_port, session_factory, collection_id)
+    assert devnet.head - 20 in {number for number, _ in collected(session_factory, collection_id)}
+
+
+def test_resumes_from_checkpoint(free_port, session_factory, collection_id):
+    first, _ = run_collector(free_port, session_factory, collection_id)
+    with session_factory() as db:
+        checkpoint = crud.get_checkpoint(db, collection_id, "ethereum")
+    assert checkpoint.block_number == first.sources["ethereum"].end_block
+
+    second, _ = run_collector(free_port, session_factory, collection_id, minutes=60)
+    source = second.sources["ethereum"]
+    # Only the reorg depth below the checkpoint is fetched again, not the hour
+    assert source.resumed
+    assert source.start_block == checkpoint.block_number - 4 + 1
+    assert second.blocks == 4
+    rows = collected(session_factory, collection_id)
+    assert len(rows) == len(set(rows)) == first.parts_written
+
+
+def test_collects_an_earlier_range_without_rewinding(free_port, session_factory, collection_id):
+    first, _ = run_collector(free_port, session_factory, collection_id)
+    with session_factory() as db:
+        checkpoint = crud.get_checkpoint(db, collection_id, "ethereum")
+
+    second, _ = run_collector(free_port, session_factory, collection_id, minutes=60, until_minutes=30)
+    source = second.sources["ethereum"]
+    assert not source.resumed
+    assert source.end_block < first.sources["ethereum"].start_block
+    blocks = source.end_block - source.start_block + 1
+    assert second.blocks == blocks
+    assert second.parts_written == blocks * TXS_PER_BLOCK
+    # The checkpointed blocks are all still there, and the checkpoint did not move back
+    rows = collected(session_factory, collection_id)
+    assert len(rows) == len(set(rows)) == first.parts_written + second.parts_written
+    with session_factory() as db:
+        assert crud.get_checkpoint(db, collection_id, "ethereum").block_number == checkpoint.block_number
+
+
+def test_rewinds_reorged_blocks(free_port, session_factory, collection_id):
+    first, devnet = run_collector(free_port, session_factory, collection_id)
+    head = devnet.head
+    fork = head - 10
+
+    def reorg(devnet):
+        # Blocks from `fork` on are replaced: new hashes, new transactions
+        block = devnet.block
+
+        def reorged(number, full):
+            result = block(number, full)
+            if number >= fork:
+                result["hash"] = _hash("fork", number)
+                if full:
+                    for tx in result["transactions"]:
+                        tx["hash"] = _hash("fork", tx["hash"])
+                        tx["blockHash"] = result["hash"]
+            return result
+
+        devnet.block = reorged
+
+    second, _ = run_collector(free_port, session_factory, collection_id, devnet_setup=reorg)
+    source = second.sources["ethereum"]
+    # The checkpoint hash changed: the rewind is widened past the fork
+    assert source.start_block == head - 4 * 8 + 1
+    rows = collected(session_factory, collection_id)
+    assert len(rows) == len(set(rows)) == first.parts_written
+    forked = {tx_hash for number, tx_hash in rows if number >= fork}
+    assert forked == {
+        _hash("fork", _hash(devnet.chain_id, "tx", number, index))
+        for number in range(fork, head + 1) for index in range(TXS_PER_BLOCK)
+    }
+    with session_factory() as db:
+        assert crud.get_checkpoint(db, collection_id, "ethereum").block_hash == _hash("fork", head)
@@ -0,0 +1,125 @@
+"""Payload hashing and blob sharing of collection parts in `fdc.db.crud`."""
+
+import pytest
+from sqlalchemy import select
+
+from fdc.db import crud
+from fdc.db.models import CollectionPart, PartBlob
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as db:
+        yield db
+
+
+@pytest.fixture
+def collection_id(db):
+    collection_id = crud.create_collection(db, "parts").id
+    crud.bulk_create_collection_parts(db, collection_id, [
+        {"name": "a", "content": "first"},
+        {"name": "b", "content": "second"},
+    ])
+    return collection_id
+
+
+def parts(db, collection_id):
+    """`{name: (content, content_hash)}` of a collection's parts."""
+    db.expire_all()
+    rows = db.execute(
+        select(CollectionPart.name, CollectionPart.content, CollectionPart.content_hash)
+        .where(CollectionPart.collection_id == collection_id)
+    )
+    return {name: (content, digest) for name, content, digest in rows}
+
+
+def blobs(db):
+    return set(db.execute(select(PartBlob.hash)).scalars())
+
+
+def ids(db, collection_id):
+    return dict(db.execute(
+        select(CollectionPart.name, CollectionPart.id).where(CollectionPart.collection_id == collection_id)
+    ).all())
+
+
+def test_identical_payloads_share_a_blob(db, collection_id):
+    other = crud.create_collection(db, "other").id
+    # The same content under other names, in this collection and in another
+    assert crud.bulk_create_collection_parts(db, collection_id, [{"name": "c", "content": "first"}]) == 1
+    assert crud.bulk_create_collection_parts(db, other, [{"name": "a", "content": "first"}]) == 1
+    # ... but once per name in a collection
+    assert crud.bulk_create_collection_parts(db, collection_id, [{"name": "c", "content": "first"}]) == 0
+    assert parts(db, collection_id)["c"] == parts(db, other)["a"] == ("first", crud.content_hash("first"))
+    assert blobs(db) == {crud.content_hash("first"), crud.content_hash("second")}
+    # The blob stays while any part uses it
+    crud.delete_collection_part(db, ids(db, collection_id)["a"])
+    crud.delete_collection(db, other)
+    assert crud.content_hash("first") in blobs(db)
+    crud.delete_collection_parts_by_id(db, collection_id, [ids(db, collection_id)["c"]])
+    assert blobs(db) == {crud.content_hash("second")}
+
+
+def test_create_returns_the_part_holding_the_payload(db, collection_id):
+    part = crud.create_collection_part(db, collection_id, "c", "third", data='{"type": "note"}')
+    assert (part.name, part.content, part.data) == ("c", "third", '{"type": "note"}')
+    assert crud.create_collection_part(db, collection_id, "c", "third").id == part.id
+    assert crud.create_collection_part(db, collection_id, "a", "first").id == ids(db, collection_id)["a"]
+    # Parts without content are never duplicates
+    empty = crud.create_collection_part(db, collection_id, "empty")
+    assert crud.create_collection_part(db, collection_id, "empty").id != empty.id
+    assert (empty.name, empty.content) == ("empty", None)
+    assert crud.count_collection_parts(db, collection_id) == 5
+
+
+def test_upsert_content_without_name_keeps_the_stored_name(db, collection_id):
+    a = ids(db, collection_id)["a"]
+    assert crud.upsert_collection_parts(db, collection_id, [{"id": a, "content": "changed"}]) == 1
+    assert parts(db, collection_id)["a"] == ("changed", crud.content_hash("changed"))
+
+
+def test_upsert_new_part_without_name_fails(db, collection_id):
+    with pytest.raises(ValueError, match="has no name"):
+        crud.upsert_collection_parts(db, collection_id, [{"id": 1000, "content": "new"}])
+
+
+def test_upsert_skips_payloads_another_part_holds(db, collection_id):
+    a = ids(db, collection_id)["a"]
+    assert crud.upsert_collection_parts(db, collection_id, [{"id": a, "name": "b", "content": "second"}]) == 0
+    assert parts(db, collection_id)["a"] == ("first", crud.content_hash("first"))
+
+
+def test_upsert_replaces_blobs_and_keeps_them_on_renames(db, collection_id):
+    a, b = ids(db, collection_id)["a"], ids(db, collection_id)["b"]
+    crud.upsert_collection_parts(db, collection_id, [{"id": a, "content": "changed"}])
+    crud.upsert_collection_parts(db, collection_id, [{"id": b, "name": "renamed"}])
+    assert parts(db, collection_id) == {
+        "a": ("changed", crud.content_hash("changed")),
+        "renamed": ("second", crud.content_hash("second")),
+    }
+    assert blobs(db) == {crud.content_hash("changed"), crud.content_hash("second")}
+
+
+def test_upsert_keeps_blobs_other_collections_use(db, collection_id):
+    other = crud.create_collection(db, "other").id
+    crud.bulk_create_collection_parts(db, other, [{"name": "a", "content": "first"}])
+    crud.upsert_collection_parts(db, collection_id, [{"id": ids(db, collection_id)["a"], "content": "changed"}])
+    assert crud.content_hash("first") in blobs(db)
+    assert parts(db, other)["a"] == ("first", crud.content_hash("first"))
+
+
+def test_update_replaces_blobs_and_keeps_them_on_renames(db, collection_id):
+    a, b = ids(db, collection_id)["a"], ids(db, collection_id)["b"]
+    crud.update_collection_part(db, a, {"content": "changed"})
+    crud.update_collection_part(db, b, {"name": "renamed"})
+    assert parts(db, collection_id) == {
+        "a": ("changed", crud.content_hash("changed")),
+        "renamed": ("second", crud.content_hash("second")),
+    }
+    assert blobs(db) == {crud.content_hash("changed"), crud.content_hash("second")}
+
+
+def test_update_rejects_payloads_another_part_holds(db, collection_id):
+    with pytest.raises(ValueError, match="already holds"):
+        crud.update_collection_part(db, ids(db, collection_id)["a"], {"name": "b", "content": "second"})
+    assert parts(db, collection_id)["a"] == ("first", crud.content_hash("first"))
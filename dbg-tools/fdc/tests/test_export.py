@@ -0,0 +1,33 @@
+"""Temporary export files of `fdc.db.export` and the viewer reading them."""
+
+import os
+import time
+
+from fdc.db import export
+
+
+def test_removes_stale_exports(tmp_path, monkeypatch):
+    monkeypatch.setattr(export.tempfile, "tempdir", str(tmp_path))
+    stale, fresh = tmp_path / "fdc-export-collection-1.csv", tmp_path / "fdc-export-collection-2.csv"
+    other = tmp_path / "other.csv"
+    for path in (stale, fresh, other):
+        path.write_text("id\n")
+    old = time.time() - export.EXPORT_TEMPFILE_MAX_AGE - 60
+    os.utime(stale, (old, old))
+    os.utime(other, (old, old))
+    assert export.remove_stale_exports() == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == [fresh.name, other.name]
+
+
+def test_a_removed_export_reads_as_expired(tmp_path, monkeypatch):
+    from fdc.ui.components import _read_export
+
+    monkeypatch.setattr(export.tempfile, "tempdir", str(tmp_path))
+    path = tmp_path / "fdc-export-collection-1.csv"
+    path.write_text("id\n")
+    prepared = {"key": None, "path": str(path)}
+    assert _read_export(prepared) == b"id\n"
+    old = time.time() - export.EXPORT_TEMPFILE_MAX_AGE - 60
+    os.utime(path, (old, old))
+    export.remove_stale_exports()
+    assert _read_export(prepared) is None
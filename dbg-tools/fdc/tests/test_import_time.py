@@ -0,0 +1,56 @@
+"""The CLI and database modules stay cheap to import.
+
+Each module is imported in a fresh interpreter with `python -X importtime`.
+A module fails when its best cumulative import time over `RUNS` attempts
+exceeds its budget, or when it pulls in one of the heavy UI dependencies
+(Streamlit, pandas, Plotly) that belong to `fdc.ui`/`fdc.app`. Set
+`FDC_IMPORT_BUDGET_SCALE` to multiply every budget on slow machines.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Module -> import budget in milliseconds
+BUDGETS_MS = {
+    "fdc.cli": 100,
+    "fdc.db": 20,
+    "fdc.db.crud": 500,  # SQLAlchemy's ORM; measured at 250-360 ms
+}
+
+HEAVY_MODULES = ("streamlit", "pandas", "plotly")
+
+RUNS = 5
+
+_PROBE = "import sys, {module}; print(','.join(m for m in {heavy!r} if m in sys.modules))"
+
+
+def import_time(module):
+    """Import `module` in a new interpreter; return (cumulative ms, heavy modules it loaded)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            cumulative_ms = int(fields[1]) / 1000
+            break
+    else:
+        raise RuntimeError(f"No importtime line for {module}")
+    return cumulative_ms, [name for name in result.stdout.strip().split(",") if name]
+
+
+@pytest.mark.parametrize("module", BUDGETS_MS)
+def test_import_time(module):
+    timings = [import_time(module) for _ in range(RUNS)]
+    assert timings[0][1] == [], f"{module} loads {', '.join(timings[0][1])}"
+    best = min(ms for ms, _ in timings)
+    budget = BUDGETS_MS[module] * float(os.environ.get("FDC_IMPORT_BUDGET_SCALE", "1"))
+    assert best <= budget, f"{module} took {best:.1f} ms to import (budget {budget:.0f} ms)"
@@ -0,0 +1,71 @@
+"""Job lifecycle of `fdc.pipeline.jobs.run_job`, with stand-in stage runners."""
+
+import pytest
+
+from fdc.db import crud
+from fdc.pipeline import jobs
+
+
+@pytest.fixture
+def run(session_factory, monkeypatch):
+    """Run a collect job in-process with `runner` as its stage runner; returns the finished job."""
+    monkeypatch.setattr(jobs, "Session", session_factory)
+
+    def run(runner):
+        monkeypatch.setattr(jobs, "_load_runner", lambda stage: runner)
+        with session_factory() as db:
+            job_id = crud.create_job(db, "collect", {}, None).id
+        jobs.run_job(job_id)
+        with session_factory() as db:
+            return crud.get_job(db, job_id)
+
+    return run
+
+
+def stop(context):
+    with jobs.Session() as db:
+        jobs.stop_job(db, context.job_id)
+
+
+def test_completes(run):
+    job = run(lambda context: "done")
+    assert (job.status, job.progress, job.message) == ("completed", 1.0, "done")
+    assert jobs.stage_status(job) == "completed"
+
+
+def test_stopped_at_the_next_report(run):
+    def runner(context):
+        stop(context)
+        context.report(0.5, force=True)
+        return "not reached"
+
+    job = run(runner)
+    assert job.status == "stopped"
+    assert jobs.stage_status(job) == "idle"
+
+
+def test_stopped_after_the_last_report(run):
+    # Stop is clicked, then the runner returns before its next report
+    def runner(context):
+        stop(context)
+        return "done"
+
+    job = run(runner)
+    assert job.status == "stopped"
+    assert job.finished_at is not None
+    assert jobs.stage_status(job) == "idle"
+
+
+def test_error(run):
+    def runner(context):
+        raise ValueError("boom")
+
+    job = run(runner)
+    assert (job.status, job.message) == ("error", "ValueError: boom")
+
+
+def test_times_come_from_the_database_clock(run):
+    # Naive UTC like the columns' defaults, so they order against created_at/updated_at
+    job = run(lambda context: "done")
+    assert job.started_at.tzinfo is None and job.finished_at.tzinfo is None
+    assert job.created_at <= job.started_at <= job.finished_at <= job.updated_at
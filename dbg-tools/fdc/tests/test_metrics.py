@@ -0,0 +1,29 @@
+"""Merging the flushed metrics of several processes in `fdc.metrics.collect`."""
+
+import json
+import os
+import time
+
+from fdc import metrics
+
+
+def write_snapshot(directory, pid, updated, value):
+    snapshot = {"pid": pid, "updated": updated, "counters": [], "histograms": [], "statements": []}
+    snapshot["counters"].append({"name": "fdc_test_total", "labels": {}, "value": value})
+    (directory / f"{pid}.json").write_text(json.dumps(snapshot))
+
+
+def test_collect_removes_stale_files(metrics_dir):
+    metrics_dir.mkdir()
+    now = time.time()
+    stale = now - metrics.RETENTION - 60
+    write_snapshot(metrics_dir, 1, now, 2)
+    write_snapshot(metrics_dir, 2, stale, 3)
+    (metrics_dir / "3.json").write_text("{")  # half-written by a killed process
+    (metrics_dir / "4.tmp").write_text("{")
+    for name in ("3.json", "4.tmp"):
+        os.utime(metrics_dir / name, (stale, stale))
+    snapshot = metrics.collect(metrics_dir)
+    assert [process["pid"] for process in snapshot["processes"] if process["pid"] != os.getpid()] == [1]
+    assert metrics.counter_values(snapshot, "fdc_test_total", "") == {"": 2}
+    assert sorted(path.name for path in metrics_dir.iterdir()) == ["1.json"]
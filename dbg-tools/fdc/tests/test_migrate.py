@@ -0,0 +1,59 @@
+"""Chunked backfills of `fdc.db.migrate`: progress, resume after an interruption, reset."""
+
+import pytest
+from sqlalchemy import text
+
+from fdc.db.migrate import BACKFILL_TABLE, Backfill, reset_backfill, run_backfill
+
+# Counts the updates of every row, to show which chunks ran again
+BACKFILL = Backfill("count_items", "item", "updates = updates + 1", "id % 10 <> 0", chunk_size=4)
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def items(engine):
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY, updates INTEGER NOT NULL)"))
+        connection.execute(text("INSERT INTO item (id, updates) VALUES (:id, 0)"), [{"id": i} for i in range(1, 31)])
+    return engine
+
+
+def updates(engine):
+    with engine.connect() as connection:
+        return dict(connection.execute(text("SELECT id, updates FROM item")).all())
+
+
+def saved(engine):
+    with engine.connect() as connection:
+        return tuple(connection.execute(
+            text(f"SELECT last_key, finished FROM {BACKFILL_TABLE} WHERE name = :name"), {"name": BACKFILL.name}
+        ).one())
+
+
+def test_an_interrupted_backfill_resumes_where_it_stopped(items):
+    reached = []
+
+    def interrupt(last_key, max_key):
+        reached.append((last_key, max_key))
+        if len(reached) == 3:
+            raise Interrupted
+
+    with pytest.raises(Interrupted):
+        run_backfill(items, BACKFILL, interrupt)
+    assert reached == [(4, 30), (8, 30), (12, 30)]
+    assert saved(items) == (12, False)
+    assert {id for id, count in updates(items).items() if count} == {id for id in range(1, 13) if id % 10}
+
+    # Only the rows after the saved position are updated, each exactly once overall
+    assert run_backfill(items, BACKFILL) == 16
+    assert saved(items) == (30, True)
+    assert updates(items) == {id: 0 if id % 10 == 0 else 1 for id in range(1, 31)}
+
+    # Finished: a no-op until reset
+    assert run_backfill(items, BACKFILL) == 0
+    reset_backfill(items, BACKFILL.name)
+    assert run_backfill(items, BACKFILL) == 27
+    assert set(updates(items).values()) == {0, 2}
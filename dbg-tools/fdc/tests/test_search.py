@@ -0,0 +1,145 @@
+"""Full-text search of collection parts (`fdc.db.search`) and the write paths keeping its index current."""
+
+import pytest
+from sqlalchemy import func, select
+
+from fdc.db import crud
+from fdc.db.frames import read_table_page
+from fdc.db.models import CollectionPart
+from fdc.db.search import search_table
+
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b2" * 20
+TX = "0x" + "c3" * 32
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as db:
+        yield db
+
+
+def tx(name, tx_hash=TX, sender=ALICE, to=BOB, content=""):
+    return {
+        "name": name,
+        "content": content,
+        "data": {"type": "transaction", "chain": "ethereum", "tx_hash": tx_hash, "from": sender, "to": to},
+    }
+
+
+def found(db, query, collection_id=None):
+    """Names of the parts matching `query`, best hits first."""
+    return [part.name for part, _ in crud.search_collection_parts(db, query, collection_id, limit=100)]
+
+
+def ids(db, collection_id):
+    return dict(db.execute(
+        select(CollectionPart.name, CollectionPart.id).where(CollectionPart.collection_id == collection_id)
+    ).all())
+
+
+def assert_index_matches_parts(db):
+    """One index row per part, none left behind by deletes."""
+    indexed = db.execute(select(func.count()).select_from(search_table)).scalar()
+    assert indexed == db.execute(select(func.count()).select_from(CollectionPart)).scalar()
+
+
+def test_addresses_and_hashes_match_whole_tokens(db):
+    collection_id = crud.create_collection(db, "txs").id
+    crud.bulk_create_collection_parts(db, collection_id, [
+        tx("alice to bob"),
+        tx("bob to alice", tx_hash="0x" + "d4" * 32, sender=BOB, to=ALICE),
+        tx("unrelated", tx_hash="0x" + "e5" * 32, sender="0x" + "f6" * 20, to="0x" + "f7" * 20),
+    ])
+    assert sorted(found(db, ALICE)) == ["alice to bob", "bob to alice"]
+    assert found(db, TX) == ["alice to bob"]
+    # Tokens are case-folded, and all terms must match
+    assert found(db, TX.upper()) == ["alice to bob"]
+    assert found(db, f"{BOB} {TX}") == ["alice to bob"]
+    # Part of a token is no match without `*`
+    assert found(db, ALICE[:12]) == []
+    assert sorted(found(db, ALICE[:12] + "*")) == ["alice to bob", "bob to alice"]
+    assert found(db, "unrel*") == ["unrelated"]
+    # Other collections are left out
+    assert found(db, ALICE, crud.create_collection(db, "empty").id) == []
+
+
+def test_operators_are_searched_as_words(db):
+    collection_id = crud.create_collection(db, "notes").id
+    crud.bulk_create_collection_parts(db, collection_id, [
+        {"name": "plain", "content": "swap tokens"},
+        {"name": "operators", "content": "and near swap tokens"},
+    ])
+    assert found(db, "swap AND tokens") == ["operators"]
+    # A term of several words is a phrase
+    assert found(db, "NEAR(swap tokens)") == ["operators"]
+    assert found(db, "NEAR(tokens") == []
+    assert sorted(found(db, '"swap" tokens"')) == ["operators", "plain"]
+    assert found(db, "swap OR nothing") == []
+    # Queries without a letter or digit have no terms, and no hits
+    assert found(db, '" ( * -') == []
+    assert found(db, "") == []
+
+
+def test_hits_rank_names_above_contents(db):
+    collection_id = crud.create_collection(db, "ranked").id
+    crud.bulk_create_collection_parts(db, collection_id, [
+        {"name": "in content", "content": "approve"},
+        {"name": "approve", "content": "in name"},
+        {"name": "neither", "content": "transfer"},
+    ])
+    hits = crud.search_collection_parts(db, "approve", collection_id)
+    assert [part.name for part, _ in hits] == ["approve", "in content"]
+    assert hits[0][1] < hits[1][1]
+    # Pages follow the ranking
+    second_page = crud.search_collection_parts(db, "approve", collection_id, skip=1)
+    assert [part.name for part, _ in second_page] == ["in content"]
+
+
+def test_the_index_follows_updates_and_deletes(db):
+    collection_id = crud.create_collection(db, "txs").id
+    crud.bulk_create_collection_parts(db, collection_id, [
+        tx("first", tx_hash="0x" + "01" * 32, content="pending"),
+        tx("second", tx_hash="0x" + "02" * 32),
+        tx("third", tx_hash="0x" + "03" * 32),
+    ])
+    names = ids(db, collection_id)
+
+    crud.update_collection_part(db, names["first"], {"name": "renamed", "content": "confirmed"})
+    assert found(db, "pending") == [] and found(db, "first") == []
+    assert found(db, "confirmed") == ["renamed"] and found(db, "renamed") == ["renamed"]
+
+    # Enrichment adds labels to the indexed fields
+    enriched = tx("second", tx_hash="0x" + "02" * 32)["data"]
+    enriched["enrichment"] = {"from_label": "Binance", "protocol": "uniswap"}
+    crud.bulk_update_collection_parts(db, [{"id": names["second"], "data": enriched}])
+    assert found(db, "binance") == ["second"]
+    assert found(db, "uniswap " + "0x" + "02" * 32) == ["second"]
+
+    crud.delete_collection_part(db, names["first"])
+    assert found(db, "confirmed") == []
+    crud.delete_collection_parts_by_id(db, collection_id, [names["second"]])
+    assert found(db, "binance") == []
+    assert found(db, ALICE) == ["third"]
+    assert_index_matches_parts(db)
+
+    crud.delete_collection(db, collection_id)
+    assert found(db, ALICE) == []
+    assert_index_matches_parts(db)
+
+
+def test_the_viewer_filters_through_the_index(db, engine):
+    collection_id = crud.create_collection(db, "txs").id
+    crud.bulk_create_collection_parts(db, collection_id, [
+        tx(f"part {number}", tx_hash=f"0x{number:064x}") for number in range(5)
+    ])
+    with engine.connect() as connection:
+        page = read_table_page(connection, "collection_part", search=f"0x{3:064x}")
+        assert page["name"].tolist() == ["part 3"]
+        page = read_table_page(connection, "collection_part", search=ALICE, limit=2)
+        assert page["name"].tolist() == ["part 0", "part 1"]
+        page = read_table_page(
+            connection, "collection_part", search=ALICE, after_id=int(page["id"].iloc[-1]), collection_id=collection_id
+        )
+        assert page["name"].tolist() == ["part 2", "part 3", "part 4"]
+        assert read_table_page(connection, "collection_part", search="* ").empty
@@ -0,0 +1,68 @@
+"""Units of work of `fdc.db.setup`: one session and one pooled connection per app rerun."""
+
+import threading
+
+import pytest
+from sqlalchemy import event
+
+from fdc.db import crud
+from fdc.db.models import Collection
+from fdc.db.setup import get_session, unit_of_work
+
+
+@pytest.fixture
+def checkouts(engine):
+    """Number of connections checked out of `engine`'s pool so far."""
+    count = [0]
+
+    @event.listens_for(engine, "checkout")
+    def checkout(*args):
+        count[0] += 1
+
+    return count
+
+
+def test_a_rerun_shares_one_session_and_connection(engine, checkouts):
+    with unit_of_work(engine) as session:
+        connection = session.connection()
+        # What the renderers of a rerun do: reads and writes, each through `get_session()`
+        with get_session() as db:
+            assert db is session
+            crud.create_collection(db, "first")
+        with get_session() as db:
+            assert [collection.name for collection in crud.get_collections(db)] == ["first"]
+            crud.create_collection(db, "second")
+        with unit_of_work(engine) as nested, get_session() as db:
+            assert nested is session and db is session
+            assert db.connection() is connection
+    assert checkouts[0] == 1
+
+    # The next rerun has a session of its own
+    with unit_of_work(engine) as other, get_session() as db:
+        assert other is not session and db is other
+        assert len(crud.get_collections(db)) == 2
+    assert checkouts[0] == 2
+
+
+def test_a_failed_rerun_rolls_back(engine):
+    with pytest.raises(RuntimeError):
+        with unit_of_work(engine), get_session() as db:
+            db.add(Collection(name="unsaved"))
+            db.flush()
+            raise RuntimeError
+    with unit_of_work(engine) as db:
+        assert crud.get_collections(db) == []
+
+
+def test_other_threads_keep_their_own_sessions(engine):
+    joined = []
+
+    def rerun():
+        with unit_of_work(engine) as other:
+            joined.append(other is session)
+
+    with unit_of_work(engine) as session:
+        thread = threading.Thread(target=rerun)
+        thread.start()
+        thread.join()
+    assert joined == [False]
@@ -0,0 +1,81 @@
+"""Stats tables maintained by the write paths of `fdc.db.crud`, checked against `refresh_stats`."""
+
+import pytest
+
+from fdc.db import crud
+
+DAY = 86_400
+START = 1_767_225_600  # 2026-01-01
+
+
+@pytest.fixture
+def db(session_factory):
+    with session_factory() as db:
+        yield db
+
+
+def part(chain, block, day=0, type="transaction"):
+    return {
+        "name": f"{chain}:{type}:{block}:{day}",
+        "content": f"{chain} {type} {block} {day}",
+        "data": {"type": type, "chain": chain, "block_number": block, "timestamp": START + day * DAY + block},
+    }
+
+
+def stats(db):
+    db.expire_all()
+    activity = [(row.day, row.chain, row.transactions) for row in crud.get_daily_activity(db, days=3650)]
+    # `refresh_stats` leaves out zero counters
+    return {"collection": 0, "collection_part": 0, **crud.get_stats(db)}, activity
+
+
+def assert_maintained(db):
+    """The maintained stats equal the ones recomputed from scratch."""
+    maintained = stats(db)
+    crud.refresh_stats(db)
+    assert maintained == stats(db)
+
+
+def ids(db, collection_id):
+    return {part.name: part.id for part in crud.get_collection_parts(db, collection_id, limit=1000)}
+
+
+def test_write_paths_keep_the_stats(db):
+    collection_id = crud.create_collection(db, "main").id
+    crud.bulk_create_collection_parts(db, collection_id, [
+        *(part(chain, block, day) for chain in ("ethereum", "base") for block in range(10) for day in range(3)),
+        part("ethereum", 3, type="log"),
+        {"name": "undated", "data": {"type": "transaction", "chain": "ethereum"}},
+        {"name": "note", "content": "no data"},
+    ], batch_size=7)
+    assert stats(db)[0]["collection_part"] == 63
+    assert_maintained(db)
+
+    # Upserts insert new parts and overwrite others, here moving them to another day
+    moved = [ids(db, collection_id)[f"base:transaction:{block}:0"] for block in range(3)]
+    crud.upsert_collection_parts(db, collection_id, [
+        {"id": part_id, **part("base", block, day=5)} for block, part_id in enumerate(moved)
+    ])
+    crud.upsert_collection_parts(db, collection_id, [part("polygon", block) for block in range(4)])
+    assert_maintained(db)
+
+    crud.delete_collection_parts_from_block(db, collection_id, "ethereum", 6)
+    assert_maintained(db)
+
+    names = ids(db, collection_id)
+    crud.delete_collection_parts_by_id(db, collection_id, [names["polygon:transaction:0:0"], names["note"]])
+    crud.delete_collection_part(db, names["undated"])
+    assert_maintained(db)
+
+    crud.create_collection_part(db, collection_id, "single", "content", data=part("optimism", 1)["data"])
+    crud.bulk_create_derived_parts(db, collection_id, [part("arbitrum", block) for block in range(3)])
+    assert_maintained(db)
+
+    other_id = crud.create_collection(db, "other").id
+    crud.bulk_create_collection_parts(db, other_id, [part("ethereum", block, day=1) for block in range(5)])
+    crud.delete_collection(db, other_id)
+    assert_maintained(db)
+
+    crud.delete_collection(db, collection_id)
+    assert stats(db) == ({"collection": 0, "collection_part": 0}, [])
+    assert_maintained(db)
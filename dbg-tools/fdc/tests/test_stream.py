@@ -0,0 +1,63 @@
+"""Streaming pipeline runs (`fdc.pipeline.stream`) with the collector replaced by direct writes."""
+
+import json
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+
+from fdc.db import crud
+from fdc.db.models import CollectionPart
+from fdc.pipeline import stream
+from fdc.pipeline.builder import REBUILD, build
+from fdc.pipeline.collector import Collector, CollectStats, block_to_parts
+from fdc.pipeline.devnet import Devnet
+
+DEVNET = Devnet(txs_per_block=3)
+
+
+def block_parts(first, count):
+    return [
+        part for number in range(first, first + count)
+        for part in block_to_parts("ethereum", DEVNET.block(number, full=True))
+    ]
+
+
+def built_parts(session_factory, collection_id):
+    with session_factory() as db:
+        target = crud.get_collection_by_name(db, crud.get_collection(db, collection_id).name + " (built)")
+        return sorted(db.execute(
+            select(CollectionPart.name, CollectionPart.data, CollectionPart.content)
+            .where(CollectionPart.collection_id == target.id)
+        ).all())
+
+
+def test_incremental_build_reads_only_changed_parts(session_factory, monkeypatch):
+    with session_factory() as db:
+        collection_id = crud.create_collection(db, "stream").id
+        crud.bulk_create_collection_parts(db, collection_id, block_parts(100, 10))
+    time.sleep(0.01)
+    build(collection_id, session_factory=session_factory, workers=1)
+    time.sleep(0.01)
+    with session_factory() as db:
+        part = db.execute(
+            select(CollectionPart).where(CollectionPart.collection_id == collection_id).limit(1)
+        ).scalar_one()
+        crud.update_collection_part(db, part.id, {"data": json.dumps({**json.loads(part.data), "timestamp": 1})})
+
+    async def collect(self, collection_id, sources, since, until=None):
+        with session_factory() as db:
+            crud.bulk_create_collection_parts(db, collection_id, block_parts(110, 2))
+        return CollectStats()
+
+    monkeypatch.setattr(Collector, "collect", collect)
+    monkeypatch.setattr(stream, "resolve_sources", lambda names: [])
+    stats = stream.run_pipeline(
+        [], datetime.now(timezone.utc), enrich_options=None, collection_id=collection_id,
+        session_factory=session_factory
+    )
+    assert stats.build.incremental
+    assert stats.build.source_parts == 1 + 2 * DEVNET.txs_per_block
+    incremental = built_parts(session_factory, collection_id)
+    build(collection_id, [*stream.DEFAULT_BUILD_OPTIONS, REBUILD], session_factory=session_factory, workers=1)
+    assert incremental == built_parts(session_factory, collection_id)